@@ -30,8 +30,8 @@ _ = runpy.run_path(ollama_script_path)
 
 ## 0.4 Load Functions #################################
 
-# Load helper functions for agent orchestration
-from functions import agent_run
+# Load helper functions for agent orchestration and indexed text search
+from functions import agent_run, search_text_index
 
 ## 0.3 Configuration #################################
 
@@ -45,7 +45,9 @@ DOCUMENT = "data/sample.txt"  # path to the text document to search
 
 def search_text(query, document_path):
     """
-    Search a text file for lines containing the query.
+    Search a text file for lines containing every word of the query (in any order; a word also
+    matches inside longer words, e.g. "learn" finds "learning"). Uses a saved inverted index of the file (see search_text_index()), so the document
+    is only scanned once, not on every query.
     
     Parameters:
     -----------
@@ -57,18 +59,12 @@ def search_text(query, document_path):
     Returns:
     --------
     dict
-        Dictionary with query, document name, matching content, and line count
+        Dictionary with query, document name, matching content, line numbers, and line count
     """
     
-    # Read the text file
-    with open(document_path, 'r', encoding='utf-8') as f:
-        text_content = f.readlines()
-    
-    # Find lines containing the query (case-insensitive)
-    matching_lines = [line for line in text_content if query.lower() in line.lower()]
-    
-    if len(matching_lines) == 0:
-        matching_lines = []
+    # Find lines containing every word of the query (case-insensitive)
+    matches = search_text_index(query, document_path)
+    matching_lines = [m["text"] for m in matches]
     
     # Combine matching lines into a single text
     result_text = "\n".join(matching_lines)
@@ -78,6 +74,7 @@ def search_text(query, document_path):
         "query": query,
         "document": os.path.basename(document_path),
         "matching_content": result_text,
+        "line_numbers": [m["line"] for m in matches],
         "num_lines": len(matching_lines)
     }
     
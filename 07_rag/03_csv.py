@@ -31,8 +31,8 @@ _ = runpy.run_path(ollama_script_path)
 
 ## 0.2 Load Functions #################################
 
-# Load helper functions for agent orchestration
-from functions import agent_run
+# Load helper functions for agent orchestration and cached CSV search
+from functions import agent_run, pack_context, search_table
 
 ## 0.3 Configuration #################################
 
@@ -41,12 +41,14 @@ MODEL = "smollm2:1.7b"  # use this small model
 PORT = 11434  # use this default port
 OLLAMA_HOST = f"http://localhost:{PORT}"  # use this default host
 DOCUMENT = "data/pokemon.csv"  # path to the document to search
+CONTEXT_BUDGET = 800  # max tokens of matching rows sent to the model
 
 # 1. SEARCH FUNCTION ###################################
 
 def search(query, document):
     """
     Search a CSV file for rows matching the query in the Name column.
+    The CSV is read once and cached (re-read only if the file changes); see search_table().
     
     Parameters:
     -----------
@@ -58,20 +60,15 @@ def search(query, document):
     Returns:
     --------
     str
-        JSON string of matching rows
+        Matching rows, one compact JSON object per line (at most CONTEXT_BUDGET tokens)
     """
     
-    # Read the CSV file
-    df = pd.read_csv(document)
-    
     # Filter rows where Name contains the query (case-insensitive)
-    filtered_df = df[df["Name"].str.contains(query, case=False, na=False)]
-    
-    # Convert to dictionary and then to JSON
-    result_dict = filtered_df.to_dict(orient="records")
+    filtered_df = search_table(query, document, columns=["Name"])
     
-    # Convert to JSON string (auto-unbox equivalent: ensure single-item lists become values)
-    result_json = json.dumps(result_dict, indent=2)
+    # Convert to JSON, one compact row per line, stopping at the token budget
+    # (a broad query like "a" matches hundreds of rows; the model doesn't need them all)
+    result_json = pack_context(filtered_df, budget=CONTEXT_BUDGET)
     
     return result_json
 
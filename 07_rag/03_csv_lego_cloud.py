@@ -33,12 +33,19 @@ MODEL = "gpt-oss:20b-cloud"  # Ollama Cloud model
 PORT = 11434
 OLLAMA_HOST = f"http://localhost:{PORT}"  # kept for parity with local scripts
 DOCUMENT = "data/lego_inventory.csv"  # path to the inventory CSV
+CONTEXT_BUDGET = 1500  # max tokens of inventory rows sent to the model
 OLLAMA_CLOUD_URL = "https://ollama.com/api/chat"
 OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
 
 if not OLLAMA_API_KEY:
     raise ValueError("OLLAMA_API_KEY not found in .env file. Please set it before running.")
 
+## 0.4 Load Functions #################################
+
+# Cached CSV search (reads the file once; re-reads it only if it changes)
+# and context packing (keeps the prompt within a token budget)
+from functions import pack_context, search_table
+
 # 1. SEARCH FUNCTION ###################################
 
 def search_inventory(query, document):
@@ -55,22 +62,13 @@ def search_inventory(query, document):
     Returns:
     --------
     str
-        JSON string of matching rows (list of dicts).
+        Matching rows, one compact JSON object per line (at most CONTEXT_BUDGET tokens).
     """
 
-    df = pd.read_csv(document)
-
     # Search multiple text-friendly columns for better retrieval coverage.
-    mask = (
-        df["set_name"].astype(str).str.contains(query, case=False, na=False)
-        | df["theme"].astype(str).str.contains(query, case=False, na=False)
-        | df["supplier"].astype(str).str.contains(query, case=False, na=False)
-        | df["warehouse_location"].astype(str).str.contains(query, case=False, na=False)
-    )
-
-    filtered_df = df[mask]
-    result_dict = filtered_df.to_dict(orient="records")
-    result_json = json.dumps(result_dict, indent=2)
+    # search_table() checks all of them at once, against a cached copy of the CSV.
+    filtered_df = search_table(query, document, columns=["set_name", "theme", "supplier", "warehouse_location"])
+    result_json = pack_context(filtered_df, budget=CONTEXT_BUDGET)
     return result_json
 
 # 2. OLLAMA CLOUD CHAT ###################################
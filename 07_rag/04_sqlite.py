@@ -14,7 +14,9 @@ import pandas as pd  # for data manipulation
 import requests  # for HTTP requests
 import json      # for working with JSON
 import os        # for file path operations
+import re        # for splitting search queries into words
 import runpy     # for executing another Python script
+import time      # for timing the search benchmark
 
 # 0.2 Working Directory #################################
 
@@ -33,7 +35,7 @@ _ = runpy.run_path(ollama_script_path)
 ## 0.2 Load Functions #################################
 
 # Load helper functions for agent orchestration
-from functions import agent_run
+from functions import agent_run, pack_context
 
 ## 0.3 Configuration #################################
 
@@ -42,12 +44,67 @@ MODEL = "smollm2:1.7b"  # use this small model
 PORT = 11434  # use this default port
 OLLAMA_HOST = f"http://localhost:{PORT}"  # use this default host
 DB_PATH = "data/papers.db"  # path to the SQLite database
+CONTEXT_BUDGET = 800  # max tokens of retrieved documents sent to the model
+BENCH_COPIES = int(os.getenv("FTS_BENCH_COPIES", "1000"))  # copies of the table used for the LIKE vs FTS5 benchmark
 
 # 1. DATABASE CONNECTION ###################################
 
 # Connect to database
 conn = sqlite3.connect(DB_PATH)
 
+# Full-text search index (FTS5) ###################################
+
+# A LIKE '%q%' search has to read every row, and it can't rank the rows it finds.
+# FTS5 is SQLite's built-in full-text index: it keeps a word -> rows lookup table,
+# and its bm25() function ranks matches (rare words and short fields count more).
+# documents_fts is an "external content" table: it indexes title, content and tags,
+# but reads the text itself from documents, so nothing is stored twice.
+# Triggers keep the index in sync whenever documents is inserted into, updated, or deleted from.
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+        title, content, tags,
+        content='documents', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts (rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+        INSERT INTO documents_fts (rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+]
+
+# Migration: add the FTS5 table and triggers to an existing database (safe to run every time).
+# The first time, 'rebuild' indexes every document already in the table.
+def ensure_fts(db_connection):
+    exists = db_connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'"
+    ).fetchone()
+    with db_connection:
+        for sql in FTS_SQL:
+            db_connection.execute(sql)
+        if not exists:
+            db_connection.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+            print("Built full-text index documents_fts.")
+
+ensure_fts(conn)
+
 
 # 2. SEARCH FUNCTION ###################################
 
@@ -91,6 +148,60 @@ def search_documents(query, db_connection, limit=5):
     
     return results
 
+def search_documents_fts(query, db_connection, limit=5):
+    """
+    Search the full-text index for documents matching the query, ranked by BM25.
+    
+    Parameters:
+    -----------
+    query : str
+        The search terms; every word must appear (in any order, any form: "learn" matches "learning")
+    db_connection : sqlite3.Connection
+        Database connection object (with documents_fts; see ensure_fts())
+    limit : int
+        Maximum number of results to return (default: 5)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        DataFrame with matching documents, best first, with a score
+        (higher = better) and a snippet of the content around the matching words
+    """
+    
+    # Quote each word, so punctuation in the query can't be read as FTS5 syntax
+    words = re.findall(r"\w+", query)
+    if not words:
+        return pd.DataFrame(columns=["id", "title", "content", "category", "author", "tags", "score", "snippet"])
+    match = " ".join(f'"{w}"' for w in words)
+    
+    # bm25() weights: a match in the title counts 10x, in the tags 5x, in the content 1x.
+    # bm25() is lower for better matches, so we negate it for the score.
+    sql_query = """
+        SELECT d.id, d.title, d.content, d.category, d.author, d.tags,
+               -bm25(documents_fts, 10.0, 1.0, 5.0) AS score,
+               snippet(documents_fts, 1, '**', '**', '...', 12) AS snippet
+        FROM documents_fts
+        JOIN documents AS d ON d.id = documents_fts.rowid
+        WHERE documents_fts MATCH ?
+        ORDER BY bm25(documents_fts, 10.0, 1.0, 5.0)
+        LIMIT ?
+    """
+    
+    results = pd.read_sql_query(sql_query, db_connection, params=(match, limit))
+    
+    return results
+
+# Time a search function over some queries; returns the median and 95th percentile (milliseconds).
+def time_search(search_fn, queries, db_connection, repeats=20):
+    times = []
+    for q in queries:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            search_fn(q, db_connection)
+            times.append((time.perf_counter() - start) * 1000)
+    times = pd.Series(times)
+    return times.quantile(0.5), times.quantile(0.95)
+
 # 3. TEST SEARCH FUNCTION ###################################
 
 # Test search function
@@ -100,18 +211,68 @@ print(f"Found {len(test_result)} matching documents")
 print(test_result[["title", "category"]].head() if len(test_result) > 0 else "No results")
 print()
 
+# Test the ranked full-text search
+print("Testing full-text search (BM25)...")
+test_fts = search_documents_fts("machine learning", conn)
+print(f"Found {len(test_fts)} matching documents")
+print(test_fts[["title", "score", "snippet"]].head() if len(test_fts) > 0 else "No results")
+print()
+
+# Benchmark: LIKE scan vs FTS5 index ###################################
+
+# papers.db only has a handful of rows, so we copy them BENCH_COPIES times into an in-memory database
+# to see how each search scales. We drop the copy's FTS5 table, bulk-copy the rows,
+# then rebuild the index once with ensure_fts() (the migration path for an existing database).
+bench = sqlite3.connect(":memory:")
+conn.backup(bench)
+with bench:
+    for name in ["documents_fts_ai", "documents_fts_ad", "documents_fts_au"]:
+        bench.execute(f"DROP TRIGGER {name}")
+    bench.execute("DROP TABLE documents_fts")
+    (max_id,) = bench.execute("SELECT MAX(id) FROM documents").fetchone()
+    for _ in range(BENCH_COPIES - 1):
+        bench.execute(
+            "INSERT INTO documents (title, content, category, author, created_date, tags, source_url) "
+            "SELECT title, content, category, author, created_date, tags, source_url FROM documents WHERE id <= ?",
+            (max_id,)
+        )
+ensure_fts(bench)
+n_rows = bench.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+bench_queries = ["machine learning", "database", "neural networks", "privacy"]
+like_p50, like_p95 = time_search(search_documents, bench_queries, bench)
+fts_p50, fts_p95 = time_search(search_documents_fts, bench_queries, bench)
+bench.close()
+
+print(f"Search benchmark over {n_rows} rows ({len(bench_queries)} queries):")
+print(pd.DataFrame({
+    "search": ["LIKE scan", "FTS5 + BM25"],
+    "p50_ms": [like_p50, fts_p50],
+    "p95_ms": [like_p95, fts_p95],
+}).round(3).to_string(index=False))
+print()
+
+# Reading the numbers: LIKE can stop as soon as it finds 5 rows, so common words are quick
+# (but the 5 rows are arbitrary); rare or missing words force a scan of every row (the p95).
+# FTS5 looks the words up in its index and ranks every match, so its time depends on
+# how many rows match, not on how big the table is.
+
 # 4. RAG WORKFLOW ###################################
 
 # Example: Search for documents about a specific topic
 input_data = {"topic": "database"}
 
-# Task 1: Data Retrieval - Search the database for relevant documents; limit to 3 results
-result1 = search_documents(input_data["topic"], conn, limit=3)
+# Task 1: Data Retrieval - Search the database for the 3 most relevant documents (BM25-ranked)
+result1 = search_documents_fts(input_data["topic"], conn, limit=3)
 
-# Convert results to JSON for the LLM
-# Convert DataFrame to dictionary, then to JSON
-result1_dict = result1.to_dict(orient="records")
-result1_json = json.dumps(result1_dict, indent=2)
+# Convert results to JSON for the LLM, one compact row per document.
+# pack_context() keeps only the columns the model needs, drops weak matches,
+# and trims long content so the prompt stays within CONTEXT_BUDGET tokens.
+result1_json = pack_context(
+    result1,
+    budget=CONTEXT_BUDGET,
+    keep_columns=["title", "category", "author", "tags", "content"]
+)
 
 # Task 2: Generation augmented with the retrieved data
 # Generate a summary of the retrieved documents
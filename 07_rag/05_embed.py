@@ -36,9 +36,6 @@ import os        # for file path operations
 import runpy     # for executing another Python script
 from dotenv import load_dotenv
 import requests  # for HTTP requests
-import sqlite3
-from sentence_transformers import SentenceTransformer
-from sqlite_vec import load as sqlite_vec_load, serialize_float32
 
 # 0.2 Working Directory #################################
 
@@ -67,13 +64,51 @@ except ImportError:
 # To find the path for use in R, in git bash run:
 # python -c "import sqlite_vec; print(sqlite_vec.loadable_path())"
 
-DB_PATH = "data/embed.db"  # path to your new vector embeddings database
-if os.path.exists(DB_PATH): os.remove(DB_PATH) 
-else: print("No database found, creating new one.")
+DB_PATH = "data/embed.db"  # path to your vector embeddings database (reused across runs)
+if not os.path.exists(DB_PATH): print("No database found, creating new one.")
 DOCUMENT = "data/lower_manhattan_recovery_plan.txt"  # path to text doc
-EMBED_MODEL = "all-MiniLM-L6-v2"  # model for embedding text into vectors
-VEC_DIM = 384   # all-MiniLM-L6-v2 output size
+PLANS_FOLDER = os.getenv("EMBED_PLANS_FOLDER", "")  # e.g. "data/plans" to also index every plan
+
+# How to chunk the text:
+# - "windows" streams overlapping windows of ~120 words within each paragraph block (fewer, more informative chunks)
+# - "sentences" splits on "." (many tiny chunks; the original approach)
+CHUNK_MODE = os.getenv("EMBED_CHUNK_MODE", "windows")
+
+# How to store the vectors: "" for float32 (exact), or "int8" / "bit" for compact vectors
+# that are searched first and then rescored with float32 (see 05_embed_quantize.py for a comparison).
+QUANTIZE = os.getenv("EMBED_QUANTIZE", "") or None
+
+# Where to keep the vectors:
+# - "sqlite-vec" stores them in a vec0 table inside embed.db (needs the sqlite-vec extension)
+# - "numpy" stores them in a memory-mapped data/embed_vectors.npy matrix (plain sqlite3 only; float only)
+# - "ivf" is "numpy" plus an approximate (IVF) index, so search time stays flat as the corpus grows
+BACKEND = os.getenv("EMBED_BACKEND", "sqlite-vec")
+IVF_N_PROBE = int(os.getenv("EMBED_IVF_PROBE", "8"))  # "ivf" only: partitions searched per query (more = better recall)
 MODEL = "gpt-oss:20b-cloud"  # cloud model (Ollama Cloud; for RAG answer step)
+CONTEXT_BUDGET = int(os.getenv("RAG_CONTEXT_BUDGET", "1500"))  # max tokens of retrieved text per prompt
+# Rerank: set EMBED_RERANK=1 to let a cross-encoder pick the best k out of ~30 first-stage hits.
+# Costs a second (small) model and some milliseconds, but puts fewer, better chunks in the prompt.
+RERANK = os.getenv("EMBED_RERANK", "0") == "1"
+
+# How to build the index:
+# - "batched" only embeds new or changed chunks, in batches, and bulk-inserts them in one transaction (fast)
+# - "loop" clears the index, then embeds and inserts one chunk at a time (slow, but easy to read)
+BUILD_MODE = os.getenv("EMBED_BUILD_MODE", "batched")
+BUILD_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # chunks per encode() call
+BUILD_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # >1 spreads encoding over a process pool
+# The on-disk embedding cache (functions_embed.py) would answer the second mode you time from the
+# vectors the first one saved, so the build skips it by default. EMBED_BUILD_CACHE=1 uses it.
+BUILD_CACHE = os.getenv("EMBED_BUILD_CACHE", "0") == "1"
+
+## 0.3 Load Functions ##########################
+
+# Load our embedding, indexing, and search helpers (see functions_embed.py).
+from functions_embed import (
+    EMBED_MODEL, connect_db, create_tables, clear_index, get_text, iter_token_windows, list_documents,
+    build_index_from_document, open_store, sync_document, sync_files, Retriever, SemanticCache,
+)
+# ...and the context packer (see functions.py)
+from functions import pack_context
 
 
 # 1. FUNCTIONS ################################
@@ -123,96 +158,25 @@ def agent_run(role, task, model="gpt-oss:20b-cloud"):
     return output
 
 
-# We want to convert a given text sentence into a vector of numbers, called an 'embedding'
-# These embeddings are then stored in a database and can be used to numerically search for the most relevant chunks for a given query.
-# We'll use sentence-transformers to embed the text.
-# Load sentence_transformers once; encode() returns a list of floats.
-
-_embed_model = None
-
-# Get the sentence-transformers model
-def get_embed_model(model_name=None):
-    global _embed_model
-    if _embed_model is None:
-        _embed_model = SentenceTransformer(EMBED_MODEL)
-    return _embed_model
-
-# Encode the text into a vector of numbers
-def embed(text):
-    m = get_embed_model()
-    vec = m.encode(text)
-    return vec.tolist()  # numpy array -> list of floats
-
-# Write a function to read in the document into meaningful text chunks.
-def get_text(document_path):
-    # Split the document into chunks
-    with open(document_path, "r", encoding="UTF-8") as f:
-        raw = f.read()
-    # Concatenate the lines into a single string (already one string), split on period
-    parts = raw.replace("\n", " ").split(".")
-    # Trim whitespace and return only non-empty chunks
-    chunks = [p.strip() for p in parts if p.strip()]
-    return chunks
-
-# Embed each chunk and insert into vec_chunks (float32 blob + text).
-# R uses a single vec0 table with id, embedding, +text; Python sqlite_vec uses
-# a vec0 virtual table (rowid, embedding) plus a chunks table (id, text) for compatibility.
-def build_index_from_document(conn, chunks):
-    # Given a database connection 'conn' and a list of text chunks 'chunks',
-    # embed each chunk and insert into database (chunks table + vec_chunks virtual table).
-    n = len(chunks)
-    print(f"Embedding {n} chunks with {EMBED_MODEL}...")
-    for i, text in enumerate(chunks):
-        # Embed the chunk
-        vec = embed(text)
-        # Convert the vector to a float32 blob
-        blob = serialize_float32(vec)
-        # Insert the chunk into the chunks table
-        conn.execute("INSERT INTO chunks (id, text) VALUES (?, ?)", (i, text))
-        # Insert into vec_chunks (rowid aligns with chunks.id)
-        conn.execute(
-            "INSERT INTO vec_chunks (rowid, embedding) VALUES (?, ?)",
-            (i, blob)
-        )
-    conn.commit()
-    print("Index built.\n")
-
-
-# SEMANTIC SEARCH
-
-# Create a function to perform semantic search on the vector embeddings database,
-# using the KNN search algorithm for similarity search with sqlite-vec.
-# KNN runs inside the DB: embed query, MATCH in SQL, return top k. Score = 1 - distance (higher = more similar).
-def search_embed_sql(conn, query, k=3):
-    query_vec = embed(query)
-    query_blob = serialize_float32(query_vec)
-    cur = conn.execute(
-        """
-        SELECT rowid, distance
-        FROM vec_chunks
-        WHERE embedding MATCH ?
-        ORDER BY distance
-        LIMIT ?
-        """,
-        (query_blob, k)
-    )
-    rows = cur.fetchall()
-    if not rows:
-        return []
-    out = []
-    for rowid, distance in rows:
-        (text,) = conn.execute("SELECT text FROM chunks WHERE id = ?", (rowid,)).fetchone()
-        score = 1 - distance
-        out.append({"id": rowid, "score": score, "text": text})
-    return out
-
-# Connect and load sqlite-vec.
-def connect_db(path=DB_PATH):
-    conn = sqlite3.connect(path)
-    conn.enable_load_extension(True)
-    sqlite_vec_load(conn)
-    conn.enable_load_extension(False)
-    return conn
+# Answer a question with RAG: retrieve the top-k chunks, then ask the LLM.
+# If a near-identical question was already answered from the same chunks (with the same model and role),
+# reuse that answer from the semantic cache instead of calling the LLM again.
+def rag_answer(retriever, answer_cache, query, role, k=3):
+    hits = retriever.search_hybrid(query, k=k, rerank=RERANK)
+    (query_vec,) = retriever.embed_queries([query])  # already cached by the search above
+    chunk_ids = [hit["id"] for hit in hits]
+    answer = answer_cache.get(query_vec, chunk_ids, scope=(MODEL, role))
+    if answer is None:
+        context = pack_context(hits, budget=CONTEXT_BUDGET)
+        answer = agent_run(role=role, task=f"{query} | {context}", model=MODEL)
+        answer_cache.put(query_vec, chunk_ids, answer, scope=(MODEL, role))
+    return answer, hits
+
+
+# Our embedding, indexing, and search helpers
+# (get_embed_model, embed, embed_batch, get_text, iter_token_windows, connect_db, create_tables,
+# build_index_from_document, build_index_batched, sync_document, sync_files, search_embed_sql, Retriever)
+# live in functions_embed.py, so other scripts can reuse them.
 
 # 2. SEMANTIC SEARCHWORKFLOW ################
 
@@ -222,33 +186,50 @@ print("--------------------------------")
 
 # Finally, in this section, we'll put it all together and build the index from the document.
 
-# Read in the document into meaningful chunks, where each chunk is a sentence.
-chunks = get_text(DOCUMENT)
+# Read in the document into meaningful chunks: overlapping word windows, or sentences.
+# Each window chunk also records its character offsets in the document.
+chunker = get_text if CHUNK_MODE == "sentences" else iter_token_windows
+chunks = list(chunker(DOCUMENT))
 n = len(chunks)
-print(f"Found {n} chunks in the document.")
+print(f"Found {n} chunks in the document ({CHUNK_MODE}).")
 
 
 
-conn = connect_db(DB_PATH)
+# Only load the sqlite-vec extension if the vectors live in sqlite-vec
+conn = connect_db(DB_PATH, load_vec=(BACKEND == "sqlite-vec"))
+store = open_store(conn, BACKEND)
+if BACKEND == "ivf":
+    store.n_probe = IVF_N_PROBE
 
-# Create the chunks table and vec_chunks virtual table.
+# Create the chunks table and the vector store (a vec_chunks virtual table, or .npy files).
 # vec0 virtual table: rowid, embedding (float32). Cosine distance for similarity search.
 # We keep id and text in chunks so we can join after MATCH.
-conn.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, text TEXT NOT NULL)")
-conn.execute("DROP TABLE IF EXISTS vec_chunks")
-conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks USING vec0(embedding float[{VEC_DIM}] distance_metric=cosine)")
-conn.commit()
+# (Changing QUANTIZE or BACKEND rebuilds the index.)
+create_tables(conn, quantize=QUANTIZE, store=store)
 
 # Construct the embedding database (takes longer for larger text documents)
-n_chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
-if n_chunks == 0:
-    import time
-    start = time.perf_counter()
-    build_index_from_document(conn, chunks)
-    elapsed = time.perf_counter() - start
-    print(f"Time taken to build index: {elapsed:.2f} seconds\n")
+# In "batched" mode we sync the index instead of rebuilding it: each chunk is stored with a hash
+# of its text, so a rerun on an unchanged document embeds nothing and finishes in milliseconds.
+# Edited chunks are re-embedded, and chunks that disappeared from the document are deleted.
+if BUILD_MODE == "loop":
+    clear_index(conn, store=store)
+    stats = build_index_from_document(conn, chunks, source=DOCUMENT, store=store, cache=BUILD_CACHE)
+    print(f"Time taken to build index ({BUILD_MODE}): {stats['seconds']:.2f} seconds "
+          f"({stats['chunks_per_sec']:.1f} chunks/sec)\n")
 else:
-    print("Using existing embedding index.\n")
+    stats = sync_document(conn, DOCUMENT, chunks, batch_size=BUILD_BATCH_SIZE, workers=BUILD_WORKERS, store=store,
+                          cache=BUILD_CACHE)
+    print(f"Synced index for {DOCUMENT}: {stats['added']} added, {stats['removed']} removed, "
+          f"{stats['kept']} unchanged ({stats['seconds']:.3f} seconds)\n")
+
+# Optionally, index every recovery plan in a folder too.
+# Only plans that are new or edited cost any embedding time.
+if PLANS_FOLDER:
+    results = sync_files(conn, list_documents(PLANS_FOLDER), chunker=chunker,
+                         batch_size=BUILD_BATCH_SIZE, workers=BUILD_WORKERS, store=store, cache=BUILD_CACHE)
+    added = sum(r["added"] for r in results)
+    seconds = sum(r["seconds"] for r in results)
+    print(f"Synced {len(results)} plans in {PLANS_FOLDER}: {added} chunks embedded ({seconds:.2f} seconds)\n")
 #
 # conn.execute("SELECT * FROM chunks LIMIT 3;").fetchall()
 # conn.execute("SELECT * FROM vec_chunks LIMIT 3;").fetchall()
@@ -262,8 +243,13 @@ preview = conn.execute("SELECT id, text FROM chunks LIMIT 5").fetchall()
 for row in preview:
     print(row)
 
+# Open one Retriever for the rest of the workflow.
+# It reuses this connection and vector store and caches query embeddings, so every search below
+# is a single joined SQL query or matrix product (and repeated questions skip the encoder).
+retriever = Retriever(store=store)
+
 # Do a test search
-test = search_embed_sql(conn, "vulnerability", k=3)
+test = retriever.search("vulnerability", k=3)
 
 print("--------------------------------")
 print("🔍 TEST SEARCH:")
@@ -271,8 +257,17 @@ print("--------------------------------")
 
 print(test)
 
-# Disconnect from the database
-conn.close()
+# Hybrid search: keyword (BM25) and vector search run at the same time, and their rankings are
+# fused (reciprocal rank fusion). Exact terms like "CDBG-DR" are found by keyword search,
+# paraphrased questions by vector search, all in one call.
+test_hybrid = retriever.search_hybrid("CDBG-DR funding eligibility", k=3)
+
+print("--------------------------------")
+print("🔍 TEST HYBRID SEARCH:")
+print("--------------------------------")
+
+for row in test_hybrid:
+    print(row["id"], round(row["score"], 4), row["text"][:100])
 
 # 3. RAG WORKFLOW #############################
 
@@ -280,14 +275,11 @@ print("--------------------------------")
 print("🔍 RAG WORKFLOW:")
 print("--------------------------------")
 
-# Reconnect to the database
-conn = connect_db(DB_PATH)
+# Cache LLM answers, so near-identical questions skip the LLM call (see SemanticCache)
+answer_cache = SemanticCache()
 
 # A real query from a user!
 query = "Does the recovery plan use a community resilience approach to recovery?"
-result1 = search_embed_sql(conn, query, k=3)
-context = "\n\n".join(row["text"] for row in result1)
-print(context)
 
 role = (
     "You are a helpful assistant that answers questions about a community recovery plan. "
@@ -297,9 +289,17 @@ role = (
     "<user original query> | <context from vector database search>"
 )
 
-result2 = agent_run(role=role, task=f"{query} | {context}", model=MODEL)
+result2, result1 = rag_answer(retriever, answer_cache, query, role, k=3)
+# The context the model saw: deduplicated, weak matches dropped, capped at CONTEXT_BUDGET tokens
+context = pack_context(result1, budget=CONTEXT_BUDGET)
+print(context)
 print(result2)
 
+# Ask (nearly) the same question again: if it retrieves the same chunks and is similar enough,
+# the answer comes straight from the cache.
+result2_again, _ = rag_answer(retriever, answer_cache, "Does the recovery plan use a community-resilience approach to recovery?", role, k=3)
+print(f"Answer cache: {answer_cache.stats()}")
+
 
 print("--------------------------------")
 print("🔍 FACT-CHECKING WORKFLOW:")
@@ -328,5 +328,6 @@ result3 = agent_run(role=role, task=f"{query} | {context}", model=MODEL)
 print(result3)
 print(json.loads(result3))  # parse the JSON string!
 
-# Disconnect from the database
+# Disconnect from the database (and stop the retriever's keyword search thread)
+retriever.close()
 conn.close()
@@ -0,0 +1,149 @@
+# 05_embed_quantize.py
+# Compare Float vs Quantized (int8 / bit) Vector Indexes
+# Pairs with 05_embed.py
+# Tim Fraser
+
+# Every chunk in data/embed.db stores a 384-number float32 vector (1,536 bytes).
+# sqlite-vec can also store vectors as int8 (384 bytes) or as bits (48 bytes),
+# which makes the KNN scan much cheaper, but slightly less accurate.
+# A common fix is to search the compact vectors first, then rescore the top candidates
+# with the full float vectors. This script builds all three versions of the same index
+# and reports recall@k, index size, and query latency against the float baseline.
+# No Ollama server is needed: we only embed and search.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import os        # for file path operations
+import tempfile  # for a scratch folder to hold the comparison databases
+import time      # for timing queries
+import pandas as pd  # for the report table
+
+# pip install sentence-transformers sqlite-vec pandas
+
+## 0.2 Working Directory #################################
+
+# Get the directory of the current script
+script_dir = os.path.dirname(os.path.abspath(__name__))
+os.chdir(script_dir)
+
+## 0.3 Load Functions #################################
+
+from functions_embed import (
+    Retriever, connect_db, create_tables, knn_rows, list_documents, quantize_index, serialize_float32, sync_files,
+)
+
+## 0.4 Configuration #################################
+
+DOCUMENT = "data/lower_manhattan_recovery_plan.txt"  # the plan used in 05_embed.py
+PLANS_FOLDER = os.getenv("EMBED_PLANS_FOLDER", "")  # e.g. "data/plans" for a bigger comparison
+K = 5  # top-k results to compare
+REPEATS = 20  # times to run each query when timing
+
+# Questions we'd realistically ask about a recovery plan
+QUERIES = [
+    "Does the recovery plan use a community resilience approach to recovery?",
+    "vulnerability",
+    "Which neighborhoods flooded during Superstorm Sandy?",
+    "How will the plan protect critical infrastructure like power and transit?",
+    "What role did the planning committee and public meetings play?",
+    "How much funding is available for reconstruction projects?",
+    "economic recovery for small businesses",
+    "coastal protection and storm surge barriers",
+    "housing for vulnerable populations and seniors",
+    "emergency communication and evacuation",
+]
+
+
+# 1. FUNCTIONS ###################################
+
+# Share of the baseline top-k ids that a candidate result also found (1.0 = identical).
+def recall_at_k(baseline_ids, candidate_ids):
+    if not baseline_ids:
+        return 1.0
+    return len(set(baseline_ids) & set(candidate_ids)) / len(baseline_ids)
+
+# Run every query against one index; return its top-k ids and latency stats (milliseconds).
+def run_queries(conn, blobs, mode, rescore_factor):
+    ids = []
+    times = []
+    for blob in blobs:
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            rows = knn_rows(conn, blob, k=K, mode=mode, rescore_factor=rescore_factor)
+            times.append((time.perf_counter() - start) * 1000)
+        ids.append([r["id"] for r in rows])
+    times = pd.Series(times)
+    return ids, times.quantile(0.5), times.quantile(0.95)
+
+
+# 2. BUILD THE INDEXES ###################################
+
+print("--------------------------------")
+print("🧮 BUILDING FLOAT, INT8 AND BIT INDEXES:")
+print("--------------------------------")
+
+# Scratch folder for the three databases; deleted at the end of the run (or when Python exits)
+scratch = tempfile.TemporaryDirectory(prefix="embed_quantize_")
+tmp_dir = scratch.name
+paths = {mode: os.path.join(tmp_dir, f"embed_{mode}.db") for mode in ["float", "int8", "bit"]}
+
+# Embed once into a float index...
+documents = [DOCUMENT] + (list_documents(PLANS_FOLDER) if PLANS_FOLDER else [])
+conn = connect_db(paths["float"])
+create_tables(conn)
+sync_files(conn, documents)
+n_chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+conn.close()
+print(f"Embedded {n_chunks} chunks from {len(documents)} document(s).")
+
+# ...then quantize those same vectors (no re-embedding needed)
+for mode in ["int8", "bit"]:
+    quantize_index(paths["float"], paths[mode], mode).close()
+
+# VACUUM so file sizes reflect the data, not leftover free pages
+for path in paths.values():
+    vac = connect_db(path)
+    vac.execute("VACUUM")
+    vac.close()
+
+
+# 3. COMPARE ###################################
+
+print("--------------------------------")
+print("📊 QUANTIZATION REPORT:")
+print("--------------------------------")
+
+# Embed the queries once, so we time only the search itself
+baseline = Retriever(paths["float"])
+blobs = [serialize_float32(vec) for vec in baseline.embed_queries(QUERIES)]
+baseline_ids, float_p50, float_p95 = run_queries(baseline.conn, blobs, "float", 1)
+baseline.close()
+
+rows = [{
+    "index": "float", "rescore_factor": None, f"recall@{K}": 1.0,
+    "size_mb": os.path.getsize(paths["float"]) / 1e6, "p50_ms": float_p50, "p95_ms": float_p95,
+}]
+
+# For each quantized index, try the coarse pass alone (rescore_factor=1: just reorders its own top-k)
+# and with a wider candidate set rescored against the float vectors.
+for mode in ["int8", "bit"]:
+    qconn = connect_db(paths[mode])
+    for factor in [1, 4, 8, 16]:
+        ids, p50, p95 = run_queries(qconn, blobs, mode, factor)
+        recall = sum(recall_at_k(b, c) for b, c in zip(baseline_ids, ids)) / len(ids)
+        rows.append({
+            "index": mode, "rescore_factor": factor, f"recall@{K}": recall,
+            "size_mb": os.path.getsize(paths[mode]) / 1e6, "p50_ms": p50, "p95_ms": p95,
+        })
+    qconn.close()
+
+report = pd.DataFrame(rows).round(3)
+print(report.to_string(index=False))
+
+scratch.cleanup()  # remove the comparison databases
+
+# Note: quantized databases keep the float vectors too (in chunk_vectors) for rescoring,
+# so the file is not smaller than the float one; what shrinks is the data the KNN scan reads
+# (1,536 bytes per chunk for float, 384 for int8, 48 for bit).
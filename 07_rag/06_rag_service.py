@@ -0,0 +1,223 @@
+# 06_rag_service.py
+# Persistent RAG Query Service (FastAPI)
+# Pairs with 05_embed.py
+# Tim Fraser
+
+# Each 05_embed.py run pays the full startup cost for every question:
+# it starts Ollama, imports sentence-transformers, loads the embedding model, and opens the database.
+# This script wraps the same retrieval in a small web service that does all of that ONCE, at startup,
+# and keeps the model, database connection, and query cache warm between questions.
+# Each request then only pays for retrieval (+ generation, for /answer), and the service
+# reports how long each step took.
+#
+# Endpoints:
+# - GET  /health  -> is the service up, and how many chunks are indexed?
+# - POST /search  -> {"query": "...", "k": 3, "hybrid": true} -> top-k chunks
+# - POST /answer  -> {"query": "...", "k": 3} -> retrieved chunks + the LLM's answer
+# - GET  /stats   -> request counts and median / 95th percentile latency per step
+#
+# Build the index first with 05_embed.py, make sure Ollama is running (see 01_ollama.py), then run:
+#   python -m uvicorn 06_rag_service:app --port 8001
+# (from this folder), and try:
+#   curl -X POST localhost:8001/search -H "Content-Type: application/json" -d '{"query": "flooding"}'
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import os        # for file paths and environment variables
+import time      # for timing each step
+from collections import deque  # for keeping recent timings
+from contextlib import asynccontextmanager  # for startup/shutdown work
+
+import pandas as pd  # for latency percentiles
+import requests  # for HTTP requests to Ollama
+from dotenv import load_dotenv  # for loading OLLAMA_API_KEY from .env
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool  # for running slow LLM calls off the event loop
+from pydantic import BaseModel, Field
+
+# If you haven't already, install these packages...
+# pip install fastapi uvicorn sentence-transformers sqlite-vec python-dotenv
+
+## 0.2 Working Directory #################################
+
+# Set working directory to this script's folder so relative paths work consistently.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+os.chdir(script_dir)
+load_dotenv()
+
+## 0.3 Load Functions #################################
+
+from functions_embed import DB_PATH, EMBED_MODEL, Retriever, SemanticCache, embed, get_embed_model
+from functions import pack_context
+
+## 0.4 Configuration #################################
+
+BACKEND = os.getenv("EMBED_BACKEND", "sqlite-vec")  # vector store used by 05_embed.py
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")  # or https://ollama.com
+OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY", "")  # only needed for Ollama Cloud
+MODEL = os.getenv("RAG_MODEL", "smollm2:1.7b")  # model for the /answer step
+CONTEXT_BUDGET = int(os.getenv("RAG_CONTEXT_BUDGET", "1500"))  # max tokens of retrieved text per prompt
+REQUEST_TIMEOUT = 120  # seconds to wait for the LLM
+TIMING_WINDOW = 1000  # recent requests kept for /stats
+
+ROLE = (
+    "You are a helpful assistant that answers questions about a community recovery plan. "
+    "Answer the question provided by the user, using only the context provided by the user. "
+    "Format your response as markdown with a title and clear bullet points. "
+    "Content will be provided to the assistant in the following format: "
+    "<user original query> | <context from vector database search>"
+)
+
+
+# 1. SERVICE STATE ###################################
+
+# Everything we want to keep warm between requests lives here.
+# It is filled in once, at startup (see lifespan()).
+state = {
+    "retriever": None,  # Retriever: open DB connection + vector store + query-embedding cache
+    "session": None,    # requests.Session: reuses the HTTP connection to Ollama
+    "answer_cache": SemanticCache(),  # reuses answers to near-identical questions (same chunks, same model)
+    "timings": {"search": deque(maxlen=TIMING_WINDOW), "answer": deque(maxlen=TIMING_WINDOW)},
+    "startup_seconds": None,
+}
+
+# Startup: load the embedding model, open the database, and warm everything up with one query.
+# Shutdown: close the database and HTTP session.
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    start = time.perf_counter()
+    get_embed_model()
+    embed("warm up")  # the first encode() is slow; pay for it now, not on the first request
+    state["retriever"] = Retriever(DB_PATH, backend=BACKEND)
+    state["retriever"].search_hybrid("warm up", k=1)
+    state["session"] = requests.Session()
+    if OLLAMA_API_KEY:
+        state["session"].headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
+    state["startup_seconds"] = time.perf_counter() - start
+    print(f"RAG service ready in {state['startup_seconds']:.2f} seconds.")
+    yield
+    state["retriever"].close()
+    state["session"].close()
+
+app = FastAPI(title="RAG Query Service", version="0.1.0", lifespan=lifespan)
+
+
+# 2. FUNCTIONS ###################################
+
+class SearchRequest(BaseModel):
+    query: str = Field(min_length=1)
+    k: int = Field(default=3, ge=1, le=50)
+    hybrid: bool = True  # keyword (BM25) + vector search fused with RRF; False = vector only
+    rerank: bool = False  # rerank ~30 first-stage hits with a cross-encoder, keeping the best k
+
+class AnswerRequest(SearchRequest):
+    model: str = MODEL
+
+# Retrieve the top-k chunks, returning them with the time taken (milliseconds).
+def retrieve(req):
+    retriever = state["retriever"]
+    start = time.perf_counter()
+    if req.hybrid:
+        hits = retriever.search_hybrid(req.query, k=req.k, rerank=req.rerank)
+    else:
+        hits = retriever.search(req.query, k=req.k, rerank=req.rerank)
+    return hits, (time.perf_counter() - start) * 1000
+
+# Ask the LLM to answer the question from the retrieved context.
+def generate(query, context, model):
+    body = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": ROLE},
+            {"role": "user", "content": f"{query} | {context}"},
+        ],
+        "stream": False,
+    }
+    response = state["session"].post(f"{OLLAMA_HOST}/api/chat", json=body, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["message"]["content"]
+
+# Median and 95th percentile of recent timings for each step, in milliseconds.
+def summarize(timings):
+    if not timings:
+        return {"requests": 0}
+    df = pd.DataFrame(list(timings))
+    out = {"requests": len(df)}
+    for col in df.columns:
+        out[f"{col}_p50"] = round(df[col].quantile(0.5), 2)
+        out[f"{col}_p95"] = round(df[col].quantile(0.95), 2)
+    return out
+
+
+# 3. ENDPOINTS ###################################
+
+# Note: every endpoint is "async def", so database work runs on the event loop's thread,
+# the same thread that opened the database connection (SQLite connections can't be shared
+# across threads). The slow LLM call runs in a worker thread so other requests aren't blocked.
+@app.get("/health")
+async def health():
+    conn = state["retriever"].conn
+    n_chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    return {
+        "status": "ok",
+        "embed_model": EMBED_MODEL,
+        "backend": BACKEND,
+        "chunks": n_chunks,
+        "startup_seconds": round(state["startup_seconds"], 2),
+    }
+
+@app.post("/search")
+async def search(req: SearchRequest):
+    hits, retrieval_ms = retrieve(req)
+    state["timings"]["search"].append({"retrieval_ms": retrieval_ms})
+    return {"query": req.query, "hits": hits, "timing_ms": {"retrieval": round(retrieval_ms, 2)}}
+
+@app.post("/answer")
+async def answer(req: AnswerRequest):
+    hits, retrieval_ms = retrieve(req)
+    context = pack_context(hits, budget=CONTEXT_BUDGET)
+    start = time.perf_counter()
+    # Reuse the answer to a near-identical question if one was based on the same chunks
+    (query_vec,) = state["retriever"].embed_queries([req.query])
+    chunk_ids = [hit["id"] for hit in hits]
+    output = state["answer_cache"].get(query_vec, chunk_ids, scope=req.model)
+    cached = output is not None
+    if not cached:
+        try:
+            output = await run_in_threadpool(generate, req.query, context, req.model)
+        except requests.RequestException as e:
+            raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+        state["answer_cache"].put(query_vec, chunk_ids, output, scope=req.model)
+    generation_ms = (time.perf_counter() - start) * 1000
+    total_ms = retrieval_ms + generation_ms
+    state["timings"]["answer"].append(
+        {"retrieval_ms": retrieval_ms, "generation_ms": generation_ms, "total_ms": total_ms}
+    )
+    return {
+        "query": req.query,
+        "answer": output,
+        "cached": cached,
+        "hits": hits,
+        "timing_ms": {
+            "retrieval": round(retrieval_ms, 2),
+            "generation": round(generation_ms, 2),
+            "total": round(total_ms, 2),
+        },
+    }
+
+@app.get("/stats")
+async def stats():
+    return {
+        "search": summarize(state["timings"]["search"]),
+        "answer": summarize(state["timings"]["answer"]),
+        "query_cache": {
+            "hits": state["retriever"].cache_hits,
+            "misses": state["retriever"].cache_misses,
+        },
+        "answer_cache": state["answer_cache"].stats(),
+    }
+
+# Run the service:
+#   python -m uvicorn 06_rag_service:app --port 8001
@@ -0,0 +1,313 @@
+# 07_benchmark.py
+# Retrieval Benchmark: Build Time, Index Size, Latency and Recall@k
+# Pairs with 02-06 scripts in this folder
+# Tim Fraser
+
+# Did a change to chunking, storage, or search make retrieval faster or slower? Better or worse?
+# This script answers that with numbers, using the bundled data:
+# 1) the recovery plan (data/lower_manhattan_recovery_plan.txt), across every vector backend,
+#    plus keyword (BM25) and hybrid search,
+# 2) papers.db, LIKE scan vs FTS5 full-text search,
+# 3) pokemon.csv, reading the CSV per query vs the cached table,
+# each at several synthetic scale-ups (copies of the data), so we see how search time grows.
+# Every query has labelled relevant results, so we can report recall@k, not just speed.
+# It runs offline: no Ollama needed. (The embedding model must already be downloaded;
+# run 05_embed.py once, then you can set HF_HUB_OFFLINE=1.)
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import glob      # for finding index files
+import os        # for file paths and environment variables
+import sqlite3   # for SQLite database operations (built-in)
+import tempfile  # for a scratch folder to hold the benchmark indexes
+import time      # for timing
+import numpy as np   # for synthetic vectors
+import pandas as pd  # for the report
+
+# pip install sentence-transformers sqlite-vec numpy pandas
+
+## 0.2 Working Directory #################################
+
+# Get the directory of the current script
+script_dir = os.path.dirname(os.path.abspath(__name__))
+os.chdir(script_dir)
+
+## 0.3 Load Functions #################################
+
+from functions_embed import (
+    bm25_rows, chunk_hash, connect_db, create_tables, embed_batch, iter_token_windows,
+    open_store, rrf_fuse, sqlite_vec_load,
+)
+from functions import search_table
+
+## 0.4 Configuration #################################
+
+K = 5  # top-k results to score
+REPEATS = 10  # times to run each query when timing
+# Scale-ups: how many copies of each dataset to index (e.g. BENCH_SCALES="1,10,100,1000")
+SCALES = [int(x) for x in os.getenv("BENCH_SCALES", "1,10,100").split(",")]
+OUTPUT = os.getenv("BENCH_OUTPUT", "")  # optional CSV path for the report
+
+DOCUMENT = "data/lower_manhattan_recovery_plan.txt"
+PAPERS_DB = "data/papers.db"
+POKEMON_CSV = "data/pokemon.csv"
+
+# Vector backends to compare: (label, backend, quantize)
+VECTOR_BACKENDS = [
+    ("sqlite-vec", "sqlite-vec", None),
+    ("sqlite-vec int8", "sqlite-vec", "int8"),
+    ("sqlite-vec bit", "sqlite-vec", "bit"),
+    ("ivf", "ivf", None),
+    ("numpy", "numpy", None),  # last: keyword + hybrid search run on this index too
+]
+if sqlite_vec_load is None:
+    print("sqlite-vec is not installed; skipping the sqlite-vec backends.")
+    VECTOR_BACKENDS = [b for b in VECTOR_BACKENDS if b[1] != "sqlite-vec"]
+
+# Labelled queries. A result is relevant if its text contains the label phrase
+# (so labels survive changes to chunking).
+PLAN_QUERIES = [
+    ("Who served on the planning committee?", "planning committee"),
+    ("How were the public and community members engaged?", "public engagement"),
+    ("What funding is available for the projects?", "cdbg-dr"),
+    ("How will the plan help vulnerable populations?", "vulnerable populations"),
+    ("What happened during Superstorm Sandy?", "superstorm sandy"),
+    ("What is the NY Rising Community Reconstruction program?", "community reconstruction"),
+    ("Which projects are featured in the plan?", "featured projects"),
+    ("support for small businesses", "small business"),
+    ("damage from the tropical storm", "tropical storm"),
+    ("additional resiliency projects", "additional resiliency"),
+]
+# papers.db: query -> relevant document title
+PAPER_QUERIES = [
+    ("machine learning algorithms", "Introduction to Machine Learning"),
+    ("python coding standards", "Python Best Practices"),
+    ("tidyverse visualization", "R Data Analysis Workflow"),
+    ("query indexing performance", "SQL Query Optimization"),
+    ("containers deployment", "Docker Container Basics"),
+    ("REST endpoints", "API Design Principles"),
+    ("git branching", "Version Control with Git"),
+    ("schema normalization", "Database Normalization"),
+    ("hypothesis testing", "Statistical Hypothesis Testing"),
+    ("scraping ethics", "Web Scraping Ethics"),
+]
+# pokemon.csv: query -> relevant Name
+POKEMON_QUERIES = [
+    ("pikachu", "Pikachu"),
+    ("charizard", "Charizard"),
+    ("mewtwo", "Mewtwo"),
+    ("eevee", "Eevee"),
+    ("snorlax", "Snorlax"),
+]
+
+
+# 1. FUNCTIONS ###################################
+
+# Run each query REPEATS times; return the results of the last run and latency percentiles (ms).
+def time_queries(search_fn, queries):
+    results = []
+    times = []
+    for q in queries:
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            out = search_fn(q)
+            times.append((time.perf_counter() - start) * 1000)
+        results.append(out)
+    times = pd.Series(times)
+    return results, times.quantile(0.5), times.quantile(0.95)
+
+# recall@k: relevant results found in the top k, out of the most we could have found (min(k, # relevant)).
+def recall_at_k(found, n_relevant, k=K):
+    if n_relevant == 0:
+        return 1.0
+    return min(found, k) / min(k, n_relevant)
+
+# Total size of the files behind an index (database + any .npy files next to it).
+def index_size_mb(db_path):
+    prefix = os.path.splitext(db_path)[0]
+    paths = [db_path] + glob.glob(f"{prefix}_*.npy")
+    return sum(os.path.getsize(p) for p in paths) / 1e6
+
+# Make 'scale' copies of the chunks; copies get slightly jittered vectors (so they are not exact ties).
+def scale_up(records, vecs, scale, seed=42):
+    rng = np.random.default_rng(seed)
+    vecs = np.asarray(vecs, dtype=np.float32)
+    all_records = []
+    all_vecs = []
+    for copy in range(scale):
+        jittered = vecs if copy == 0 else vecs + rng.normal(0, 0.01, vecs.shape).astype(np.float32)
+        all_vecs.append(jittered / np.linalg.norm(jittered, axis=1, keepdims=True))
+        all_records += [dict(r, source=f"copy{copy}") for r in records]
+    return all_records, np.concatenate(all_vecs)
+
+# Build one vector index from already-embedded chunks; returns (conn, store, build seconds).
+def build_vector_index(path, backend, quantize, records, vecs):
+    conn = connect_db(path, load_vec=(backend == "sqlite-vec"))
+    store = open_store(conn, backend)
+    create_tables(conn, quantize=quantize, store=store)
+    start = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT INTO chunks (id, source, hash, char_start, char_end, text) VALUES (?, ?, ?, ?, ?, ?)",
+            [(i, r["source"], chunk_hash(r["text"]), r["char_start"], r["char_end"], r["text"])
+             for i, r in enumerate(records)]
+        )
+        store.add(list(range(len(records))), vecs)
+    return conn, store, time.perf_counter() - start
+
+
+# 2. RECOVERY PLAN: VECTOR, KEYWORD AND HYBRID SEARCH ###################################
+
+print("--------------------------------")
+print("📏 BENCHMARK: RECOVERY PLAN")
+print("--------------------------------")
+
+# Scratch folder for the benchmark indexes and scaled-up CSVs. It is deleted at the end of the run
+# (and, if the run fails part way, when Python exits).
+scratch = tempfile.TemporaryDirectory(prefix="rag_benchmark_")
+tmp_dir = scratch.name
+rows = []
+
+# Embed the document and the questions once (the embedding model is the same for every backend)
+records = list(iter_token_windows(DOCUMENT))
+start = time.perf_counter()
+vecs = embed_batch([r["text"] for r in records])
+embed_seconds = time.perf_counter() - start
+query_vecs = embed_batch([q for q, _ in PLAN_QUERIES])
+print(f"Embedded {len(records)} chunks in {embed_seconds:.2f} seconds ({len(records) / embed_seconds:.0f} chunks/sec).")
+
+for scale in SCALES:
+    scaled_records, scaled_vecs = scale_up(records, vecs, scale)
+    n_relevant = [sum(label in r["text"].lower() for r in scaled_records) for _, label in PLAN_QUERIES]
+
+    # Score a list of hit lists against the labels
+    def mean_recall(results):
+        found = [sum(label in h["text"].lower() for h in hits) for hits, (_, label) in zip(results, PLAN_QUERIES)]
+        return float(np.mean([recall_at_k(f, n) for f, n in zip(found, n_relevant)]))
+
+    for label, backend, quantize in VECTOR_BACKENDS:
+        path = os.path.join(tmp_dir, f"plan_{label.replace(' ', '_')}_{scale}.db")
+        conn, store, build_seconds = build_vector_index(path, backend, quantize, scaled_records, scaled_vecs)
+        results, p50, p95 = time_queries(lambda i: store.search(query_vecs[i], k=K), range(len(PLAN_QUERIES)))
+        rows.append({
+            "dataset": "recovery plan", "search": label, "scale": scale, "items": len(scaled_records),
+            "build_s": build_seconds, "size_mb": index_size_mb(path),
+            "p50_ms": p50, "p95_ms": p95, f"recall@{K}": mean_recall(results),
+        })
+
+        # Keyword and hybrid search use the chunks_fts table; run them once, on the numpy index
+        if backend == "numpy":
+            def hybrid(i):
+                keyword_hits = bm25_rows(conn, PLAN_QUERIES[i][0], k=20)
+                return rrf_fuse([keyword_hits, store.search(query_vecs[i], k=20)], k=K)
+            for search_label, search_fn in [
+                ("bm25", lambda i: bm25_rows(conn, PLAN_QUERIES[i][0], k=K)),
+                ("hybrid (bm25 + numpy)", hybrid),
+            ]:
+                results, p50, p95 = time_queries(search_fn, range(len(PLAN_QUERIES)))
+                rows.append({
+                    "dataset": "recovery plan", "search": search_label, "scale": scale, "items": len(scaled_records),
+                    "build_s": None, "size_mb": None,
+                    "p50_ms": p50, "p95_ms": p95, f"recall@{K}": mean_recall(results),
+                })
+        conn.close()
+    print(f"Scale {scale}x done.")
+
+
+# 3. PAPERS.DB: LIKE SCAN VS FTS5 ###################################
+
+print("--------------------------------")
+print("📏 BENCHMARK: PAPERS.DB")
+print("--------------------------------")
+
+def search_like(conn, query):
+    pattern = f"%{query}%"
+    return conn.execute(
+        "SELECT title FROM documents WHERE title LIKE ? OR content LIKE ? OR tags LIKE ? LIMIT ?",
+        (pattern, pattern, pattern, K)
+    ).fetchall()
+
+def search_fts(conn, query):
+    match = " ".join(f'"{w}"' for w in query.split())
+    return conn.execute(
+        "SELECT d.title FROM documents_fts JOIN documents AS d ON d.id = documents_fts.rowid "
+        "WHERE documents_fts MATCH ? ORDER BY bm25(documents_fts, 10.0, 1.0, 5.0) LIMIT ?",
+        (match, K)
+    ).fetchall()
+
+source = sqlite3.connect(f"file:{PAPERS_DB}?mode=ro", uri=True)
+for scale in SCALES:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, title TEXT, content TEXT, tags TEXT)")
+    originals = source.execute("SELECT title, content, tags FROM documents").fetchall()
+    conn.executemany("INSERT INTO documents (title, content, tags) VALUES (?, ?, ?)", originals * scale)
+    start = time.perf_counter()
+    conn.execute(
+        "CREATE VIRTUAL TABLE documents_fts USING fts5(title, content, tags, "
+        "content='documents', content_rowid='id', tokenize='porter unicode61')"
+    )
+    conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+    fts_build = time.perf_counter() - start
+    for label, search_fn, build_seconds in [("LIKE scan", search_like, None), ("FTS5 + BM25", search_fts, fts_build)]:
+        results, p50, p95 = time_queries(lambda q: search_fn(conn, q), [q for q, _ in PAPER_QUERIES])
+        # Relevant = the labelled paper (any of its copies) is in the top k
+        recall = np.mean([any(r[0] == title for r in res) for res, (_, title) in zip(results, PAPER_QUERIES)])
+        rows.append({
+            "dataset": "papers.db", "search": label, "scale": scale, "items": len(originals) * scale,
+            "build_s": build_seconds, "size_mb": None,
+            "p50_ms": p50, "p95_ms": p95, f"recall@{K}": float(recall),
+        })
+    conn.close()
+source.close()
+
+
+# 4. POKEMON.CSV: READ PER QUERY VS CACHED TABLE ###################################
+
+print("--------------------------------")
+print("📏 BENCHMARK: POKEMON.CSV")
+print("--------------------------------")
+
+def search_read_csv(path, query):
+    df = pd.read_csv(path)
+    return df[df["Name"].str.contains(query, case=False, na=False, regex=False)]
+
+pokemon = pd.read_csv(POKEMON_CSV)
+for scale in SCALES:
+    path = os.path.join(tmp_dir, f"pokemon_{scale}.csv")
+    pd.concat([pokemon] * scale).to_csv(path, index=False)
+    for label, search_fn in [
+        ("read_csv per query", lambda q: search_read_csv(path, q)),
+        ("cached table", lambda q: search_table(q, path, columns=["Name"])),
+    ]:
+        results, p50, p95 = time_queries(search_fn, [q for q, _ in POKEMON_QUERIES])
+        recall = np.mean([name in set(res["Name"]) for res, (_, name) in zip(results, POKEMON_QUERIES)])
+        rows.append({
+            "dataset": "pokemon.csv", "search": label, "scale": scale, "items": len(pokemon) * scale,
+            "build_s": None, "size_mb": os.path.getsize(path) / 1e6,
+            "p50_ms": p50, "p95_ms": p95, f"recall@{K}": float(recall),
+        })
+
+
+# 5. REPORT ###################################
+
+print("--------------------------------")
+print("📊 BENCHMARK REPORT:")
+print("--------------------------------")
+
+report = pd.DataFrame(rows).round(3)
+print(report.to_string(index=False))
+
+if OUTPUT:
+    report.to_csv(OUTPUT, index=False)
+    print(f"Saved report to {OUTPUT}")
+
+scratch.cleanup()  # remove the benchmark indexes
+
+# Reading the report:
+# - build_s: seconds to insert the (already embedded) chunks and build the index;
+#   embedding time is the same for every backend and is printed once above
+# - size_mb: files on disk for the index (quantized sqlite-vec databases also keep float vectors for rescoring)
+# - p50_ms / p95_ms: median and 95th percentile search time per query (query embedding excluded)
+# - recall@k: share of the labelled relevant results found in the top k (1.0 = all of them)
@@ -9,8 +9,20 @@
 
 ## 0.1 Load Packages #################################
 
+import math      # for rounding token estimates up
+import os        # for checking when a file last changed
+import re        # for splitting text into words
+import mmap      # for reading lines of big text files without loading them
 import requests  # for HTTP requests
+import asyncio   # for the async agent helpers
+import inspect   # for awaiting async tool functions
 import json      # for working with JSON
+import hashlib   # for hashing requests (response cache)
+import sqlite3   # for the response cache file (built-in)
+import threading # for guarding the response cache
+import time      # for response cache expiry
+import sys       # for finding tool functions in the calling script
+import numpy as np   # for fast boolean row filters
 import pandas as pd  # for data manipulation
 
 # If you haven't already, install these packages...
@@ -23,10 +35,142 @@ DEFAULT_MODEL = "smollm2:135m"
 PORT = 11434
 OLLAMA_HOST = f"http://localhost:{PORT}"
 CHAT_URL = f"{OLLAMA_HOST}/api/chat"
+REQUEST_TIMEOUT = 300  # seconds; used by agent_async()
+MAX_CONCURRENT_REQUESTS = 4  # max requests agent_async() sends to Ollama at the same time
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # seconds a cached response stays valid (see use_response_cache())
+RESPONSE_CACHE_MAX_ROWS = 2000  # least recently used responses are dropped beyond this
+
+# Context packing (see pack_context())
+CONTEXT_BUDGET = 1500  # max tokens of retrieved context per prompt; fit this to your model's context window
+CHARS_PER_TOKEN = 4    # rough size of a token in English text
+SCORE_TAIL_RATIO = 0.4  # drop results scoring below this share of the best result's score
 
 # 1. AGENT FUNCTION ###################################
 
-def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
+# Reuse one HTTP connection to Ollama across agent() calls, instead of opening a new one each time.
+_session = None
+
+
+def get_session():
+    """Return the shared requests.Session used by agent() (created on first use)."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def find_tool(func_name):
+    """Find a tool function by name: first in this module, then in the script being run (__main__)."""
+    func = globals().get(func_name)
+    if func is None:
+        func = getattr(sys.modules.get("__main__"), func_name, None)
+    return func
+
+
+# Optional response cache.
+# While you iterate on the later steps of a multi-agent script, the earlier agents get the exact same
+# request on every rerun, and each one takes seconds. With the cache on, agent() saves every Ollama
+# response in a small SQLite file, keyed by a hash of model + messages + tools + options, and answers
+# an identical request from that file instantly. (Tool functions still run every time.)
+# - Turn it on in a script with use_response_cache(), or set AGENT_CACHE_PATH=agent_cache.db.
+# - Skip it for one call with agent(..., cache=False), or for a whole run with AGENT_CACHE_BYPASS=1;
+#   either way the fresh response replaces the cached one.
+_response_cache = {
+    "path": os.getenv("AGENT_CACHE_PATH", ""),  # "" = cache off
+    "ttl": RESPONSE_CACHE_TTL,
+    "max_rows": RESPONSE_CACHE_MAX_ROWS,
+    "conn": None,
+}
+_response_cache_lock = threading.Lock()  # agent() may be called from several threads at once
+
+
+def use_response_cache(path="agent_cache.db", ttl=RESPONSE_CACHE_TTL, max_rows=RESPONSE_CACHE_MAX_ROWS):
+    """Turn on the response cache, stored in the SQLite file `path` (path=None turns it off)."""
+    with _response_cache_lock:
+        if _response_cache["conn"] is not None:
+            _response_cache["conn"].close()
+        _response_cache.update(path=path or "", ttl=ttl, max_rows=max_rows, conn=None)
+
+
+def response_cache_key(body):
+    """Hash everything that changes the answer (model, messages, tools, options) in a canonical order."""
+    request = {key: body.get(key) for key in ["model", "messages", "tools", "options", "format"]}
+    text = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _response_cache_conn():
+    # Open the cache file on first use (call with _response_cache_lock held)
+    if _response_cache["conn"] is None:
+        conn = sqlite3.connect(_response_cache["path"], check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+        )
+        _response_cache["conn"] = conn
+    return _response_cache["conn"]
+
+
+def cache_lookup(body):
+    """Return the cached response to this request, or None (cache off, bypassed, missing or expired)."""
+    if not _response_cache["path"] or os.getenv("AGENT_CACHE_BYPASS", "") == "1":
+        return None
+    key = response_cache_key(body)
+    now = time.time()
+    with _response_cache_lock:
+        conn = _response_cache_conn()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > _response_cache["ttl"]:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        conn.commit()
+    return json.loads(row[0])
+
+
+def cache_store(body, result):
+    """Save a response (if the cache is on), dropping expired rows and the least recently used beyond max_rows."""
+    if not _response_cache["path"]:
+        return
+    key = response_cache_key(body)
+    now = time.time()
+    with _response_cache_lock:
+        conn = _response_cache_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(result), now, now),
+        )
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - _response_cache["ttl"],))
+        n_extra = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - _response_cache["max_rows"]
+        if n_extra > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used LIMIT ?)",
+                (n_extra,),
+            )
+        conn.commit()
+
+
+def post_chat(body, cache=True):
+    """
+    POST a chat request to Ollama and return the parsed JSON.
+    If the response cache is on, an identical earlier request is answered from it
+    (cache=False skips the lookup and refreshes the cached response).
+    """
+    result = cache_lookup(body) if cache else None
+    if result is None:
+        start = time.perf_counter()
+        response = get_session().post(CHAT_URL, json=body)
+        response.raise_for_status()
+        result = response.json()
+        record_telemetry(result, body["model"], time.perf_counter() - start)
+        cache_store(body, result)
+    return result
+
+
+def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, cache=True, on_token=None):
     """
     Agent wrapper function that runs a single agent, with or without tools.
     
@@ -43,6 +187,12 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         List of tool metadata dictionaries for function calling
     all : bool
         If True, return all responses. If False, return only the last response.
+    cache : bool
+        If False, skip the response cache for this call (see use_response_cache()).
+    on_token : function, optional
+        If given (and there are no tools), the reply is streamed and on_token(piece) is called
+        for each piece as it arrives, e.g. on_token=lambda t: print(t, end="", flush=True).
+        Timing is saved in LAST_STREAM_STATS (see agent_stream()).
     
     Returns:
     --------
@@ -51,6 +201,13 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
     """
     
     # If the agent has NO tools, perform a standard chat
+    if tools is None and on_token is not None:
+        # Stream the reply, passing each piece to on_token as it arrives
+        pieces = []
+        for piece in agent_stream(messages, model=model, cache=cache):
+            on_token(piece)
+            pieces.append(piece)
+        return "".join(pieces)
     if tools is None:
         body = {
             "model": model,
@@ -58,9 +215,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             "stream": False
         }
         
-        response = requests.post(CHAT_URL, json=body)
-        response.raise_for_status()
-        result = response.json()
+        result = post_chat(body, cache=cache)
         
         return result["message"]["content"]
     else:
@@ -72,9 +227,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             "stream": False
         }
         
-        response = requests.post(CHAT_URL, json=body)
-        response.raise_for_status()
-        result = response.json()
+        result = post_chat(body, cache=cache)
         
         # For any given tool call, execute the tool call
         if "tool_calls" in result.get("message", {}):
@@ -85,8 +238,8 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
                 func_name = tool_call["function"]["name"]
                 func_args = json.loads(tool_call["function"]["arguments"])
                 
-                # Get the function from globals and execute it
-                func = globals().get(func_name)
+                # Find the function (this module or the calling script) and execute it
+                func = find_tool(func_name)
                 if func:
                     output = func(**func_args)
                     tool_call["output"] = output
@@ -100,7 +253,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             return result["message"]["content"]
 
 
-def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
+def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL, cache=True, on_token=None):
     """
     Run an agent with a specific role and task.
     
@@ -116,6 +269,10 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
         Output format (default: "text")
     model : str
         Model to use (default: DEFAULT_MODEL)
+    cache : bool
+        If False, skip the response cache for this call
+    on_token : function, optional
+        Stream the reply, calling on_token(piece) for each piece (see agent())
     
     Returns:
     --------
@@ -130,10 +287,335 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
     ]
     
     # Run the agent
-    resp = agent(messages=messages, model=model, output=output, tools=tools)
+    resp = agent(messages=messages, model=model, output=output, tools=tools, cache=cache, on_token=on_token)
     return resp
 
 
+## 1.1 Async Agent Functions #################################
+
+# agent_async() is agent() for asyncio: many requests can wait on Ollama at the same time
+# from a single thread. Every call shares one pooled httpx.AsyncClient (connections are reused),
+# and a semaphore keeps at most MAX_CONCURRENT_REQUESTS in flight so Ollama isn't flooded.
+# From a normal (non-async) script, agent_run_many() runs a whole batch and returns the answers in order.
+# pip install httpx
+
+# The client and semaphore belong to one event loop, and asyncio.run() makes a new loop each time,
+# so they are re-created whenever the running loop changes.
+_async_state = {"loop": None, "client": None, "semaphore": None}
+
+
+def get_async_client():
+    """Return the shared (httpx.AsyncClient, asyncio.Semaphore) for the running event loop."""
+    import httpx  # imported here, so scripts that only use agent() don't need httpx
+
+    loop = asyncio.get_running_loop()
+    if _async_state["loop"] is not loop:
+        _async_state["loop"] = loop
+        _async_state["client"] = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS),
+        )
+        _async_state["semaphore"] = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _async_state["client"], _async_state["semaphore"]
+
+
+async def close_async_client():
+    """Close the shared async client (agent_run_many() does this for you)."""
+    client = _async_state["client"]
+    _async_state.update(loop=None, client=None, semaphore=None)
+    if client is not None:
+        await client.aclose()
+
+
+async def agent_async(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, cache=True):
+    """
+    Async version of agent(): same arguments, same return values.
+    
+    Use `await agent_async(...)` inside async code; run several with asyncio.gather()
+    (or agent_run_many_async()) to overlap their requests.
+    Tool functions may be normal functions or async functions.
+    
+    Returns:
+    --------
+    str or list
+        The agent's response(s)
+    """
+    
+    body = {"model": model, "messages": messages, "stream": False}
+    if tools is not None:
+        body["tools"] = tools
+    
+    result = cache_lookup(body) if cache else None
+    if result is None:
+        client, semaphore = get_async_client()
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(CHAT_URL, json=body)
+        response.raise_for_status()
+        result = response.json()
+        record_telemetry(result, model, time.perf_counter() - start)
+        cache_store(body, result)
+    
+    # Without tools, just return the reply
+    if tools is None:
+        return result["message"]["content"]
+    
+    # Otherwise, execute each tool call (see agent())
+    tool_calls = result.get("message", {}).get("tool_calls")
+    for tool_call in tool_calls or []:
+        func_name = tool_call["function"]["name"]
+        raw_args = tool_call["function"].get("arguments", {})
+        func_args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
+        func = find_tool(func_name)
+        if func:
+            tool_output = func(**func_args)
+            if inspect.isawaitable(tool_output):
+                tool_output = await tool_output
+            tool_call["output"] = tool_output
+    
+    if all:
+        return result
+    if tool_calls:
+        return tool_calls[-1].get("output", result["message"]["content"])
+    return result["message"]["content"]
+
+
+async def agent_run_async(role, task, tools=None, output="text", model=DEFAULT_MODEL, cache=True):
+    """
+    Async version of agent_run(): run an agent with a specific role and task.
+    """
+    messages = [
+        {"role": "system", "content": role},
+        {"role": "user", "content": task}
+    ]
+    return await agent_async(messages=messages, model=model, output=output, tools=tools, cache=cache)
+
+
+async def agent_run_many_async(role, tasks, tools=None, output="text", model=DEFAULT_MODEL, cache=True):
+    """
+    Run the same agent on many tasks at once (asyncio.gather); answers come back in the order of `tasks`.
+    At most MAX_CONCURRENT_REQUESTS requests are sent to Ollama at the same time.
+    """
+    return await asyncio.gather(
+        *(agent_run_async(role, task, tools=tools, output=output, model=model, cache=cache) for task in tasks)
+    )
+
+
+def agent_run_many(role, tasks, tools=None, output="text", model=DEFAULT_MODEL, cache=True):
+    """
+    Run the same agent on many tasks concurrently, from normal (non-async) code.
+    
+    Parameters:
+    -----------
+    role : str
+        The system prompt defining the agent's role
+    tasks : list of str
+        One user message per request
+    tools, output, model, cache :
+        As in agent_run()
+    
+    Returns:
+    --------
+    list
+        One response per task, in the same order as `tasks`
+    
+    Note: this starts its own event loop, so it can't be called where one is already running
+    (e.g. a Jupyter cell); there, use `await agent_run_many_async(...)` instead.
+    """
+    
+    async def run_all():
+        try:
+            return await agent_run_many_async(role, tasks, tools=tools, output=output, model=model, cache=cache)
+        finally:
+            await close_async_client()
+    
+    return asyncio.run(run_all())
+
+
+## 1.2 Streaming Agent Functions #################################
+
+# With "stream": False we only see the reply once the whole thing is generated.
+# agent_stream() asks Ollama to stream instead: /api/chat then sends one JSON object per line
+# (NDJSON) as the model generates, and we yield each piece of text as soon as it arrives.
+# That lets a front-end show the reply as it is written, and lets the caller stop early
+# (break out of the loop and we hang up, which tells Ollama to stop generating).
+# Each call also records how long the first token took (time to first token, TTFT)
+# and how fast the rest came (tokens per second), in LAST_STREAM_STATS.
+LAST_STREAM_STATS = {}  # stats for the most recent agent_stream() call
+
+
+def agent_stream(messages, model=DEFAULT_MODEL, stats=None, cache=True):
+    """
+    Stream an agent's reply (no tools), yielding the text piece by piece as it is generated.
+    
+    Parameters:
+    -----------
+    messages : list
+        List of message dictionaries with 'role' and 'content' keys
+    model : str
+        The model to be used for the agent
+    stats : dict, optional
+        Filled in with ttft_s, total_s, tokens, tokens_per_sec and stopped_early
+        (also copied to LAST_STREAM_STATS)
+    cache : bool
+        If False, skip the response cache for this call (see use_response_cache())
+    
+    Yields:
+    -------
+    str
+        The next piece of the reply
+    
+    Example:
+    --------
+    for piece in agent_stream(messages):
+        print(piece, end="", flush=True)
+    """
+    
+    body = {"model": model, "messages": messages, "stream": True}
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    
+    # A cached reply arrives all at once
+    cached = cache_lookup(body) if cache else None
+    if cached is not None:
+        text = cached["message"]["content"]
+        stats.update(ttft_s=time.perf_counter() - start, total_s=time.perf_counter() - start,
+                     tokens=None, tokens_per_sec=None, stopped_early=False, cached=True)
+        LAST_STREAM_STATS.clear()
+        LAST_STREAM_STATS.update(stats)
+        yield text
+        return
+    
+    pieces = []
+    last = None  # the final chunk ("done": true) carries Ollama's own token counts
+    response = get_session().post(CHAT_URL, json=body, stream=True)
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            piece = chunk.get("message", {}).get("content", "")
+            if piece:
+                if not pieces:
+                    stats["ttft_s"] = time.perf_counter() - start
+                pieces.append(piece)
+                yield piece
+            if chunk.get("done"):
+                last = chunk
+                break
+    finally:
+        # Runs even if the caller stopped early: closing the response hangs up on Ollama
+        response.close()
+        total = time.perf_counter() - start
+        stats.setdefault("ttft_s", None)
+        stats["total_s"] = total
+        stats["stopped_early"] = last is None
+        stats["cached"] = False
+        if last is not None and last.get("eval_count") and last.get("eval_duration"):
+            stats["tokens"] = last["eval_count"]
+            stats["tokens_per_sec"] = last["eval_count"] / (last["eval_duration"] / 1e9)
+        else:
+            # No counts from Ollama (e.g. stopped early): count streamed pieces instead (~1 token each)
+            stats["tokens"] = len(pieces)
+            generating = total - (stats["ttft_s"] or 0)
+            stats["tokens_per_sec"] = len(pieces) / generating if generating > 0 else None
+        LAST_STREAM_STATS.clear()
+        LAST_STREAM_STATS.update(stats)
+    
+    # Only a complete reply (ended by the "done" chunk) is cached; a cut-off stream would be replayed truncated
+    if last is not None:
+        record_telemetry(last, model, stats["total_s"])
+        cache_store(body, {"message": {"role": "assistant", "content": "".join(pieces)}})
+
+
+## 1.3 Telemetry #################################
+
+# Every /api/chat reply from Ollama says where its time went (durations are in nanoseconds):
+# - load_duration:        loading the model into memory (large on the first call, ~0 after)
+# - prompt_eval_duration: reading the prompt (prompt_eval_count tokens)
+# - eval_duration:        generating the reply (eval_count tokens)
+# - total_duration:       all of the above, plus a little overhead
+# Set LLM_TELEMETRY_PATH (e.g. "telemetry.jsonl") and every agent call appends one JSON line with
+# these numbers, tagged by script, model and stage (see set_telemetry_stage()).
+# telemetry_summary() then shows, per stage, how much time went to loading, prompt and generation.
+# Responses served from the response cache are not recorded (they cost no model time).
+TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH", "")  # "" = telemetry off
+_telemetry = {"stage": ""}
+_telemetry_lock = threading.Lock()
+
+
+def set_telemetry_stage(stage):
+    """Tag the following agent calls with a stage name, e.g. set_telemetry_stage("agent 2: analysis")."""
+    _telemetry["stage"] = stage or ""
+
+
+def record_telemetry(result, model, wall_seconds, stage=None):
+    """Append one call's Ollama timing fields to TELEMETRY_PATH (JSONL), if telemetry is on; never raises."""
+    if not TELEMETRY_PATH:
+        return
+    
+    def ms(key):
+        return round(result.get(key, 0) / 1e6, 2)
+    
+    eval_count = result.get("eval_count", 0)
+    row = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "interactive",
+        "stage": stage if stage is not None else _telemetry["stage"],
+        "model": model,
+        "wall_ms": round(wall_seconds * 1000, 2),
+        "total_ms": ms("total_duration"),
+        "load_ms": ms("load_duration"),
+        "prompt_tokens": result.get("prompt_eval_count", 0),
+        "prompt_ms": ms("prompt_eval_duration"),
+        "eval_tokens": eval_count,
+        "eval_ms": ms("eval_duration"),
+        "tokens_per_sec": round(eval_count / (result["eval_duration"] / 1e9), 2) if result.get("eval_duration") else None,
+    }
+    # Telemetry is best effort: a write failure must not turn a good model reply into an error
+    try:
+        with _telemetry_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(TELEMETRY_PATH)), exist_ok=True)
+            with open(TELEMETRY_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+    except OSError as exc:
+        print(f"telemetry: could not write {TELEMETRY_PATH}: {exc}", file=sys.stderr)
+
+
+def telemetry_summary(path=None):
+    """
+    Summarize a telemetry file: one row per script / stage / model.
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        calls, total seconds, the share of time spent loading the model, reading the prompt
+        and generating, and the average generation speed (tokens per second)
+    """
+    
+    df = pd.read_json(path or TELEMETRY_PATH, lines=True)
+    out = df.groupby(["script", "stage", "model"], as_index=False).agg(
+        calls=("model", "size"),
+        total_ms=("total_ms", "sum"),
+        load_ms=("load_ms", "sum"),
+        prompt_ms=("prompt_ms", "sum"),
+        eval_ms=("eval_ms", "sum"),
+        prompt_tokens=("prompt_tokens", "sum"),
+        eval_tokens=("eval_tokens", "sum"),
+    )
+    out["total_s"] = out["total_ms"] / 1000
+    out["load_share"] = out["load_ms"] / out["total_ms"]
+    out["prompt_share"] = out["prompt_ms"] / out["total_ms"]
+    out["eval_share"] = out["eval_ms"] / out["total_ms"]
+    out["tokens_per_sec"] = out["eval_tokens"] / (out["eval_ms"] / 1000)
+    cols = ["script", "stage", "model", "calls", "total_s", "load_share", "prompt_share", "eval_share",
+            "prompt_tokens", "eval_tokens", "tokens_per_sec"]
+    return out[cols].sort_values("total_s", ascending=False).round(3)
+
+
 # 2. DATA CONVERSION FUNCTION ###################################
 
 def df_as_text(df):
@@ -155,3 +637,354 @@ def df_as_text(df):
     # pandas to_markdown() method creates markdown tables
     tab = df.to_markdown(index=False)
     return tab
+
+
+# 3. TABLE CACHE FUNCTIONS ###################################
+
+# Reading a CSV on every search repeats the same work each time.
+# TABLE_CACHE keeps each table in memory after the first read, together with a "haystack":
+# one lower-cased string per row that joins the searchable columns (separated by "\x1f",
+# a character that never appears in the data, so a keyword can't match across two columns).
+# A keyword search is then a plain substring check per row, which takes well under a millisecond.
+# Each entry remembers the file's modification time and size; if either changes, the file is re-read.
+TABLE_CACHE = {}
+
+def load_table(document, columns):
+    """
+    Load a CSV file (cached), with a lower-cased search column over 'columns'.
+    
+    Parameters:
+    -----------
+    document : str
+        Path to the CSV file
+    columns : list of str
+        Columns to make searchable
+    
+    Returns:
+    --------
+    dict
+        {"df": pandas.DataFrame, "haystack": list of str (one per row)}
+    """
+    
+    stat = os.stat(document)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (os.path.abspath(document), tuple(columns))
+    entry = TABLE_CACHE.get(key)
+    
+    # Re-read the file if it is new to us, or changed since we read it
+    if entry is None or entry["stamp"] != stamp:
+        df = pd.read_csv(document)
+        # Join the columns with str.cat (a header-only CSV gives an empty list, not an error)
+        text = df[columns].fillna("").astype(str)
+        haystack = text.iloc[:, 0].str.cat([text[c] for c in text.columns[1:]], sep="\x1f").str.lower().tolist()
+        entry = {"stamp": stamp, "df": df, "haystack": haystack}
+        TABLE_CACHE[key] = entry
+    
+    return entry
+
+def search_table(query, document, columns):
+    """
+    Find rows of a CSV file where any of 'columns' contains 'query' (case-insensitive, literal text).
+    
+    Parameters:
+    -----------
+    query : str
+        The search term to look for
+    document : str
+        Path to the CSV file to search
+    columns : list of str
+        Columns to search in
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Matching rows
+    """
+    
+    entry = load_table(document, columns)
+    needle = query.lower()
+    mask = np.fromiter((needle in row for row in entry["haystack"]), dtype=bool, count=len(entry["haystack"]))
+    return entry["df"][mask]
+
+
+# 4. TEXT INDEX FUNCTIONS ###################################
+
+# Scanning every line of a text file for every query gets slow for big documents.
+# An inverted index flips the file around: for every word, it lists the lines that contain it
+# (a "posting list"). A query then only looks up its words and keeps the lines that contain all
+# of them (the intersection of their posting lists), without re-reading the document.
+# We also store the byte offset where each line starts, and read matching lines straight from a
+# memory-mapped copy of the file (the OS loads only the pages we touch).
+# The index is saved next to the document (e.g. data/sample.txt.index.json), so it is built once;
+# it is rebuilt automatically if the document's modification time or size changes.
+# A query word also matches inside longer words ("learn" finds "learning"). To find those words
+# without checking the whole vocabulary, we also index every 3-letter piece (trigram) of every word:
+# only words that contain all of the query word's trigrams can contain the query word.
+TEXT_INDEX_CACHE = {}
+TERM_CACHE_SIZE = 1000  # query words whose matching lines are remembered, per document
+
+# Split text into lower-case words.
+def words_in(text):
+    return re.findall(r"\w+", text.lower())
+
+def build_text_index(document_path):
+    """
+    Build an inverted index of a text file: word -> line numbers, plus line byte offsets.
+    
+    Parameters:
+    -----------
+    document_path : str
+        Path to the text file
+    
+    Returns:
+    --------
+    dict
+        {"stamp": [mtime_ns, size], "offsets": list of int, "postings": dict of word -> list of int}
+    """
+    
+    stat = os.stat(document_path)
+    offsets = []
+    postings = {}
+    with open(document_path, "rb") as f:
+        position = 0
+        for i, line in enumerate(f):
+            offsets.append(position)
+            position += len(line)
+            for word in set(words_in(line.decode("utf-8", errors="replace"))):
+                postings.setdefault(word, []).append(i)
+    offsets.append(position)  # end of the last line
+    return {"stamp": [stat.st_mtime_ns, stat.st_size], "offsets": offsets, "postings": postings}
+
+def load_text_index(document_path):
+    """
+    Load a text file's inverted index (from memory, then from disk, else build and save it).
+    
+    Parameters:
+    -----------
+    document_path : str
+        Path to the text file
+    
+    Returns:
+    --------
+    dict
+        The index (see build_text_index()) plus "mmap", a memory map of the file (None if empty)
+    """
+    
+    stat = os.stat(document_path)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    key = os.path.abspath(document_path)
+    entry = TEXT_INDEX_CACHE.get(key)
+    if entry is not None and entry["stamp"] == stamp:
+        return entry
+    
+    # Try the saved index, and rebuild it if it is missing or out of date
+    index_path = f"{document_path}.index.json"
+    index = None
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    if index is None or index["stamp"] != stamp:
+        index = build_text_index(document_path)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+    
+    # Memory-map the document for reading matching lines
+    if entry is not None and entry["mmap"] is not None:
+        entry["mmap"].close()
+    index["mmap"] = None
+    if stat.st_size > 0:
+        with open(document_path, "rb") as f:
+            index["mmap"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    TEXT_INDEX_CACHE[key] = index
+    return index
+
+# Split a word into its 3-letter pieces ("learn" -> "lea", "ear", "arn").
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def term_lines(index, term):
+    """
+    Line numbers (0-based) of every line with a word that contains 'term'.
+    Built from the trigram index on first use, then remembered (up to TERM_CACHE_SIZE terms).
+    """
+    
+    cache = index.setdefault("term_lines", {})
+    if term in cache:
+        return cache[term]
+    postings = index["postings"]
+    if len(term) < 3:
+        # Too short for trigrams; such terms match a large share of the vocabulary anyway
+        words = [word for word in postings if term in word]
+    else:
+        if "trigrams" not in index:
+            grams = {}
+            for word in postings:
+                for gram in trigrams(word):
+                    grams.setdefault(gram, set()).add(word)
+            index["trigrams"] = grams
+        candidates = sorted((index["trigrams"].get(g, set()) for g in trigrams(term)), key=len)
+        words = [word for word in set.intersection(*candidates) if term in word]
+    lines = set()
+    for word in words:
+        lines.update(postings[word])
+    if len(cache) >= TERM_CACHE_SIZE:
+        cache.clear()
+    cache[term] = lines
+    return lines
+
+def search_text_index(query, document_path):
+    """
+    Find the lines of a text file that contain every word of the query.
+    
+    Parameters:
+    -----------
+    query : str
+        The search terms (case-insensitive, in any order; each term also matches inside longer
+        words, so "learn" finds "learning" and "learners")
+    document_path : str
+        Path to the text file to search
+    
+    Returns:
+    --------
+    list of dict
+        One {"line": line number (1 = first line), "text": line text} per matching line
+    """
+    
+    index = load_text_index(document_path)
+    words = words_in(query)
+    if not words:
+        return []
+    
+    # Each query word matches every indexed word that contains it (like a plain substring search)
+    lists = [term_lines(index, w) for w in set(words)]
+    
+    # Intersect the line sets, starting with the smallest (rarest word)
+    lists.sort(key=len)
+    lines = set(lists[0])
+    for posting in lists[1:]:
+        lines &= set(posting)
+        if not lines:
+            break
+    
+    # Read just the matching lines from the memory-mapped file
+    offsets = index["offsets"]
+    return [
+        {"line": i + 1, "text": index["mmap"][offsets[i]:offsets[i + 1]].decode("utf-8", errors="replace").rstrip("\r\n")}
+        for i in sorted(lines)
+    ]
+
+
+# 5. CONTEXT PACKING FUNCTIONS ###################################
+
+# Whatever the retriever returns ends up in the prompt, and the model has to read all of it:
+# more context means slower prompt processing (and higher cost on cloud models).
+# pack_context() turns search results into a prompt context that never exceeds a token budget:
+# 1) keeps only the columns the model needs,
+# 2) drops low-scoring results (below SCORE_TAIL_RATIO of the best score),
+# 3) removes duplicated and overlapping text (e.g. neighbouring chunks that share 30 words), and
+# 4) adds results best-first until the budget is used up, cutting the last one short if needed.
+
+# Rough token count of a string (about 4 characters per token for English).
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+# Cut text to at most max_tokens (at a word boundary).
+def truncate_tokens(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+# Remove words that 'text' shares with the start or end of 'kept' (overlapping chunks).
+def trim_overlap(kept, text):
+    a, b = kept.split(), text.split()
+    for n in range(min(len(a), len(b)) - 1, 0, -1):
+        if a[-n:] == b[:n]:  # text continues where kept ends
+            return " ".join(b[n:])
+        if b[-n:] == a[:n]:  # text leads into where kept starts
+            return " ".join(b[:-n])
+    return text
+
+def pack_context(records, budget=CONTEXT_BUDGET, text_key="text", keep_columns=None,
+                 score_key="score", tail_ratio=SCORE_TAIL_RATIO):
+    """
+    Pack search results into a prompt context that fits a token budget.
+    
+    Parameters:
+    -----------
+    records : list of dict or pandas.DataFrame
+        Search results, best first. Text chunks (with a 'text_key' field) are joined as paragraphs;
+        other rows (e.g. CSV or database rows) are written one compact JSON object per line.
+    budget : int
+        Maximum tokens of context (default: CONTEXT_BUDGET)
+    text_key : str
+        Field holding chunk text (default: "text")
+    keep_columns : list of str, optional
+        Fields to keep for row records (default: all)
+    score_key : str
+        Field holding the relevance score, higher = better (default: "score"; ignored if missing)
+    tail_ratio : float
+        Drop records scoring below tail_ratio * best score (default: SCORE_TAIL_RATIO; 0 keeps all)
+    
+    Returns:
+    --------
+    str
+        The packed context
+    """
+    
+    if isinstance(records, pd.DataFrame):
+        records = records.to_dict(orient="records")
+    records = list(records)
+    if not records:
+        return ""
+    
+    # Drop the low-score tail (only for positive scores, where "a share of the best" makes sense)
+    scores = [r.get(score_key) for r in records]
+    if all(isinstance(x, (int, float)) for x in scores) and max(scores) > 0:
+        records = [r for r, x in zip(records, scores) if x >= tail_ratio * max(scores)]
+    
+    # Turn each record into a piece of text, removing duplicated / overlapping text
+    is_chunks = all(text_key in r for r in records)
+    pieces = []
+    for r in records:
+        if is_chunks:
+            text = r[text_key]
+            for kept in pieces:
+                if text in kept:
+                    text = ""
+                    break
+                text = trim_overlap(kept, text)
+        else:
+            row = {k: v for k, v in r.items() if keep_columns is None or k in keep_columns}
+            text = json.dumps(row, default=str)
+            if text in pieces:
+                text = ""
+        if text.strip():
+            pieces.append(text)
+    
+    # Add pieces best-first until the budget is used up
+    separator = "\n\n" if is_chunks else "\n"
+    packed = []
+    used = 0
+    for text in pieces:
+        tokens = estimate_tokens(text) + (estimate_tokens(separator) if packed else 0)
+        if used + tokens > budget:
+            remaining = budget - used - estimate_tokens(separator)
+            if remaining >= 50:  # worth including part of this result
+                packed.append(truncate_tokens(text, remaining) if is_chunks else shrink_row(text, remaining))
+            break
+        packed.append(text)
+        used += tokens
+    
+    return separator.join(packed)
+
+# Shorten the longest text field of a JSON row so the row fits in max_tokens.
+def shrink_row(text, max_tokens):
+    row = json.loads(text)
+    longest = max((k for k, v in row.items() if isinstance(v, str)), key=lambda k: len(row[k]), default=None)
+    if longest is not None:
+        overflow = estimate_tokens(text) - max_tokens
+        keep = max(0, estimate_tokens(row[longest]) - overflow - 2)
+        row[longest] = truncate_tokens(row[longest], keep)
+    return json.dumps(row, default=str)
@@ -0,0 +1,1184 @@
+# functions_embed.py
+# Embedding + Vector Index Helper Functions
+# Used by 05_embed.py
+# Tim Fraser
+
+# This script contains the embedding, indexing, and search helpers for semantic RAG.
+# Keeping them here (instead of inside 05_embed.py) lets other scripts reuse them
+# without re-running the whole 05_embed.py workflow.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import hashlib   # for hashing chunk text
+import os        # for file path operations
+import re        # for finding word tokens
+import sqlite3   # for SQLite database operations (built-in)
+import tempfile  # for the vector files of in-memory databases
+import threading # for guarding the shared embedding cache
+import time      # for timing index builds
+from collections import OrderedDict, deque  # for the query-embedding LRU cache + sliding windows
+from concurrent.futures import ThreadPoolExecutor  # for running keyword + vector search at the same time
+import numpy as np  # for the NumPy vector store
+# sentence_transformers (torch) is imported inside get_embed_model(): it takes seconds to import,
+# and scripts that only read the index or hit the embedding cache never need it.
+
+# sqlite-vec is optional: hosts that cannot load SQLite extensions can use NumpyStore instead.
+try:
+    from sqlite_vec import load as sqlite_vec_load, serialize_float32
+except ImportError:
+    sqlite_vec_load = None
+
+# If you haven't already, install these packages...
+# pip install sentence-transformers sqlite-vec numpy
+
+## 0.2 Configuration #################################
+
+DB_PATH = "data/embed.db"  # path to the vector embeddings database
+EMBED_MODEL = "all-MiniLM-L6-v2"  # model for embedding text into vectors
+VEC_DIM = 384   # all-MiniLM-L6-v2 output size
+BATCH_SIZE = 64  # chunks per encode() call in batched builds
+QUERY_CACHE_SIZE = 256  # query embeddings kept in memory by Retriever
+# On-disk embedding cache shared by every script (see section 1); set EMBED_CACHE_PATH="" to turn it off
+EMBED_CACHE_PATH = os.getenv(
+    "EMBED_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embed_cache.db")
+)
+EMBED_CACHE_MAX_ITEMS = int(os.getenv("EMBED_CACHE_MAX_ITEMS", "200000"))  # ~300 MB of 384-dim vectors
+WINDOW_TOKENS = 120  # words per chunk; stays under all-MiniLM-L6-v2's 256 word-piece limit
+OVERLAP_TOKENS = 30  # words shared by neighbouring chunks, so ideas are not cut in half
+PARAGRAPH_TOKENS = 30  # a paragraph at least this long ends a block of windows (see iter_token_windows())
+RESCORE_FACTOR = 8  # quantized indexes fetch k * RESCORE_FACTOR candidates before rescoring
+VECTOR_BACKEND = "sqlite-vec"  # where vectors live: "sqlite-vec", "numpy" or "ivf" (see section 4)
+IVF_N_LISTS = None  # IVF partitions; None = about sqrt(number of chunks), grown automatically
+IVF_N_PROBE = 8     # IVF partitions searched per query: higher = better recall, slower
+RRF_K = 60  # reciprocal rank fusion constant: higher = flatter blend of the keyword and vector rankings
+HYBRID_CANDIDATES = 20  # hits taken from each of keyword and vector search before fusing
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # cross-encoder for the optional rerank stage
+RERANK_CANDIDATES = 30  # first-stage hits handed to the reranker
+RERANK_BATCH_SIZE = 16  # (question, chunk) pairs scored per cross-encoder call
+RERANK_TIME_LIMIT = 0.5  # seconds; stop reranking after this and keep first-stage order for the rest
+ANSWER_CACHE_THRESHOLD = 0.95  # cosine similarity above which two questions count as "the same"
+ANSWER_CACHE_TTL = 24 * 60 * 60  # seconds a cached answer stays valid
+ANSWER_CACHE_SIZE = 512  # cached answers kept (least recently used are evicted)
+
+# How vec_chunks stores each embedding, by storage mode:
+# - "float": 4 bytes per dimension (1,536 bytes per chunk); exact cosine distance
+# - "int8":  1 byte per dimension (384 bytes); each value rounded to one of 256 levels
+# - "bit":   1 bit per dimension (48 bytes); keeps only the sign of each value (hamming distance)
+VEC_COLUMNS = {
+    "float": f"float[{VEC_DIM}] distance_metric=cosine",
+    "int8": f"int8[{VEC_DIM}]",
+    "bit": f"bit[{VEC_DIM}]",
+}
+# SQL that turns a float32 blob parameter into the stored type
+QUANTIZE_SQL = {
+    "float": "?",
+    "int8": "vec_quantize_int8(?, 'unit')",
+    "bit": "vec_quantize_binary(?)",
+}
+
+
+# 1. EMBEDDING FUNCTIONS ###################################
+
+# We want to convert a given text sentence into a vector of numbers, called an 'embedding'
+# These embeddings are then stored in a database and can be used to numerically search for the most relevant chunks for a given query.
+# We'll use sentence-transformers to embed the text.
+# Load sentence_transformers once per model; encode() returns a list of floats.
+
+_embed_models = {}  # model name -> loaded SentenceTransformer
+
+# Get a sentence-transformers model (default: EMBED_MODEL), loading it on first use
+def get_embed_model(model_name=None):
+    model_name = model_name or EMBED_MODEL
+    if model_name not in _embed_models:
+        from sentence_transformers import SentenceTransformer
+        _embed_models[model_name] = SentenceTransformer(model_name)
+    return _embed_models[model_name]
+
+# Encode the text into a vector of numbers
+def embed(text, model_name=None, cache=True):
+    return embed_batch([text], model_name=model_name, cache=cache)[0]
+
+# Encode many texts at once.
+# One encode() call per batch lets the model use all CPU cores on a matrix of sentences,
+# instead of paying Python + model overhead once per sentence.
+# With workers > 1, sentence-transformers spreads the batches over a pool of processes,
+# which helps for very large documents (startup cost is a few seconds, so skip it for small ones).
+# Texts already in the embedding cache are not encoded again; if every text is cached,
+# the model is never even loaded. cache=False encodes every text (e.g. to time the model itself).
+def embed_batch(texts, batch_size=BATCH_SIZE, workers=1, model_name=None, cache=True):
+    model_name = model_name or EMBED_MODEL
+    cache = get_embed_cache() if cache else None
+    cached = cache.get_many(model_name, texts) if cache else {}
+    missing = list(dict.fromkeys(t for t in texts if t not in cached))
+    if missing:
+        m = get_embed_model(model_name)
+        if workers > 1:
+            pool = m.start_multi_process_pool(target_devices=["cpu"] * workers)
+            try:
+                vecs = m.encode_multi_process(missing, pool, batch_size=batch_size)
+            finally:
+                m.stop_multi_process_pool(pool)
+        else:
+            vecs = m.encode(missing, batch_size=batch_size, show_progress_bar=False)
+        new = {t: v.tolist() for t, v in zip(missing, vecs)}  # numpy matrix -> list of float lists
+        if cache:
+            cache.put_many(model_name, new)
+        cached.update(new)
+    return [cached[t] for t in texts]
+
+# An on-disk cache of embeddings, keyed by (model name, hash of the text).
+# Any text embedded once, by any script, is read back from SQLite instead of re-encoded,
+# so rebuilding an index over a known corpus is just disk reads.
+# Each row records when it was last used; once the cache holds more than max_items rows,
+# the least recently used 10% are deleted.
+class EmbeddingCache:
+    def __init__(self, path=EMBED_CACHE_PATH, max_items=EMBED_CACHE_MAX_ITEMS):
+        self.max_items = max_items
+        self.lock = threading.Lock()  # one connection, shared by whichever thread embeds
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+        self.size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # Look up many texts at once; returns {text: vector} for the ones in the cache.
+    def get_many(self, model_name, texts):
+        hashes = {chunk_hash(t): t for t in texts}
+        found = {}
+        with self.lock:
+            keys = list(hashes)
+            for i in range(0, len(keys), 500):  # stay under SQLite's limit on query parameters
+                batch = keys[i:i + 500]
+                marks = ", ".join("?" for _ in batch)
+                rows = self.conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({marks})",
+                    [model_name] + batch
+                ).fetchall()
+                found.update({hashes[h]: np.frombuffer(blob, dtype=np.float32).tolist() for h, blob in rows})
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model_name, chunk_hash(t)) for t in found]
+                )
+                self.conn.commit()
+        return found
+
+    # Store {text: vector} pairs, then evict the least recently used rows if the cache is too big.
+    def put_many(self, model_name, vectors):
+        now = time.time()
+        rows = [
+            (model_name, chunk_hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in vectors.items()
+        ]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self.size += len(rows)
+            if self.size > self.max_items:
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (self.size - int(self.max_items * 0.9),)
+                )
+                self.size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self.conn.commit()
+
+_embed_cache = None
+
+# Get the shared embedding cache (None if EMBED_CACHE_PATH is "").
+def get_embed_cache():
+    global _embed_cache
+    if _embed_cache is None and EMBED_CACHE_PATH:
+        _embed_cache = EmbeddingCache()
+    return _embed_cache
+
+# Reranking: a bi-encoder (the embedding model above) embeds the question and each chunk separately,
+# which is fast but loses detail. A cross-encoder reads the question and a chunk TOGETHER and scores
+# how well the chunk answers it: much more accurate, but too slow to run over the whole index.
+# So we use it as a second stage, on a few dozen first-stage candidates only.
+_rerank_model = None
+
+# Get the cross-encoder (loaded on first use, so scripts that never rerank don't pay for it)
+def get_rerank_model():
+    global _rerank_model
+    if _rerank_model is None:
+        from sentence_transformers import CrossEncoder
+        _rerank_model = CrossEncoder(RERANK_MODEL)
+    return _rerank_model
+
+# Rerank hits for a query with the cross-encoder and return the best k.
+# Candidates are scored in batches, best first-stage hits first. If scoring takes longer than
+# time_limit seconds, we stop: unscored hits keep their first-stage order, after the scored ones.
+# Each hit gains a "rerank_score" (higher = more relevant), which also becomes its "score", so
+# pack_context() drops the tail by the reranker's judgement; the old score is kept as "first_stage_score".
+# Unscored hits get score None (their first-stage scores are on a different scale).
+def rerank_hits(query, hits, k=3, batch_size=RERANK_BATCH_SIZE, time_limit=RERANK_TIME_LIMIT):
+    model = get_rerank_model()
+    start = time.perf_counter()
+    scored = []
+    for i in range(0, len(hits), batch_size):
+        batch = hits[i:i + batch_size]
+        scores = model.predict([(query, hit["text"]) for hit in batch], batch_size=batch_size)
+        scored += [
+            dict(hit, rerank_score=float(score), score=float(score), first_stage_score=hit.get("score"))
+            for hit, score in zip(batch, scores)
+        ]
+        if time.perf_counter() - start > time_limit:
+            break
+    scored.sort(key=lambda hit: hit["rerank_score"], reverse=True)
+    unscored = [dict(hit, score=None, first_stage_score=hit.get("score")) for hit in hits[len(scored):]]
+    return (scored + unscored)[:k]
+
+
+# 2. TEXT CHUNKING FUNCTIONS ###################################
+
+# Write a function to read in the document into meaningful text chunks.
+def get_text(document_path):
+    # Split the document into chunks
+    with open(document_path, "r", encoding="UTF-8") as f:
+        raw = f.read()
+    # Concatenate the lines into a single string (already one string), split on period
+    parts = raw.replace("\n", " ").split(".")
+    # Trim whitespace and return only non-empty chunks
+    chunks = [p.strip() for p in parts if p.strip()]
+    return chunks
+
+# Hash a chunk of text, so we can tell whether it changed since the last index build.
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Chunks can be plain strings (get_text) or records with offsets (iter_token_windows).
+# Convert both into records: {"text", "char_start", "char_end"}.
+def as_records(chunks):
+    return [c if isinstance(c, dict) else {"text": c, "char_start": None, "char_end": None} for c in chunks]
+
+# Drop repeated chunks (same text = same embedding), keeping the first occurrence in order.
+def unique_chunks(chunks):
+    seen = set()
+    out = []
+    for record in as_records(chunks):
+        if record["text"] not in seen:
+            seen.add(record["text"])
+            out.append(record)
+    return out
+
+# List every text file in a folder (e.g. data/plans), sorted for a stable order.
+def list_documents(folder):
+    names = sorted(f for f in os.listdir(folder) if f.endswith(".txt"))
+    return [os.path.join(folder, f) for f in names]
+
+# Streaming chunker: split a document into overlapping windows of 'window_tokens' words.
+# get_text() reads the whole file and splits on "." into tiny sentence fragments.
+# Instead, we read the file one line at a time and keep only the current window in memory,
+# so even very long plans use a small, fixed amount of memory.
+# Each chunk remembers where it came from: its character offsets in the source file.
+# Windows are anchored to paragraphs, not to the start of the file: a paragraph (text up to a blank line)
+# of at least 'paragraph_tokens' words closes the current block, and the next window starts fresh after it.
+# Shorter paragraphs (headings, captions) join the block that follows. So an edit only changes the
+# windows of its own block; every other chunk keeps its text (and hash), and sync_document() keeps it.
+def iter_token_windows(document_path, window_tokens=WINDOW_TOKENS, overlap_tokens=OVERLAP_TOKENS,
+                       paragraph_tokens=PARAGRAPH_TOKENS):
+    step = max(1, window_tokens - overlap_tokens)
+    window = deque()  # (start, end, word) for the words in the current window
+    n_new = 0  # words in the window that no emitted chunk has covered yet
+    n_paragraph = 0  # words in the current paragraph
+    offset = 0  # character position of the current line in the file
+    # newline="" keeps "\r\n" as-is, so our character offsets match the file exactly
+    with open(document_path, "r", encoding="UTF-8", newline="") as f:
+        for line in f:
+            words = list(re.finditer(r"\S+", line))
+            # A blank line ends the paragraph; a long paragraph also ends the block
+            if not words:
+                if n_paragraph >= paragraph_tokens and n_new > 0:
+                    yield window_record(window)
+                    window.clear()
+                    n_new = 0
+                n_paragraph = 0
+            for m in words:
+                window.append((offset + m.start(), offset + m.end(), m.group()))
+                n_new += 1
+                n_paragraph += 1
+                # Window is full: emit it, then slide forward by 'step' words
+                if len(window) == window_tokens:
+                    yield window_record(window)
+                    for _ in range(step):
+                        window.popleft()
+                    n_new = 0
+            offset += len(line)
+    # Emit the leftover words at the end of the file (if any are not covered yet)
+    if n_new > 0:
+        yield window_record(window)
+
+# Turn a window of (start, end, word) tuples into a chunk record.
+def window_record(window):
+    return {
+        "text": " ".join(word for _, _, word in window),
+        "char_start": window[0][0],
+        "char_end": window[-1][1],
+    }
+
+# Lazily walk every document in a folder and yield (source, chunk) pairs.
+# Nothing is read until you iterate, and only one window is held in memory at a time.
+def iter_corpus_chunks(folder, window_tokens=WINDOW_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    for path in list_documents(folder):
+        for record in iter_token_windows(path, window_tokens=window_tokens, overlap_tokens=overlap_tokens):
+            yield path, record
+
+
+# 3. DATABASE FUNCTIONS ###################################
+
+# Connect to the database, loading sqlite-vec unless load_vec=False.
+# The chunk text and metadata are plain SQLite tables, so the NumPy backend
+# only needs Python's built-in sqlite3 (no extension).
+def connect_db(path=DB_PATH, load_vec=True):
+    conn = sqlite3.connect(path)
+    if load_vec:
+        if sqlite_vec_load is None:
+            raise ImportError("sqlite-vec is not installed; pip install sqlite-vec, or use backend='numpy'.")
+        conn.enable_load_extension(True)
+        sqlite_vec_load(conn)
+        conn.enable_load_extension(False)
+    return conn
+
+# Create the chunks table, index_meta table, and the vector store's tables/files.
+# We keep id and text in chunks so we can join them to search results.
+# Each chunk also records its source file, its character offsets in that file (if known),
+# and a hash of its text, so reruns can skip chunks that are already embedded (see sync_document()).
+# index_meta records which embedding model, storage mode, and backend built the index;
+# vectors from different models are not comparable, so switching any of them clears the index.
+# With quantize="int8" or "bit", the sqlite-vec store keeps compact vectors for a fast first pass
+# plus the full float32 vectors for rescoring (see knn_rows()).
+def create_tables(conn, quantize=None, store=None):
+    store = store or SqliteVecStore(conn)
+    mode = quantize or "float"
+    conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    meta = dict(conn.execute("SELECT key, value FROM index_meta").fetchall())
+    # Older databases (or ones built by 05_embed.R) lack some of these columns; rebuild those from scratch.
+    cols = [row[1] for row in conn.execute("PRAGMA table_info(chunks)")]
+    rebuild = not {"source", "hash", "char_start", "char_end"}.issubset(cols)
+    # Rebuild if the index was built with a different embedding model, storage mode or backend
+    built_with = (meta.get("embed_model", EMBED_MODEL), meta.get("quantize", "float"), meta.get("backend", "sqlite-vec"))
+    if cols and built_with != (EMBED_MODEL, mode, store.name):
+        print(f"Index was built with {built_with}; clearing it to rebuild with {(EMBED_MODEL, mode, store.name)}.")
+        rebuild = True
+    if rebuild:
+        conn.execute("DROP TABLE IF EXISTS chunks")
+        conn.execute("DROP TABLE IF EXISTS chunks_fts")
+        store.drop()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY,
+            source TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            char_start INTEGER,
+            char_end INTEGER,
+            text TEXT NOT NULL,
+            UNIQUE (source, hash)
+        )
+        """
+    )
+    store.create(mode)
+    create_fts(conn)
+    conn.executemany(
+        "INSERT OR REPLACE INTO index_meta (key, value) VALUES (?, ?)",
+        [("embed_model", EMBED_MODEL), ("quantize", mode), ("backend", store.name)]
+    )
+    conn.commit()
+
+# Full-text (FTS5) index over the chunk text, for keyword search with BM25 ranking.
+# chunks_fts is an "external content" table: its rowids are chunks.id and it reads the text from chunks,
+# so keyword and vector hits refer to the same chunk ids. Triggers keep it in sync with chunks.
+# Existing databases get it on the next create_tables() call ('rebuild' indexes the chunks already there).
+def create_fts(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+        "text, content='chunks', content_rowid='id', tokenize='porter unicode61')"
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_ai AFTER INSERT ON chunks BEGIN
+            INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_ad AFTER DELETE ON chunks BEGIN
+            INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+        """
+    )
+    # Only text changes need re-indexing (sync_document() also updates offsets)
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_au AFTER UPDATE OF text ON chunks BEGIN
+            INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+        END
+        """
+    )
+    if not exists:
+        conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+
+# Which storage mode ("float", "int8" or "bit") was this index built with?
+def index_mode(conn):
+    row = conn.execute("SELECT value FROM index_meta WHERE key = 'quantize'").fetchone()
+    return "float" if row is None else row[0]
+
+# Delete every chunk and embedding (keeps the tables).
+def clear_index(conn, store=None):
+    store = store or SqliteVecStore(conn)
+    with conn:
+        conn.execute("DELETE FROM chunks")
+        store.clear()
+
+# Next free chunk id (ids are shared by chunks.id and the vector store).
+def next_chunk_id(conn):
+    (max_id,) = conn.execute("SELECT MAX(id) FROM chunks").fetchone()
+    return 0 if max_id is None else max_id + 1
+
+# Fetch chunk text + metadata for a list of ids in ONE query, keeping the order of 'ids'.
+def fetch_chunks(conn, ids):
+    if not ids:
+        return {}
+    marks = ", ".join("?" for _ in ids)
+    rows = conn.execute(
+        f"SELECT id, text, source, char_start, char_end FROM chunks WHERE id IN ({marks})",
+        [int(i) for i in ids]
+    ).fetchall()
+    return {
+        row[0]: {"id": row[0], "text": row[1], "source": row[2], "char_start": row[3], "char_end": row[4]}
+        for row in rows
+    }
+
+
+# 4. VECTOR STORES ###################################
+
+# The rest of this file talks to vectors only through a "vector store" object,
+# so we can swap where the vectors live without changing the indexing or search code.
+# Every store has the same methods:
+# - create(mode) / drop() / clear(): set up, remove, or empty the store
+# - add(ids, vecs): store float vectors under chunk ids
+# - delete(ids): remove vectors by chunk id
+# - search(vec, k): return the top-k hits as dicts (id, score, text, source, offsets)
+# Chunk text and metadata always stay in the SQLite chunks table.
+class VectorStore:
+    name = "base"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def create(self, mode="float"):
+        raise NotImplementedError
+
+    def drop(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def add(self, ids, vecs):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def search(self, vec, k=3):
+        raise NotImplementedError
+
+# Backend 1: sqlite-vec (vec0 virtual table inside the same database).
+# vec0 virtual table: rowid, embedding. KNN runs inside SQLite and joins to the chunk text in one query.
+class SqliteVecStore(VectorStore):
+    name = "sqlite-vec"
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self.mode = None  # looked up from index_meta on first use
+
+    def get_mode(self):
+        if self.mode is None:
+            self.mode = index_mode(self.conn)
+        return self.mode
+
+    def create(self, mode="float"):
+        self.mode = mode
+        self.conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks USING vec0(embedding {VEC_COLUMNS[mode]})")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS chunk_vectors (id INTEGER PRIMARY KEY, embedding BLOB NOT NULL)")
+
+    def drop(self):
+        self.conn.execute("DROP TABLE IF EXISTS vec_chunks")
+        self.conn.execute("DROP TABLE IF EXISTS chunk_vectors")
+
+    def clear(self):
+        self.conn.execute("DELETE FROM vec_chunks")
+        self.conn.execute("DELETE FROM chunk_vectors")
+
+    def add(self, ids, vecs):
+        mode = self.get_mode()
+        vec_rows = [(int(i), serialize_float32(list(vec))) for i, vec in zip(ids, vecs)]
+        self.conn.executemany(f"INSERT INTO vec_chunks (rowid, embedding) VALUES (?, {QUANTIZE_SQL[mode]})", vec_rows)
+        # Quantized indexes also keep the full-precision vector for rescoring
+        if mode != "float":
+            self.conn.executemany("INSERT INTO chunk_vectors (id, embedding) VALUES (?, ?)", vec_rows)
+
+    def delete(self, ids):
+        rows = [(int(i),) for i in ids]
+        self.conn.executemany("DELETE FROM vec_chunks WHERE rowid = ?", rows)
+        self.conn.executemany("DELETE FROM chunk_vectors WHERE id = ?", rows)
+
+    def search(self, vec, k=3):
+        return knn_rows(self.conn, serialize_float32(list(vec)), k=k, mode=self.get_mode())
+
+# Backend 2: NumPy memory-mapped matrix (no SQLite extension needed).
+# All vectors live in one .npy file (one normalized row per chunk) next to the database,
+# plus a matching .npy file of chunk ids. np.load(mmap_mode="r") maps the file into memory
+# without copying it, so opening the index is instant; the OS pages data in as it is read.
+# Search is brute force but vectorized: one matrix-vector product gives every cosine similarity,
+# and np.argpartition() picks the top k without sorting everything.
+# That is exact and fast for up to a few hundred thousand chunks.
+# Note: add() and delete() rewrite the files, so sync in batches rather than one chunk at a time.
+class NumpyStore(VectorStore):
+    name = "numpy"
+
+    def __init__(self, conn, prefix=None):
+        super().__init__(conn)
+        # Default file prefix: the database path without its extension (data/embed.db -> data/embed).
+        # An in-memory database (":memory:") has no path; its vectors go to a temporary folder
+        # that is deleted along with this store.
+        self.scratch = None
+        if prefix is None:
+            db_file = [row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"][0]
+            if db_file:
+                prefix = os.path.splitext(db_file)[0]
+            else:
+                self.scratch = tempfile.TemporaryDirectory(prefix="numpy_store_")
+                prefix = os.path.join(self.scratch.name, "embed")
+        self.vectors_path = f"{prefix}_vectors.npy"
+        self.ids_path = f"{prefix}_ids.npy"
+        self.vectors = None  # memory-mapped (n_chunks, VEC_DIM) float32 matrix
+        self.ids = None      # memory-mapped (n_chunks,) int64 chunk ids
+
+    def create(self, mode="float"):
+        if mode != "float":
+            raise ValueError("NumpyStore only stores float vectors; use SqliteVecStore for int8/bit.")
+        if not os.path.exists(self.vectors_path):
+            self.save(np.zeros((0, VEC_DIM), dtype=np.float32), np.zeros(0, dtype=np.int64))
+
+    def drop(self):
+        self.vectors, self.ids = None, None
+        for path in [self.vectors_path, self.ids_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        self.save(np.zeros((0, VEC_DIM), dtype=np.float32), np.zeros(0, dtype=np.int64))
+
+    # Memory-map both files (once), without reading them into RAM.
+    def load(self):
+        if self.vectors is None:
+            self.vectors = np.load(self.vectors_path, mmap_mode="r")
+            self.ids = np.load(self.ids_path, mmap_mode="r")
+        return self.vectors, self.ids
+
+    # Write both files to a temporary name, then swap them in, so readers never see half a file.
+    def save(self, vectors, ids):
+        self.vectors, self.ids = None, None  # release the old memory maps first
+        for path, arr in [(self.vectors_path, vectors), (self.ids_path, ids)]:
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, arr)
+            os.replace(path + ".tmp", path)
+
+    def add(self, ids, vecs):
+        if len(ids) == 0:
+            return
+        new = np.asarray(vecs, dtype=np.float32)
+        new /= np.linalg.norm(new, axis=1, keepdims=True).clip(min=1e-12)  # unit length: dot product = cosine
+        vectors, old_ids = self.load()
+        self.save(np.concatenate([vectors, new]), np.concatenate([old_ids, np.asarray(ids, dtype=np.int64)]))
+
+    def delete(self, ids):
+        if len(ids) == 0:
+            return
+        vectors, old_ids = self.load()
+        keep = ~np.isin(old_ids, np.asarray(ids, dtype=np.int64))
+        self.save(vectors[keep], old_ids[keep])
+
+    def search(self, vec, k=3):
+        vectors, ids = self.load()
+        if len(ids) == 0:
+            return []
+        scores = vectors @ unit_vector(vec)  # cosine similarity with every chunk at once
+        return self.top_hits(scores, ids, k)
+
+    # Turn similarity scores (one per id) into the top-k hits, with chunk text from SQLite.
+    def top_hits(self, scores, ids, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]  # the k best, in no particular order
+        top = top[np.argsort(-scores[top])]         # sort just those k
+        chunks = fetch_chunks(self.conn, ids[top].tolist())
+        return [
+            {"id": int(ids[i]), "score": float(scores[i]), **chunks[int(ids[i])]}
+            for i in top if int(ids[i]) in chunks
+        ]
+
+# Scale a vector to length 1 (so a dot product is a cosine similarity).
+def unit_vector(vec):
+    q = np.asarray(vec, dtype=np.float32)
+    return q / max(float(np.linalg.norm(q)), 1e-12)
+
+# Backend 3: IVF (inverted file) approximate nearest-neighbour index on top of NumpyStore.
+# Exact search compares the query with every chunk, so its latency grows with the corpus.
+# IVF clusters the vectors into 'n_lists' partitions with k-means and stores the rows sorted by partition.
+# A query is compared with the partition centroids first, and only the 'n_probe' closest partitions
+# are scanned, so each query reads about n_probe / n_lists of the data.
+# - n_lists: partitions (default ~sqrt(chunks), so a partition stays ~sqrt(chunks) rows)
+# - n_probe: partitions scanned per query; raise it for recall, lower it for speed (n_probe = n_lists is exact)
+# The centroids and partition offsets are saved next to the vectors (e.g. data/embed_ivf_centroids.npy).
+# New vectors are assigned to the existing centroids; when the corpus outgrows them (2x the
+# partitions we have), the centroids are retrained automatically on the next save.
+class IvfStore(NumpyStore):
+    name = "ivf"
+
+    def __init__(self, conn, prefix=None, n_lists=IVF_N_LISTS, n_probe=IVF_N_PROBE):
+        super().__init__(conn, prefix)
+        base = self.vectors_path[:-len("_vectors.npy")]
+        self.centroids_path = f"{base}_ivf_centroids.npy"
+        self.offsets_path = f"{base}_ivf_offsets.npy"
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroids = None  # (n_lists, VEC_DIM) unit-length partition centres
+        self.offsets = None    # rows of partition j are offsets[j]:offsets[j + 1]
+
+    def drop(self):
+        super().drop()
+        self.centroids, self.offsets = None, None
+        for path in [self.centroids_path, self.offsets_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load(self):
+        if self.centroids is None and os.path.exists(self.centroids_path):
+            self.centroids = np.load(self.centroids_path)
+            self.offsets = np.load(self.offsets_path)
+        return super().load()
+
+    # Sort the rows by partition (training new centroids if needed), then save everything.
+    def save(self, vectors, ids):
+        n = len(ids)
+        wanted = self.n_lists or max(1, int(np.sqrt(n)))
+        wanted = max(1, min(wanted, n))
+        centroids = self.centroids
+        if centroids is None and os.path.exists(self.centroids_path):
+            centroids = np.load(self.centroids_path)
+        if n == 0:
+            centroids = np.zeros((0, VEC_DIM), dtype=np.float32)
+        elif centroids is None or len(centroids) == 0 or len(centroids) > n or wanted >= 2 * len(centroids):
+            centroids = train_kmeans(vectors, wanted)
+        lists = nearest_centroid(vectors, centroids)
+        order = np.argsort(lists, kind="stable")
+        offsets = np.searchsorted(lists[order], np.arange(len(centroids) + 1))
+        super().save(np.asarray(vectors)[order], np.asarray(ids)[order])
+        for path, arr in [(self.centroids_path, centroids), (self.offsets_path, offsets)]:
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, arr)
+            os.replace(path + ".tmp", path)
+        self.centroids, self.offsets = centroids, offsets
+
+    # Retrain the centroids from scratch (e.g. after changing n_lists).
+    def train(self):
+        vectors, ids = self.load()
+        self.centroids = None
+        if os.path.exists(self.centroids_path):
+            os.remove(self.centroids_path)
+        self.save(np.array(vectors), np.array(ids))
+
+    def search(self, vec, k=3):
+        vectors, ids = self.load()
+        if len(ids) == 0:
+            return []
+        q = unit_vector(vec)
+        # 1) pick the n_probe partitions whose centroids are closest to the query
+        n_probe = min(self.n_probe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ q), n_probe - 1)[:n_probe]
+        # 2) score only the rows in those partitions (each partition is one contiguous slice)
+        rows = np.concatenate([np.arange(self.offsets[j], self.offsets[j + 1]) for j in probe])
+        scores = vectors[rows] @ q
+        return self.top_hits(scores, ids[rows], k)
+
+# Spherical k-means: cluster unit vectors into n_lists partitions (centroids kept at unit length).
+# We train on a random sample (at most 256 rows per partition), which is plenty for good centroids.
+def train_kmeans(vectors, n_lists, iterations=10, seed=42):
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, 256 * n_lists)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        lists = nearest_centroid(sample, centroids)
+        for j in range(n_lists):
+            members = sample[lists == j]
+            if len(members):
+                centroids[j] = unit_vector(members.sum(axis=0))
+    return centroids
+
+# Index of the closest centroid for every row (in blocks, so big corpora don't need a huge score matrix).
+def nearest_centroid(vectors, centroids, block=65536):
+    if len(centroids) == 0:
+        return np.zeros(len(vectors), dtype=np.int64)
+    return np.concatenate([
+        np.argmax(np.asarray(vectors[i:i + block]) @ centroids.T, axis=1)
+        for i in range(0, len(vectors), block)
+    ] or [np.zeros(0, dtype=np.int64)])
+
+# Make the vector store for a backend name ("sqlite-vec", "numpy" or "ivf").
+def open_store(conn, backend=VECTOR_BACKEND):
+    if backend == "numpy":
+        return NumpyStore(conn)
+    if backend == "ivf":
+        return IvfStore(conn)
+    return SqliteVecStore(conn)
+
+
+# 5. INDEX BUILDING FUNCTIONS ###################################
+
+# Embed each chunk and insert into the vector store (float32 vector + text).
+# R uses a single vec0 table with id, embedding, +text; Python keeps
+# a vector store (rowid, embedding) plus a chunks table (id, source, hash, offsets, text) for compatibility.
+# Returns build stats (chunks, seconds, chunks_per_sec) so we can compare it with build_index_batched().
+# Pass cache=False when timing builds, so a warm embedding cache doesn't hide the encoding cost.
+def build_index_from_document(conn, chunks, source="document", store=None, cache=True):
+    # Given a database connection 'conn' and a list of text chunks 'chunks',
+    # embed each chunk and insert into database (chunks table + vector store).
+    store = store or SqliteVecStore(conn)
+    chunks = unique_chunks(chunks)
+    n = len(chunks)
+    print(f"Embedding {n} chunks with {EMBED_MODEL}...")
+    start = time.perf_counter()
+    first_id = next_chunk_id(conn)
+    for i, record in enumerate(chunks, start=first_id):
+        text = record["text"]
+        # Embed the chunk
+        vec = embed(text, cache=cache)
+        # Insert the chunk into the chunks table
+        conn.execute(
+            "INSERT INTO chunks (id, source, hash, char_start, char_end, text) VALUES (?, ?, ?, ?, ?, ?)",
+            (i, source, chunk_hash(text), record["char_start"], record["char_end"], text)
+        )
+        # Insert into the vector store (its id aligns with chunks.id)
+        store.add([i], [vec])
+    conn.commit()
+    stats = build_stats(n, time.perf_counter() - start)
+    print(f"Index built: {stats['chunks_per_sec']:.1f} chunks/sec.\n")
+    return stats
+
+# Batched version of build_index_from_document().
+# Instead of one encode() + two INSERTs per chunk, we:
+# 1) encode the chunks in batches of 'batch_size' (optionally over 'workers' processes), then
+# 2) bulk-insert every row with executemany() inside a single transaction.
+# Both steps remove most of the per-chunk Python overhead.
+def build_index_batched(conn, chunks, source="document", batch_size=BATCH_SIZE, workers=1, store=None, cache=True):
+    chunks = unique_chunks(chunks)
+    n = len(chunks)
+    print(f"Embedding {n} chunks with {EMBED_MODEL} (batch_size={batch_size}, workers={workers})...")
+    start = time.perf_counter()
+    with conn:
+        insert_chunks(conn, source, chunks, batch_size=batch_size, workers=workers, store=store, cache=cache)
+    stats = build_stats(n, time.perf_counter() - start)
+    print(f"Index built: {stats['chunks_per_sec']:.1f} chunks/sec.\n")
+    return stats
+
+# Embed a list of chunk records in batches and bulk-insert them with new ids.
+# Does not commit; callers wrap it in a transaction ('with conn:').
+def insert_chunks(conn, source, chunks, batch_size=BATCH_SIZE, workers=1, store=None, cache=True):
+    if not chunks:
+        return
+    store = store or SqliteVecStore(conn)
+    # Encode everything in batches
+    texts = [r["text"] for r in chunks]
+    vecs = embed_batch(texts, batch_size=batch_size, workers=workers, cache=cache)
+    # Pair each chunk id with its metadata
+    first_id = next_chunk_id(conn)
+    ids = list(range(first_id, first_id + len(chunks)))
+    chunk_rows = [
+        (i, source, chunk_hash(r["text"]), r["char_start"], r["char_end"], r["text"])
+        for i, r in zip(ids, chunks)
+    ]
+    conn.executemany(
+        "INSERT INTO chunks (id, source, hash, char_start, char_end, text) VALUES (?, ?, ?, ?, ?, ?)",
+        chunk_rows
+    )
+    store.add(ids, vecs)
+
+# Summarize an index build as a small dictionary of stats.
+def build_stats(n_chunks, seconds):
+    rate = n_chunks / seconds if seconds > 0 else float("inf")
+    return {"chunks": n_chunks, "seconds": seconds, "chunks_per_sec": rate}
+
+# Copy a float sqlite-vec index into a new database with a different storage mode, without re-embedding.
+# We ATTACH the source database and let sqlite-vec quantize each stored float vector in SQL.
+def quantize_index(src_path, dst_path, quantize):
+    conn = connect_db(dst_path)
+    create_tables(conn, quantize=quantize)
+    clear_index(conn)
+    conn.execute("ATTACH DATABASE ? AS src", (src_path,))
+    # Quantizing needs the full float vectors, so the source must be a float index
+    src_mode = conn.execute("SELECT value FROM src.index_meta WHERE key = 'quantize'").fetchone()
+    if src_mode is not None and src_mode[0] != "float":
+        raise ValueError(f"{src_path} is a {src_mode[0]} index; quantize_index() needs a float index.")
+    quantized = QUANTIZE_SQL[quantize or "float"].replace("?", "embedding")
+    with conn:
+        conn.execute("INSERT INTO chunks SELECT * FROM src.chunks")
+        conn.execute(f"INSERT INTO vec_chunks (rowid, embedding) SELECT rowid, {quantized} FROM src.vec_chunks")
+        if quantize:
+            conn.execute("INSERT INTO chunk_vectors (id, embedding) SELECT rowid, embedding FROM src.vec_chunks")
+    conn.execute("DETACH DATABASE src")
+    return conn
+
+# Delete chunks (and their embeddings) by id.
+def delete_chunks(conn, ids, store=None):
+    store = store or SqliteVecStore(conn)
+    conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+    store.delete(ids)
+
+
+# 6. INCREMENTAL INDEXING FUNCTIONS ###################################
+
+# Instead of deleting the database and re-embedding everything on every run,
+# we compare the hash of each chunk against what is already stored for that source:
+# - unchanged chunks are kept as-is (no embedding needed)
+# - new or edited chunks are embedded and inserted
+# - chunks that no longer appear in the source are deleted
+# Re-indexing an unchanged document is then just reading + hashing text (milliseconds),
+# and the embedding model is never even loaded.
+# 'chunks' can be a list or a lazy iterator (e.g. iter_token_windows()); only this one
+# document's chunks are held in memory at a time.
+def sync_document(conn, source, chunks, batch_size=BATCH_SIZE, workers=1, store=None, cache=True):
+    start = time.perf_counter()
+    chunks = unique_chunks(chunks)
+    # What is already stored for this source? (hash -> id)
+    stored = dict(conn.execute("SELECT hash, id FROM chunks WHERE source = ?", (source,)).fetchall())
+    # Which chunks are new, and which stored chunks are stale?
+    wanted = {chunk_hash(r["text"]): r for r in chunks}
+    new_chunks = [r for h, r in wanted.items() if h not in stored]
+    stale_ids = [i for h, i in stored.items() if h not in wanted]
+    # Unchanged chunks may have moved within the file; refresh their offsets (no embedding needed)
+    moved = [(r["char_start"], r["char_end"], stored[h]) for h, r in wanted.items() if h in stored]
+    # Apply all changes in one transaction
+    with conn:
+        delete_chunks(conn, stale_ids, store=store)
+        conn.executemany("UPDATE chunks SET char_start = ?, char_end = ? WHERE id = ?", moved)
+        insert_chunks(conn, source, new_chunks, batch_size=batch_size, workers=workers, store=store, cache=cache)
+    seconds = time.perf_counter() - start
+    return {
+        "source": source,
+        "added": len(new_chunks),
+        "removed": len(stale_ids),
+        "kept": len(wanted) - len(new_chunks),
+        "seconds": seconds,
+    }
+
+# Sync many files at once (e.g. every plan under data/plans).
+# Adding one plan to the folder only costs that plan's embeddings.
+# 'chunker' turns a file path into chunks (default: overlapping word windows; get_text for sentences).
+# With prune=True, sources that are no longer in 'paths' are removed from the index.
+def sync_files(conn, paths, chunker=iter_token_windows, batch_size=BATCH_SIZE, workers=1, prune=False, store=None,
+               cache=True):
+    results = [
+        sync_document(conn, p, chunker(p), batch_size=batch_size, workers=workers, store=store, cache=cache)
+        for p in paths
+    ]
+    if prune:
+        keep = set(paths)
+        sources = [row[0] for row in conn.execute("SELECT DISTINCT source FROM chunks")]
+        for source in sources:
+            if source not in keep:
+                results.append(sync_document(conn, source, [], store=store))
+    return results
+
+
+# 7. SEMANTIC SEARCH FUNCTIONS ###################################
+
+# KNN search joined to the chunk text in ONE query.
+# The CTE runs the sqlite-vec KNN ('k = ?' tells vec0 how many neighbours to return),
+# then we join those few rows to the chunks table, instead of one extra SELECT per hit.
+KNN_SQL = """
+    WITH knn AS (
+        SELECT rowid, distance
+        FROM vec_chunks
+        WHERE embedding MATCH ? AND k = ?
+    )
+    SELECT knn.rowid, knn.distance, chunks.text, chunks.source, chunks.char_start, chunks.char_end
+    FROM knn
+    JOIN chunks ON chunks.id = knn.rowid
+    ORDER BY knn.distance
+"""
+
+# Quantized indexes search in two stages, also in ONE query:
+# 1) a coarse KNN over the compact int8/bit vectors pulls k * RESCORE_FACTOR candidates, then
+# 2) those few candidates are rescored with exact cosine distance on their float32 vectors.
+RESCORE_SQL = """
+    WITH knn AS (
+        SELECT rowid
+        FROM vec_chunks
+        WHERE embedding MATCH {quantized} AND k = ?
+    )
+    SELECT knn.rowid, vec_distance_cosine(chunk_vectors.embedding, ?) AS distance,
+           chunks.text, chunks.source, chunks.char_start, chunks.char_end
+    FROM knn
+    JOIN chunk_vectors ON chunk_vectors.id = knn.rowid
+    JOIN chunks ON chunks.id = knn.rowid
+    ORDER BY distance
+    LIMIT ?
+"""
+
+# Run the KNN query for a query blob and format the hits. Score = 1 - distance (higher = more similar).
+# 'mode' is the index storage mode (see index_mode()); pass it in to skip looking it up.
+def knn_rows(conn, query_blob, k=3, mode=None, rescore_factor=RESCORE_FACTOR):
+    mode = mode or index_mode(conn)
+    if mode == "float":
+        rows = conn.execute(KNN_SQL, (query_blob, k)).fetchall()
+    else:
+        sql = RESCORE_SQL.format(quantized=QUANTIZE_SQL[mode])
+        rows = conn.execute(sql, (query_blob, k * rescore_factor, query_blob, k)).fetchall()
+    return [
+        {"id": rowid, "score": 1 - distance, "text": text, "source": source,
+         "char_start": char_start, "char_end": char_end}
+        for rowid, distance, text, source, char_start, char_end in rows
+    ]
+
+# Keyword search: BM25-ranked chunks containing any of the query's words.
+# Each word is quoted (so punctuation like "12-345" or "§" can't break the FTS5 syntax) and the words
+# are OR-ed together, so BM25 can rank partial matches; rare exact terms like statute numbers rank highest.
+def bm25_rows(conn, query, k=3):
+    words = re.findall(r"\w+", query)
+    if not words:
+        return []
+    match = " OR ".join(f'"{w}"' for w in words)
+    rows = conn.execute(
+        """
+        SELECT chunks.id, -bm25(chunks_fts) AS score, chunks.text, chunks.source, chunks.char_start, chunks.char_end
+        FROM chunks_fts
+        JOIN chunks ON chunks.id = chunks_fts.rowid
+        WHERE chunks_fts MATCH ?
+        ORDER BY bm25(chunks_fts)
+        LIMIT ?
+        """,
+        (match, k)
+    ).fetchall()
+    return [
+        {"id": r[0], "score": r[1], "text": r[2], "source": r[3], "char_start": r[4], "char_end": r[5]}
+        for r in rows
+    ]
+
+# Reciprocal rank fusion (RRF): blend several ranked hit lists into one.
+# Each hit scores sum(1 / (rrf_k + rank)) over the lists it appears in, so chunks ranked well by
+# both keyword and vector search rise to the top. Only ranks are used, so BM25 scores and cosine
+# similarities never need to be put on the same scale.
+def rrf_fuse(hit_lists, k=3, rrf_k=RRF_K):
+    fused = {}
+    for hits in hit_lists:
+        for rank, hit in enumerate(hits, start=1):
+            if hit["id"] not in fused:
+                fused[hit["id"]] = dict(hit, score=0.0)
+            fused[hit["id"]]["score"] += 1 / (rrf_k + rank)
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:k]
+
+# Create a function to perform semantic search on the vector embeddings database,
+# using the KNN search algorithm for similarity search with sqlite-vec.
+# KNN runs inside the DB: embed query, MATCH in SQL, return top k.
+def search_embed_sql(conn, query, k=3):
+    query_vec = embed(query)
+    query_blob = serialize_float32(query_vec)
+    return knn_rows(conn, query_blob, k=k)
+
+# A Retriever keeps everything a search needs "warm" between questions:
+# - one open connection (with sqlite-vec already loaded, if used) and its vector store
+# - an LRU cache of query embeddings, so a repeated question skips the encoder entirely
+# search_many() also embeds all uncached questions in a single batch.
+# backend="numpy" searches the memory-mapped NumpyStore instead of sqlite-vec.
+# search_hybrid() runs keyword (BM25) and vector search at the same time and fuses them with RRF.
+class Retriever:
+    def __init__(self, path=DB_PATH, conn=None, store=None, backend=VECTOR_BACKEND, cache_size=QUERY_CACHE_SIZE):
+        # Reuse an existing connection / store if given; otherwise open our own
+        if store is not None:
+            conn = store.conn
+            backend = store.name
+        self.owns_conn = conn is None
+        self.conn = connect_db(path, load_vec=(backend == "sqlite-vec")) if conn is None else conn
+        self.store = store or open_store(self.conn, backend)
+        self.cache_size = cache_size
+        self.query_cache = OrderedDict()  # query text -> embedding, oldest first
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.lexical_conn = None  # second connection for keyword search (opened on first hybrid search)
+        self.pool = None          # one background thread for keyword search
+
+    # Look up a query in the cache, marking it as recently used.
+    def cached_vec(self, query):
+        vec = self.query_cache.get(query)
+        if vec is None:
+            self.cache_misses += 1
+            return None
+        self.query_cache.move_to_end(query)
+        self.cache_hits += 1
+        return vec
+
+    # Add a query embedding to the cache, evicting the least recently used one if full.
+    def remember(self, query, vec):
+        self.query_cache[query] = vec
+        self.query_cache.move_to_end(query)
+        while len(self.query_cache) > self.cache_size:
+            self.query_cache.popitem(last=False)
+
+    # Embed many queries, encoding only the ones we have not seen before (in one batch).
+    def embed_queries(self, queries):
+        vecs = {q: self.cached_vec(q) for q in dict.fromkeys(queries)}
+        missing = [q for q, vec in vecs.items() if vec is None]
+        if missing:
+            for q, vec in zip(missing, embed_batch(missing)):
+                vecs[q] = vec
+                self.remember(q, vec)
+        return [vecs[q] for q in queries]
+
+    # Search for one question.
+    # With rerank=True, fetch RERANK_CANDIDATES hits and let the cross-encoder pick the best k (see rerank_hits()).
+    def search(self, query, k=3, rerank=False):
+        (vec,) = self.embed_queries([query])
+        if rerank:
+            return rerank_hits(query, self.store.search(vec, k=max(k, RERANK_CANDIDATES)), k)
+        return self.store.search(vec, k=k)
+
+    # Search for many questions at once; returns one list of hits per question.
+    def search_many(self, queries, k=3):
+        vecs = self.embed_queries(queries)
+        return [self.store.search(vec, k=k) for vec in vecs]
+
+    # Hybrid search: keyword (BM25) and vector search over the same chunk ids, fused with RRF.
+    # The keyword query runs on a background thread with its own connection while this thread
+    # embeds the question and runs the vector search, so the call takes about as long as the slower half.
+    # Each half returns 'candidates' hits; the fused top k are returned, with the RRF score as "score".
+    def search_hybrid(self, query, k=3, candidates=HYBRID_CANDIDATES, rerank=False):
+        lexical = self.lexical_search(query, candidates)
+        vector_hits = self.search(query, k=candidates)
+        keyword_hits = lexical.result() if self.pool else lexical
+        if rerank:
+            return rerank_hits(query, rrf_fuse([keyword_hits, vector_hits], k=max(k, RERANK_CANDIDATES)), k)
+        return rrf_fuse([keyword_hits, vector_hits], k=k)
+
+    # Start the keyword search in the background (or run it here, for in-memory databases).
+    def lexical_search(self, query, k):
+        if self.pool is None:
+            db_file = [row[2] for row in self.conn.execute("PRAGMA database_list") if row[1] == "main"][0]
+            if not db_file:
+                return bm25_rows(self.conn, query, k=k)
+            # SQLite connections can't be shared between threads, so the worker gets its own
+            self.lexical_conn = sqlite3.connect(db_file, check_same_thread=False)
+            self.pool = ThreadPoolExecutor(max_workers=1)
+        return self.pool.submit(bm25_rows, self.lexical_conn, query, k)
+
+    # Close the connection (only if this Retriever opened it) and the keyword search thread.
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.lexical_conn.close()
+            self.pool, self.lexical_conn = None, None
+        if self.owns_conn:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 8. SEMANTIC ANSWER CACHE ###################################
+
+# People ask the same question in slightly different words all day
+# ("Does the plan use a community resilience approach?" vs "Is the plan's approach community resilience?").
+# SemanticCache stores each LLM answer with the question's embedding and the ids of the chunks
+# it was based on. A new question reuses a stored answer (no LLM call) only if:
+# 1) its embedding is within 'threshold' cosine similarity of the stored question,
+# 2) retrieval returned the SAME chunks (so the answer is grounded in the same context), and
+# 3) it has the same 'scope' (e.g. model + system prompt), and the answer is younger than 'ttl' seconds.
+# The cache holds at most 'max_entries' answers, evicting the least recently used.
+class SemanticCache:
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # entry number -> {vec, chunk_ids, scope, answer, created}, oldest first
+        self.next_key = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Drop answers older than ttl.
+    def expire(self):
+        now = time.time()
+        for key in [key for key, e in self.entries.items() if now - e["created"] > self.ttl]:
+            del self.entries[key]
+            self.expirations += 1
+
+    # Return the cached answer for a question, or None.
+    def get(self, query_vec, chunk_ids, scope=None):
+        self.expire()
+        chunk_ids = tuple(sorted(chunk_ids))
+        candidates = [
+            (key, e) for key, e in self.entries.items()
+            if e["chunk_ids"] == chunk_ids and e["scope"] == scope
+        ]
+        if candidates:
+            q = unit_vector(query_vec)
+            sims = np.stack([e["vec"] for _, e in candidates]) @ q
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                key, entry = candidates[best]
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+        self.misses += 1
+        return None
+
+    # Store an answer for a question.
+    def put(self, query_vec, chunk_ids, answer, scope=None):
+        self.entries[self.next_key] = {
+            "vec": unit_vector(query_vec),
+            "chunk_ids": tuple(sorted(chunk_ids)),
+            "scope": scope,
+            "answer": answer,
+            "created": time.time(),
+        }
+        self.next_key += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    # Hit-rate metrics.
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
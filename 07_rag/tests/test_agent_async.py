@@ -0,0 +1,48 @@
+# Offline checks for the async agent helpers in 07_rag/functions.py, against the mock Ollama server
+# Run: python 07_rag/tests/test_agent_async.py   (needs httpx)
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+sys.path.insert(0, str(rag_root.parent / "mock_ollama"))
+
+import functions
+from functions import MAX_CONCURRENT_REQUESTS, agent_run_many
+from mock_ollama import start_mock_server
+
+LATENCY = 0.3  # seconds the mock waits before answering each request
+
+
+def main() -> None:
+    server = start_mock_server(latency=LATENCY, reply_tokens=8, tokens_per_sec=1000)
+    functions.CHAT_URL = f"http://127.0.0.1:{server.server_port}/api/chat"
+    tasks = [f"Question {i}" for i in range(2 * MAX_CONCURRENT_REQUESTS)]
+
+    agent_run_many(role="Answer briefly.", tasks=["warm up"], cache=False)  # first call imports httpx
+
+    print(f"test_agent_async: {len(tasks)} requests, at most {MAX_CONCURRENT_REQUESTS} at a time ...")
+    start = time.perf_counter()
+    answers = agent_run_many(role="Answer briefly.", tasks=tasks, cache=False)
+    elapsed = time.perf_counter() - start
+    # Answers come back in the order of the tasks
+    assert all(a.startswith(f"Mock reply to: {t} ") for a, t in zip(answers, tasks)), answers
+    assert server.stats["chat"] == len(tasks) + 1
+    # Two waves of MAX_CONCURRENT_REQUESTS: faster than one by one, but not all at once
+    assert 2 * LATENCY - 0.05 <= elapsed < len(tasks) * LATENCY / 2, elapsed
+    print(f"   OK ({elapsed:.2f} s; one at a time would take {len(tasks) * LATENCY:.1f} s)")
+
+    print("test_agent_async: agent_run_many can be called again (each call has its own event loop) ...")
+    assert len(agent_run_many(role="Answer briefly.", tasks=tasks[:2], cache=False)) == 2
+    print("   OK")
+
+    server.shutdown()
+    print("\nAll 07_rag async agent checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Offline checks for streaming agent replies in 07_rag/functions.py, against the mock Ollama server
+# Run: python 07_rag/tests/test_agent_stream.py
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+sys.path.insert(0, str(rag_root.parent / "mock_ollama"))
+
+import functions
+from functions import LAST_STREAM_STATS, agent, agent_stream, use_response_cache
+from mock_ollama import start_mock_server
+
+MESSAGES = [{"role": "user", "content": "Summarize the plan."}]
+
+
+class CutOffHandler(BaseHTTPRequestHandler):
+    """Streams two pieces of a reply, then hangs up without the final "done" line."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for piece in ["Partial ", "reply"]:
+            self.wfile.write((json.dumps({"message": {"content": piece}, "done": False}) + "\n").encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def main() -> None:
+    server = start_mock_server(latency=0.2, reply_tokens=20, tokens_per_sec=100)
+    mock_url = f"http://127.0.0.1:{server.server_port}/api/chat"
+    functions.CHAT_URL = mock_url
+    use_response_cache(os.path.join(tempfile.mkdtemp(), "agent_cache.db"))
+
+    print("test_agent_stream: pieces arrive one by one, with TTFT and tokens/sec ...")
+    stats = {}
+    pieces = list(agent_stream(MESSAGES, model="m", stats=stats))
+    assert len(pieces) == 20 and "".join(pieces).startswith("Mock reply to: Summarize the plan.")
+    assert 0.2 <= stats["ttft_s"] < stats["total_s"]
+    assert stats["tokens"] == 20 and 80 <= stats["tokens_per_sec"] <= 120  # from Ollama's eval counts
+    assert stats["stopped_early"] is False and LAST_STREAM_STATS == stats
+    print(f"   OK (ttft {stats['ttft_s']:.2f} s, {stats['tokens_per_sec']:.0f} tokens/sec)")
+
+    print("test_agent_stream: a finished stream is cached and replayed in one piece ...")
+    replayed = list(agent_stream(MESSAGES, model="m"))
+    assert replayed == ["".join(pieces)] and LAST_STREAM_STATS["cached"] is True
+    assert server.stats["chat"] == 1
+    print("   OK")
+
+    print("test_agent_stream: agent(on_token=...) passes every piece to the callback ...")
+    received = []
+    reply = agent(MESSAGES + [{"role": "user", "content": "Shorter."}], model="m", on_token=received.append)
+    assert len(received) == 20 and "".join(received) == reply
+    print("   OK")
+
+    print("test_agent_stream: stopping early hangs up and caches nothing ...")
+    early = MESSAGES + [{"role": "user", "content": "Stop me."}]
+    stream = agent_stream(early, model="m")
+    first_two = [next(stream), next(stream)]
+    stream.close()  # what a `break` out of the for loop does
+    assert LAST_STREAM_STATS["stopped_early"] is True and LAST_STREAM_STATS["tokens"] == 2
+    n_chat = server.stats["chat"]
+    assert "".join(agent_stream(early, model="m")) != "".join(first_two)  # streamed again, in full
+    assert server.stats["chat"] == n_chat + 1
+    print("   OK")
+
+    print("test_agent_stream: a stream cut off before its done line is not cached ...")
+    cut_off = ThreadingHTTPServer(("127.0.0.1", 0), CutOffHandler)
+    threading.Thread(target=cut_off.serve_forever, daemon=True).start()
+    functions.CHAT_URL = f"http://127.0.0.1:{cut_off.server_port}/api/chat"
+    question = MESSAGES + [{"role": "user", "content": "Cut me off."}]
+    assert "".join(agent_stream(question, model="m")) == "Partial reply"
+    assert LAST_STREAM_STATS["stopped_early"] is True
+    functions.CHAT_URL = mock_url
+    assert "".join(agent_stream(question, model="m")).startswith("Mock reply to: Cut me off.")
+    cut_off.shutdown()
+    print("   OK")
+
+    use_response_cache(None)
+    server.shutdown()
+    print("\nAll 07_rag streaming checks passed.")
+
+
+if __name__ == "__main__":
+    main()
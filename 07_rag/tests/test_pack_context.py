@@ -0,0 +1,73 @@
+# Offline checks for context packing in 07_rag (no Ollama / no network / no model download)
+# Run: python 07_rag/tests/test_pack_context.py
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+
+import functions_embed
+from functions import estimate_tokens, pack_context
+from functions_embed import rerank_hits
+
+
+class FakeCrossEncoder:
+    """Scores each (query, text) pair from a fixed table, like CrossEncoder.predict()."""
+
+    def __init__(self, scores: dict[str, float]):
+        self.scores = scores
+
+    def predict(self, pairs, batch_size=32):
+        return [self.scores[text] for _, text in pairs]
+
+
+def main() -> None:
+    print("test_pack_context: a reranked top hit survives packing ...")
+    # First-stage (RRF) order puts chunk 0 last; the cross-encoder says it is by far the best
+    hits = [
+        {"id": 1, "text": "chunk 1", "score": 0.0328},
+        {"id": 2, "text": "chunk 2", "score": 0.0323},
+        {"id": 0, "text": "chunk 0", "score": 0.0125},
+    ]
+    functions_embed._rerank_model = FakeCrossEncoder({"chunk 0": 25.0, "chunk 1": 0.0, "chunk 2": 1.0})
+    reranked = rerank_hits("query", hits, k=3)
+    assert [h["id"] for h in reranked] == [0, 2, 1]
+    assert reranked[0]["score"] == 25.0 and reranked[0]["first_stage_score"] == 0.0125
+    assert pack_context(reranked).startswith("chunk 0")
+    print("   OK")
+
+    print("test_pack_context: stays within the token budget, cutting the last result at a word ...")
+    records = [{"text": "alpha " * 100}, {"text": "beta " * 400}, {"text": "gamma " * 100}]
+    packed = pack_context(records, budget=300)
+    assert estimate_tokens(packed) <= 300
+    assert packed.startswith("alpha") and packed.endswith("beta ...") and "gamma" not in packed
+    print("   OK")
+
+    print("test_pack_context: duplicated and overlapping chunks are trimmed ...")
+    first = " ".join(f"w{i}" for i in range(40))
+    overlapping = " ".join(f"w{i}" for i in range(30, 70))  # shares w30-w39 with 'first'
+    packed = pack_context([{"text": first}, {"text": overlapping}, {"text": "w5 w6 w7"}])
+    assert packed == first + "\n\n" + " ".join(f"w{i}" for i in range(40, 70))
+    print("   OK")
+
+    print("test_pack_context: low-score tail is dropped (positive scores only) ...")
+    records = [{"text": "best", "score": 1.0}, {"text": "close", "score": 0.5}, {"text": "weak", "score": 0.1}]
+    assert pack_context(records) == "best\n\nclose"
+    assert pack_context(records, tail_ratio=0) == "best\n\nclose\n\nweak"
+    distances = [{"text": "a", "score": -0.1}, {"text": "b", "score": -0.9}]
+    assert pack_context(distances) == "a\n\nb"
+    print("   OK")
+
+    print("test_pack_context: table rows become compact JSON lines, without repeats ...")
+    rows = [{"name": "Pikachu", "type": "Electric", "hp": 35}, {"name": "Pikachu", "type": "Electric", "hp": 35}]
+    assert pack_context(rows, keep_columns=["name", "hp"]) == '{"name": "Pikachu", "hp": 35}'
+    print("   OK")
+
+    print("\nAll 07_rag pack_context checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Offline checks for the agent response cache in 07_rag/functions.py, against the mock Ollama server
+# Run: python 07_rag/tests/test_response_cache.py
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+sys.path.insert(0, str(rag_root.parent / "mock_ollama"))
+
+import functions
+from functions import agent_run, response_cache_key, use_response_cache
+from mock_ollama import start_mock_server
+
+ROLE = "Answer in one sentence."
+
+
+def cached_rows(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def main() -> None:
+    server = start_mock_server(reply_tokens=5, tokens_per_sec=1000)
+    functions.CHAT_URL = f"http://127.0.0.1:{server.server_port}/api/chat"
+    path = os.path.join(tempfile.mkdtemp(), "agent_cache.db")
+
+    print("test_response_cache: key covers what changes the answer, in a canonical order ...")
+    body = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "options": {"a": 1, "b": 2}}
+    same = {"options": {"b": 2, "a": 1}, "stream": True, "messages": body["messages"], "model": "m"}
+    assert response_cache_key(body) == response_cache_key(same)  # key order and "stream" don't matter
+    assert response_cache_key(body) != response_cache_key({**body, "options": {"a": 1, "b": 3}})
+    assert response_cache_key(body) != response_cache_key({**body, "model": "other"})
+    print("   OK")
+
+    print("test_response_cache: an identical request is answered from the cache ...")
+    use_response_cache(path)
+    first = agent_run(role=ROLE, task="What flooded?")
+    assert agent_run(role=ROLE, task="What flooded?") == first
+    assert server.stats["chat"] == 1
+    print("   OK")
+
+    print("test_response_cache: cache=False and AGENT_CACHE_BYPASS=1 go to the model ...")
+    agent_run(role=ROLE, task="What flooded?", cache=False)
+    os.environ["AGENT_CACHE_BYPASS"] = "1"
+    agent_run(role=ROLE, task="What flooded?")
+    del os.environ["AGENT_CACHE_BYPASS"]
+    assert server.stats["chat"] == 3
+    agent_run(role=ROLE, task="What flooded?")  # the refreshed response is still cached
+    assert server.stats["chat"] == 3
+    print("   OK")
+
+    print("test_response_cache: cached responses expire after ttl ...")
+    use_response_cache(path, ttl=0.2)
+    agent_run(role=ROLE, task="What flooded?")
+    assert server.stats["chat"] == 3
+    time.sleep(0.3)
+    agent_run(role=ROLE, task="What flooded?")
+    assert server.stats["chat"] == 4
+    print("   OK")
+
+    print("test_response_cache: the least recently used rows are evicted beyond max_rows ...")
+    use_response_cache(path, max_rows=2)
+    for task in ["Task A", "Task B"]:
+        agent_run(role=ROLE, task=task)
+    time.sleep(0.01)
+    agent_run(role=ROLE, task="Task A")  # now more recently used than B
+    agent_run(role=ROLE, task="Task C")  # evicts B
+    assert cached_rows(path) == 2
+    n_chat = server.stats["chat"]
+    agent_run(role=ROLE, task="Task A")
+    agent_run(role=ROLE, task="Task C")
+    assert server.stats["chat"] == n_chat
+    agent_run(role=ROLE, task="Task B")
+    assert server.stats["chat"] == n_chat + 1
+    print("   OK")
+
+    use_response_cache(None)
+    server.shutdown()
+    print("\nAll 07_rag response cache checks passed.")
+
+
+if __name__ == "__main__":
+    main()
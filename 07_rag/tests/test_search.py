@@ -0,0 +1,74 @@
+# Offline checks for the keyword search helpers in 07_rag/functions.py (no Ollama / no network)
+# Run: python 07_rag/tests/test_search.py
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+
+from functions import TEXT_INDEX_CACHE, search_table, search_text_index
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def main() -> None:
+    folder = tempfile.mkdtemp()
+
+    print("test_search: search_table matches literal text across columns ...")
+    path = write(folder, "items.csv", "Name,Type\nPikachu,Electric\nMr. Mime,Psychic\nSnorlax,Normal\n")
+    assert list(search_table("CHU", path, columns=["Name"])["Name"]) == ["Pikachu"]
+    assert list(search_table("mr.", path, columns=["Name"])["Name"]) == ["Mr. Mime"]
+    assert list(search_table("normal", path, columns=["Name", "Type"])["Name"]) == ["Snorlax"]
+    print("   OK")
+
+    print("test_search: search_table on a header-only CSV ...")
+    path = write(folder, "empty.csv", "Name,Type\n")
+    assert search_table("pikachu", path, columns=["Name"]).empty
+    assert search_table("pikachu", path, columns=["Name", "Type"]).empty
+    print("   OK")
+
+    print("test_search: search_text_index matches words anywhere, in any order, inside longer words ...")
+    path = write(
+        folder,
+        "notes.txt",
+        "Models learn from data.\nDeep learning needs data.\nShe learned it.\n"
+        "Learners, unite!\nNothing here.\nData about learning.\n",
+    )
+    assert [m["line"] for m in search_text_index("learn", path)] == [1, 2, 3, 4, 6]
+    assert [m["line"] for m in search_text_index("data learning", path)] == [2, 6]
+    assert [m["text"] for m in search_text_index("UNITE", path)] == ["Learners, unite!"]
+    assert search_text_index("missing", path) == []
+    print("   OK")
+
+    print("test_search: trigram lookup finds words containing the query, and only those ...")
+    path = write(folder, "words.txt", "relearn it\nearly bird\nlean year\nan ox\n")
+    assert [m["line"] for m in search_text_index("earn", path)] == [1]  # not "early" / "lean year"
+    assert [m["line"] for m in search_text_index("ear", path)] == [1, 2, 3]
+    assert [m["line"] for m in search_text_index("an", path)] == [3, 4]  # short words scan the vocabulary
+    assert [m["line"] for m in search_text_index("o", path)] == [4]
+    print("   OK")
+
+    print("test_search: the index is saved next to the file and rebuilt when the file changes ...")
+    assert os.path.exists(path + ".index.json")
+    TEXT_INDEX_CACHE.clear()  # a new process would load the saved index
+    assert [m["line"] for m in search_text_index("bird", path)] == [2]
+    write(folder, "words.txt", "a bird\nno birds here? yes: birds\n")
+    assert [m["line"] for m in search_text_index("bird", path)] == [1, 2]
+    assert search_text_index("earn", path) == []
+    print("   OK")
+
+    print("\nAll 07_rag search checks passed.")
+
+
+if __name__ == "__main__":
+    main()
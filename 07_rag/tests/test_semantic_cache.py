@@ -0,0 +1,60 @@
+# Offline checks for the semantic answer cache in 07_rag (no Ollama / no network / no model download)
+# Run: python 07_rag/tests/test_semantic_cache.py
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+
+from functions_embed import SemanticCache
+
+
+def vec(*values: float) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+
+def main() -> None:
+    question = vec(1, 0, 0)
+    paraphrase = vec(0.99, 0.1, 0)  # cosine ~0.995 with question
+    unrelated = vec(0, 1, 0)
+
+    print("test_semantic_cache: similar question + same chunks hits, otherwise misses ...")
+    cache = SemanticCache(threshold=0.95, ttl=60, max_entries=10)
+    cache.put(question, [3, 1, 2], "answer A", scope=("model", "role"))
+    assert cache.get(paraphrase, [1, 2, 3], scope=("model", "role")) == "answer A"  # chunk order doesn't matter
+    assert cache.get(unrelated, [1, 2, 3], scope=("model", "role")) is None  # below threshold
+    assert cache.get(question, [1, 2, 4], scope=("model", "role")) is None  # different context
+    assert cache.get(question, [1, 2, 3], scope=("other model", "role")) is None  # different scope
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 1) and stats["hit_rate"] == 0.25
+    print("   OK")
+
+    print("test_semantic_cache: answers expire after ttl ...")
+    cache = SemanticCache(threshold=0.95, ttl=60)
+    cache.put(question, [1], "old answer")
+    next(iter(cache.entries.values()))["created"] -= 61  # pretend it was stored a minute ago
+    assert cache.get(question, [1]) is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+    print("   OK")
+
+    print("test_semantic_cache: least recently used answer is evicted ...")
+    cache = SemanticCache(threshold=0.95, ttl=60, max_entries=2)
+    cache.put(vec(1, 0, 0), [1], "first")
+    cache.put(vec(0, 1, 0), [2], "second")
+    assert cache.get(vec(1, 0, 0), [1]) == "first"  # "first" is now the most recently used
+    cache.put(vec(0, 0, 1), [3], "third")  # evicts "second"
+    assert cache.get(vec(0, 1, 0), [2]) is None
+    assert cache.get(vec(1, 0, 0), [1]) == "first" and cache.get(vec(0, 0, 1), [3]) == "third"
+    assert cache.stats()["evictions"] == 1
+    print("   OK")
+
+    print("\nAll 07_rag semantic cache checks passed.")
+
+
+if __name__ == "__main__":
+    main()
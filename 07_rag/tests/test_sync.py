@@ -0,0 +1,88 @@
+# Offline checks for incremental index sync in 07_rag (no Ollama / no network / no model download)
+# A fake embedding model stands in for sentence-transformers; vectors live in the NumPy store.
+# Run: python 07_rag/tests/test_sync.py
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+rag_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rag_root))
+
+import functions_embed
+from functions_embed import (
+    VEC_DIM, EMBED_MODEL, chunk_hash, connect_db, create_tables, iter_token_windows, open_store, sync_document,
+)
+
+DOCUMENT = rag_root / "data" / "lower_manhattan_recovery_plan.txt"
+
+
+class FakeModel:
+    """Deterministic random 'embeddings' (one seed per text); counts how many texts were encoded."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.encoded += len(texts)
+        seeds = [int(chunk_hash(t)[:8], 16) for t in texts]
+        return np.array([np.random.default_rng(s).normal(size=VEC_DIM) for s in seeds], dtype=np.float32)
+
+
+def main() -> None:
+    model = FakeModel()
+    functions_embed._embed_models[EMBED_MODEL] = model
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "plan.txt")
+    with open(DOCUMENT, encoding="utf-8", newline="") as f:
+        original = f.read()
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(original)
+
+    conn = connect_db(os.path.join(folder, "embed.db"), load_vec=False)
+    store = open_store(conn, "numpy")
+    create_tables(conn, store=store)
+
+    print("test_sync: first sync embeds every chunk ...")
+    first = sync_document(conn, path, iter_token_windows(path), store=store, cache=False)
+    assert first["added"] > 10 and first["removed"] == 0 and model.encoded == first["added"]
+    print(f"   OK ({first['added']} chunks)")
+
+    print("test_sync: re-sync of an unchanged file embeds nothing ...")
+    again = sync_document(conn, path, iter_token_windows(path), store=store, cache=False)
+    assert again["added"] == 0 and again["removed"] == 0 and again["kept"] == first["added"]
+    print("   OK")
+
+    print("test_sync: an edit near the top only re-embeds its own chunk ...")
+    cut = original.index(" ", 200)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(original[:cut] + " inserted" + original[cut:])
+    edited = sync_document(conn, path, iter_token_windows(path), store=store, cache=False)
+    assert edited["added"] == 1 and edited["removed"] == 1, edited
+    assert edited["kept"] == first["added"] - 1
+    n_rows = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    assert n_rows == first["added"]
+    conn.close()
+    print("   OK")
+
+    print("test_sync: an in-memory database keeps its NumPy vectors out of the working folder ...")
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    memory_conn = connect_db(":memory:", load_vec=False)
+    memory_store = open_store(memory_conn, "numpy")
+    create_tables(memory_conn, store=memory_store)
+    sync_document(memory_conn, path, iter_token_windows(path), store=memory_store, cache=False)
+    assert os.listdir(workdir) == []
+    memory_conn.close()
+    print("   OK")
+
+    print("\nAll 07_rag sync checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,17 @@
 # then starts `ollama serve` in the background without blocking
 # the Python session. Useful for starting a local LLM server
 # from within Python notebooks or scripts.
+#
+# Other scripts run this file (via runpy) every time they start, so it is safe to run repeatedly:
+# if a server is already answering on PORT, we reuse it instead of starting a second one.
+# Otherwise we start one and wait until it actually answers (not a fixed sleep).
+# We wait up to 5 minutes, since a first start on a slow laptop can take a while; set the
+# environment variable OLLAMA_READY_TIMEOUT to change that (in seconds; 0 = wait as long as it takes).
 
 import os
 import subprocess
 import time
+import urllib.request
 
 # 0. Setup #################################
 
@@ -22,27 +29,64 @@ import time
 PORT = 11434  # Match 01_ollama.sh
 OLLAMA_HOST = f"0.0.0.0:{PORT}"
 OLLAMA_CONTEXT_LENGTH = 32000
+READY_URL = f"http://127.0.0.1:{PORT}/api/tags"  # cheap endpoint that answers once the server is up
+READY_TIMEOUT = float(os.environ.get("OLLAMA_READY_TIMEOUT", "300"))  # seconds to wait for a new server (0 = no limit)
 
 # Set environment variables for this process and any child processes
 os.environ["OLLAMA_HOST"] = OLLAMA_HOST
 os.environ["OLLAMA_CONTEXT_LENGTH"] = str(OLLAMA_CONTEXT_LENGTH)
 
-## 0.2 Start Ollama Server #######################
+## 0.2 Readiness Probe #######################
 
-# Start `ollama serve` in the background.
-# stdout/stderr are redirected to DEVNULL so the console is not flooded.
-process = subprocess.Popen(
-    ["ollama", "serve"],
-    stdout=subprocess.DEVNULL,
-    stderr=subprocess.DEVNULL,
-)
+# Is an Ollama server answering on PORT right now?
+def ollama_ready(timeout=1.0):
+    try:
+        with urllib.request.urlopen(READY_URL, timeout=timeout) as response:
+            return response.status == 200
+    except OSError:  # connection refused, timeout, HTTP error...
+        return False
 
-# Give the server a moment to start listening before use
-time.sleep(1)
+# Probe until the server answers, waiting a little longer after each miss
+# (0.1s, 0.2s, 0.4s, ... capped at 2s) so a fast start is noticed quickly.
+# If the server process we started has already exited (port in use, bad install...), stop right away.
+def wait_for_ollama(process=None, timeout=READY_TIMEOUT):
+    deadline = time.monotonic() + timeout if timeout > 0 else float("inf")
+    delay = 0.1
+    while time.monotonic() < deadline:
+        if ollama_ready():
+            return True
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(
+                f"`ollama serve` exited with code {process.returncode} before answering on port {PORT}. "
+                "Is another program using the port, or is Ollama not installed correctly?"
+            )
+        time.sleep(delay)
+        delay = min(delay * 2, 2.0)
+    return ollama_ready()
 
-# Optional: you can keep a reference to `process` if you want to stop it later
-# For example:
+## 0.3 Start Ollama Server (or reuse one) #######################
+
+process = None  # the server we started, if any
+if ollama_ready():
+    print(f"Ollama is already running on port {PORT}; reusing it.")
+else:
+    # Start `ollama serve` in the background.
+    # stdout/stderr are redirected to DEVNULL so the console is not flooded.
+    start = time.monotonic()
+    process = subprocess.Popen(
+        ["ollama", "serve"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if not wait_for_ollama(process):
+        raise RuntimeError(
+            f"Started `ollama serve`, but it did not answer on port {PORT} within {READY_TIMEOUT:g} seconds. "
+            "If it is just slow to start, set OLLAMA_READY_TIMEOUT to wait longer (0 = no limit)."
+        )
+    print(f"Ollama started on port {PORT} in {time.monotonic() - start:.1f} seconds.")
+
+# Optional: if this script started the server, you can stop it later with
 # process.terminate()  # or process.kill()
 
 # On Windows, from a separate shell you can also stop it with:
-#   taskkill /F /IM ollama.exe
\ No newline at end of file
+#   taskkill /F /IM ollama.exe
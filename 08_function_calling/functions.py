@@ -10,7 +10,13 @@
 ## 0.1 Load Packages #################################
 
 import requests  # for HTTP requests
+import asyncio   # for the async agent helpers
+import inspect   # for awaiting async tool functions
 import json      # for working with JSON
+import hashlib   # for hashing requests (response cache)
+import os        # for reading cache settings from the environment
+import sqlite3   # for the response cache file (built-in)
+import threading # for guarding the response cache
 import pandas as pd  # for data manipulation
 import sys       # for stack frame inspection
 import time      # for simple polling/retry
@@ -26,24 +32,71 @@ PORT = 11434
 OLLAMA_HOST = f"http://localhost:{PORT}"
 CHAT_URL = f"{OLLAMA_HOST}/api/chat"
 REQUEST_TIMEOUT = 300  # seconds; avoid hanging indefinitely on network/model issues
+MAX_CONCURRENT_REQUESTS = 4  # max requests agent_async() sends to Ollama at the same time
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # seconds a cached response stays valid (see use_response_cache())
+RESPONSE_CACHE_MAX_ROWS = 2000  # least recently used responses are dropped beyond this
 OLLAMA_TAGS_URL = f"{OLLAMA_HOST}/api/tags"
 
 
+HEALTH_TTL_SECONDS = 60  # trust a successful health check for this long before probing again
+BREAKER_COOLDOWN_SECONDS = 30  # after Ollama was found down, fail fast for this long instead of re-polling
+
+# Cached health status, shared by every agent() call in this process.
+# - ok_until:   health is known-good until this time (no probe needed)
+# - open_until: circuit breaker is "open" (Ollama known-down) until this time
+_ollama_health = {"ok_until": 0.0, "open_until": 0.0, "last_err": None}
+
+
 def ensure_ollama_available(max_wait_seconds: int = 15, poll_interval_seconds: float = 0.5) -> None:
     """
     Fail fast with a helpful message if Ollama isn't reachable.
+
+    A successful check is cached for HEALTH_TTL_SECONDS, so repeated agent() calls
+    don't probe /api/tags every time. If Ollama can't be reached within max_wait_seconds,
+    the circuit breaker opens: calls during the next BREAKER_COOLDOWN_SECONDS raise
+    immediately instead of waiting again. Polling starts at poll_interval_seconds and
+    doubles after each miss (capped at 4 seconds).
     """
-    deadline = time.time() + max_wait_seconds
+    now = time.monotonic()
+    if now < _ollama_health["ok_until"]:
+        return
+    if now < _ollama_health["open_until"]:
+        _raise_ollama_unavailable(_ollama_health["last_err"])
+
+    deadline = now + max_wait_seconds
+    delay = poll_interval_seconds
     last_err = None
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         try:
             r = requests.get(OLLAMA_TAGS_URL, timeout=5)
             if r.ok:
+                mark_ollama_healthy()
                 return
+            last_err = f"HTTP {r.status_code}"
         except Exception as e:
             last_err = e
-        time.sleep(poll_interval_seconds)
+        time.sleep(delay)
+        delay = min(delay * 2, 4.0)
+
+    _ollama_health["ok_until"] = 0.0
+    _ollama_health["open_until"] = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+    _ollama_health["last_err"] = last_err
+    _raise_ollama_unavailable(last_err)
+
+
+def mark_ollama_healthy() -> None:
+    """Record that Ollama just answered (health check or a real chat response)."""
+    _ollama_health["ok_until"] = time.monotonic() + HEALTH_TTL_SECONDS
+    _ollama_health["open_until"] = 0.0
+    _ollama_health["last_err"] = None
+
 
+def mark_ollama_unhealthy() -> None:
+    """Forget a cached healthy status (e.g. after a connection error), so the next call probes again."""
+    _ollama_health["ok_until"] = 0.0
+
+
+def _raise_ollama_unavailable(last_err) -> None:
     raise RuntimeError(
         "Ollama is not reachable at localhost:11434. "
         "Start it first with: `python 08_function_calling/01_ollama.py`.\n"
@@ -52,7 +105,138 @@ def ensure_ollama_available(max_wait_seconds: int = 15, poll_interval_seconds: f
 
 # 1. AGENT FUNCTION ###################################
 
-def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
+# Reuse one HTTP connection to Ollama across agent() calls, instead of opening a new one each time.
+_session = None
+
+
+def get_session():
+    """Return the shared requests.Session used by agent() (created on first use)."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def find_tool(func_name):
+    """Find a tool function by name: first in this module, then in the script being run (__main__)."""
+    func = globals().get(func_name)
+    if func is None:
+        func = getattr(sys.modules.get("__main__"), func_name, None)
+    return func
+
+
+# Optional response cache.
+# While you iterate on the later steps of a multi-agent script, the earlier agents get the exact same
+# request on every rerun, and each one takes seconds. With the cache on, agent() saves every Ollama
+# response in a small SQLite file, keyed by a hash of model + messages + tools + options, and answers
+# an identical request from that file instantly. (Tool functions still run every time.)
+# - Turn it on in a script with use_response_cache(), or set AGENT_CACHE_PATH=agent_cache.db.
+# - Skip it for one call with agent(..., cache=False), or for a whole run with AGENT_CACHE_BYPASS=1;
+#   either way the fresh response replaces the cached one.
+_response_cache = {
+    "path": os.getenv("AGENT_CACHE_PATH", ""),  # "" = cache off
+    "ttl": RESPONSE_CACHE_TTL,
+    "max_rows": RESPONSE_CACHE_MAX_ROWS,
+    "conn": None,
+}
+_response_cache_lock = threading.Lock()  # agent() may be called from several threads at once
+
+
+def use_response_cache(path="agent_cache.db", ttl=RESPONSE_CACHE_TTL, max_rows=RESPONSE_CACHE_MAX_ROWS):
+    """Turn on the response cache, stored in the SQLite file `path` (path=None turns it off)."""
+    with _response_cache_lock:
+        if _response_cache["conn"] is not None:
+            _response_cache["conn"].close()
+        _response_cache.update(path=path or "", ttl=ttl, max_rows=max_rows, conn=None)
+
+
+def response_cache_key(body):
+    """Hash everything that changes the answer (model, messages, tools, options) in a canonical order."""
+    request = {key: body.get(key) for key in ["model", "messages", "tools", "options", "format"]}
+    text = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _response_cache_conn():
+    # Open the cache file on first use (call with _response_cache_lock held)
+    if _response_cache["conn"] is None:
+        conn = sqlite3.connect(_response_cache["path"], check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+        )
+        _response_cache["conn"] = conn
+    return _response_cache["conn"]
+
+
+def cache_lookup(body):
+    """Return the cached response to this request, or None (cache off, bypassed, missing or expired)."""
+    if not _response_cache["path"] or os.getenv("AGENT_CACHE_BYPASS", "") == "1":
+        return None
+    key = response_cache_key(body)
+    now = time.time()
+    with _response_cache_lock:
+        conn = _response_cache_conn()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > _response_cache["ttl"]:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        conn.commit()
+    return json.loads(row[0])
+
+
+def cache_store(body, result):
+    """Save a response (if the cache is on), dropping expired rows and the least recently used beyond max_rows."""
+    if not _response_cache["path"]:
+        return
+    key = response_cache_key(body)
+    now = time.time()
+    with _response_cache_lock:
+        conn = _response_cache_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(result), now, now),
+        )
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - _response_cache["ttl"],))
+        n_extra = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - _response_cache["max_rows"]
+        if n_extra > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used LIMIT ?)",
+                (n_extra,),
+            )
+        conn.commit()
+
+
+def post_chat(body, cache=True):
+    """
+    POST a chat request to Ollama and return the parsed JSON.
+    If the response cache is on, an identical earlier request is answered from it without
+    contacting Ollama at all (cache=False skips the lookup and refreshes the cached response).
+    A response refreshes the cached health status; a connection error clears it.
+    """
+    result = cache_lookup(body) if cache else None
+    if result is not None:
+        return result
+    ensure_ollama_available()
+    start = time.perf_counter()
+    try:
+        response = get_session().post(CHAT_URL, json=body, timeout=REQUEST_TIMEOUT)
+    except requests.ConnectionError:
+        mark_ollama_unhealthy()
+        raise
+    mark_ollama_healthy()
+    response.raise_for_status()
+    result = response.json()
+    record_telemetry(result, body["model"], time.perf_counter() - start)
+    cache_store(body, result)
+    return result
+
+
+def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, cache=True, on_token=None):
     """
     Agent wrapper function that runs a single agent, with or without tools.
     
@@ -69,6 +253,12 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         List of tool metadata dictionaries for function calling
     all : bool
         If True, return all responses. If False, return only the last response.
+    cache : bool
+        If False, skip the response cache for this call (see use_response_cache()).
+    on_token : function, optional
+        If given (and there are no tools), the reply is streamed and on_token(piece) is called
+        for each piece as it arrives, e.g. on_token=lambda t: print(t, end="", flush=True).
+        Timing is saved in LAST_STREAM_STATS (see agent_stream()).
     
     Returns:
     --------
@@ -77,8 +267,14 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
     """
     
     # If the agent has NO tools, perform a standard chat
+    if tools is None and on_token is not None:
+        # Stream the reply, passing each piece to on_token as it arrives
+        pieces = []
+        for piece in agent_stream(messages, model=model, cache=cache):
+            on_token(piece)
+            pieces.append(piece)
+        return "".join(pieces)
     if tools is None:
-        ensure_ollama_available()
         body = {
             "model": model,
             "messages": messages,
@@ -87,14 +283,11 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             "options": {"num_predict": 500},
         }
         
-        response = requests.post(CHAT_URL, json=body, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        result = response.json()
+        result = post_chat(body, cache=cache)
         
         return result["message"]["content"]
     else:
         # If the agent has tools, perform a tool call
-        ensure_ollama_available()
         body = {
             "model": model,
             "messages": messages,
@@ -103,9 +296,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             "options": {"num_predict": 500},
         }
         
-        response = requests.post(CHAT_URL, json=body, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        result = response.json()
+        result = post_chat(body, cache=cache)
         
         # For any given tool call, execute the tool call
         if "tool_calls" in result.get("message", {}):
@@ -119,8 +310,8 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
                 # Keep behavior consistent with the R examples (where arguments are already structured).
                 func_args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
                 
-                # Get the function from globals and execute it
-                func = globals().get(func_name)
+                # Find the function (this module or the calling script) and execute it
+                func = find_tool(func_name)
                 # `agent()` lives in this module, but students typically define tool functions
                 # in the *calling script* (e.g. `03_agents_with_function_calling.py`).
                 # Search up the stack to find the function in caller globals.
@@ -150,7 +341,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             return result["message"]["content"]
 
 
-def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
+def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL, cache=True, on_token=None):
     """
     Run an agent with a specific role and task.
     
@@ -166,6 +357,10 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
         Output format (default: "text")
     model : str
         Model to use (default: DEFAULT_MODEL)
+    cache : bool
+        If False, skip the response cache for this call
+    on_token : function, optional
+        Stream the reply, calling on_token(piece) for each piece (see agent())
     
     Returns:
     --------
@@ -180,10 +375,340 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
     ]
     
     # Run the agent
-    resp = agent(messages=messages, model=model, output=output, tools=tools)
+    resp = agent(messages=messages, model=model, output=output, tools=tools, cache=cache, on_token=on_token)
     return resp
 
 
+## 1.1 Async Agent Functions #################################
+
+# agent_async() is agent() for asyncio: many requests can wait on Ollama at the same time
+# from a single thread. Every call shares one pooled httpx.AsyncClient (connections are reused),
+# and a semaphore keeps at most MAX_CONCURRENT_REQUESTS in flight so Ollama isn't flooded.
+# From a normal (non-async) script, agent_run_many() runs a whole batch and returns the answers in order.
+# pip install httpx
+
+# The client and semaphore belong to one event loop, and asyncio.run() makes a new loop each time,
+# so they are re-created whenever the running loop changes.
+_async_state = {"loop": None, "client": None, "semaphore": None}
+
+
+def get_async_client():
+    """Return the shared (httpx.AsyncClient, asyncio.Semaphore) for the running event loop."""
+    import httpx  # imported here, so scripts that only use agent() don't need httpx
+
+    loop = asyncio.get_running_loop()
+    if _async_state["loop"] is not loop:
+        _async_state["loop"] = loop
+        _async_state["client"] = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS),
+        )
+        _async_state["semaphore"] = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _async_state["client"], _async_state["semaphore"]
+
+
+async def close_async_client():
+    """Close the shared async client (agent_run_many() does this for you)."""
+    client = _async_state["client"]
+    _async_state.update(loop=None, client=None, semaphore=None)
+    if client is not None:
+        await client.aclose()
+
+
+async def agent_async(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, cache=True):
+    """
+    Async version of agent(): same arguments, same return values.
+    
+    Use `await agent_async(...)` inside async code; run several with asyncio.gather()
+    (or agent_run_many_async()) to overlap their requests.
+    Tool functions may be normal functions or async functions.
+    
+    Returns:
+    --------
+    str or list
+        The agent's response(s)
+    """
+    
+    body = {"model": model, "messages": messages, "stream": False, "options": {"num_predict": 500}}
+    if tools is not None:
+        body["tools"] = tools
+    
+    result = cache_lookup(body) if cache else None
+    if result is None:
+        await asyncio.to_thread(ensure_ollama_available)
+        client, semaphore = get_async_client()
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(CHAT_URL, json=body)
+        response.raise_for_status()
+        mark_ollama_healthy()
+        result = response.json()
+        record_telemetry(result, model, time.perf_counter() - start)
+        cache_store(body, result)
+    
+    # Without tools, just return the reply
+    if tools is None:
+        return result["message"]["content"]
+    
+    # Otherwise, execute each tool call (see agent())
+    tool_calls = result.get("message", {}).get("tool_calls")
+    for tool_call in tool_calls or []:
+        func_name = tool_call["function"]["name"]
+        raw_args = tool_call["function"].get("arguments", {})
+        func_args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
+        func = find_tool(func_name)
+        if func:
+            tool_output = func(**func_args)
+            if inspect.isawaitable(tool_output):
+                tool_output = await tool_output
+            tool_call["output"] = tool_output
+    
+    if all:
+        return result
+    if tool_calls:
+        if output == "tools":
+            return tool_calls
+        return tool_calls[-1].get("output", result["message"]["content"])
+    return result["message"]["content"]
+
+
+async def agent_run_async(role, task, tools=None, output="text", model=DEFAULT_MODEL, cache=True):
+    """
+    Async version of agent_run(): run an agent with a specific role and task.
+    """
+    messages = [
+        {"role": "system", "content": role},
+        {"role": "user", "content": task}
+    ]
+    return await agent_async(messages=messages, model=model, output=output, tools=tools, cache=cache)
+
+
+async def agent_run_many_async(role, tasks, tools=None, output="text", model=DEFAULT_MODEL, cache=True):
+    """
+    Run the same agent on many tasks at once (asyncio.gather); answers come back in the order of `tasks`.
+    At most MAX_CONCURRENT_REQUESTS requests are sent to Ollama at the same time.
+    """
+    return await asyncio.gather(
+        *(agent_run_async(role, task, tools=tools, output=output, model=model, cache=cache) for task in tasks)
+    )
+
+
+def agent_run_many(role, tasks, tools=None, output="text", model=DEFAULT_MODEL, cache=True):
+    """
+    Run the same agent on many tasks concurrently, from normal (non-async) code.
+    
+    Parameters:
+    -----------
+    role : str
+        The system prompt defining the agent's role
+    tasks : list of str
+        One user message per request
+    tools, output, model, cache :
+        As in agent_run()
+    
+    Returns:
+    --------
+    list
+        One response per task, in the same order as `tasks`
+    
+    Note: this starts its own event loop, so it can't be called where one is already running
+    (e.g. a Jupyter cell); there, use `await agent_run_many_async(...)` instead.
+    """
+    
+    async def run_all():
+        try:
+            return await agent_run_many_async(role, tasks, tools=tools, output=output, model=model, cache=cache)
+        finally:
+            await close_async_client()
+    
+    return asyncio.run(run_all())
+
+
+## 1.2 Streaming Agent Functions #################################
+
+# With "stream": False we only see the reply once the whole thing is generated.
+# agent_stream() asks Ollama to stream instead: /api/chat then sends one JSON object per line
+# (NDJSON) as the model generates, and we yield each piece of text as soon as it arrives.
+# That lets a front-end show the reply as it is written, and lets the caller stop early
+# (break out of the loop and we hang up, which tells Ollama to stop generating).
+# Each call also records how long the first token took (time to first token, TTFT)
+# and how fast the rest came (tokens per second), in LAST_STREAM_STATS.
+LAST_STREAM_STATS = {}  # stats for the most recent agent_stream() call
+
+
+def agent_stream(messages, model=DEFAULT_MODEL, stats=None, cache=True):
+    """
+    Stream an agent's reply (no tools), yielding the text piece by piece as it is generated.
+    
+    Parameters:
+    -----------
+    messages : list
+        List of message dictionaries with 'role' and 'content' keys
+    model : str
+        The model to be used for the agent
+    stats : dict, optional
+        Filled in with ttft_s, total_s, tokens, tokens_per_sec and stopped_early
+        (also copied to LAST_STREAM_STATS)
+    cache : bool
+        If False, skip the response cache for this call (see use_response_cache())
+    
+    Yields:
+    -------
+    str
+        The next piece of the reply
+    
+    Example:
+    --------
+    for piece in agent_stream(messages):
+        print(piece, end="", flush=True)
+    """
+    
+    body = {"model": model, "messages": messages, "stream": True, "options": {"num_predict": 500}}
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    
+    # A cached reply arrives all at once
+    cached = cache_lookup(body) if cache else None
+    if cached is not None:
+        text = cached["message"]["content"]
+        stats.update(ttft_s=time.perf_counter() - start, total_s=time.perf_counter() - start,
+                     tokens=None, tokens_per_sec=None, stopped_early=False, cached=True)
+        LAST_STREAM_STATS.clear()
+        LAST_STREAM_STATS.update(stats)
+        yield text
+        return
+    
+    ensure_ollama_available()
+    pieces = []
+    last = None  # the final chunk ("done": true) carries Ollama's own token counts
+    response = get_session().post(CHAT_URL, json=body, stream=True, timeout=REQUEST_TIMEOUT)
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            piece = chunk.get("message", {}).get("content", "")
+            if piece:
+                if not pieces:
+                    stats["ttft_s"] = time.perf_counter() - start
+                pieces.append(piece)
+                yield piece
+            if chunk.get("done"):
+                last = chunk
+                break
+    finally:
+        # Runs even if the caller stopped early: closing the response hangs up on Ollama
+        response.close()
+        total = time.perf_counter() - start
+        stats.setdefault("ttft_s", None)
+        stats["total_s"] = total
+        stats["stopped_early"] = last is None
+        stats["cached"] = False
+        if last is not None and last.get("eval_count") and last.get("eval_duration"):
+            stats["tokens"] = last["eval_count"]
+            stats["tokens_per_sec"] = last["eval_count"] / (last["eval_duration"] / 1e9)
+        else:
+            # No counts from Ollama (e.g. stopped early): count streamed pieces instead (~1 token each)
+            stats["tokens"] = len(pieces)
+            generating = total - (stats["ttft_s"] or 0)
+            stats["tokens_per_sec"] = len(pieces) / generating if generating > 0 else None
+        LAST_STREAM_STATS.clear()
+        LAST_STREAM_STATS.update(stats)
+    
+    # Only a complete reply (ended by the "done" chunk) is cached; a cut-off stream would be replayed truncated
+    if last is not None:
+        record_telemetry(last, model, stats["total_s"])
+        cache_store(body, {"message": {"role": "assistant", "content": "".join(pieces)}})
+
+
+## 1.3 Telemetry #################################
+
+# Every /api/chat reply from Ollama says where its time went (durations are in nanoseconds):
+# - load_duration:        loading the model into memory (large on the first call, ~0 after)
+# - prompt_eval_duration: reading the prompt (prompt_eval_count tokens)
+# - eval_duration:        generating the reply (eval_count tokens)
+# - total_duration:       all of the above, plus a little overhead
+# Set LLM_TELEMETRY_PATH (e.g. "telemetry.jsonl") and every agent call appends one JSON line with
+# these numbers, tagged by script, model and stage (see set_telemetry_stage()).
+# telemetry_summary() then shows, per stage, how much time went to loading, prompt and generation.
+# Responses served from the response cache are not recorded (they cost no model time).
+TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH", "")  # "" = telemetry off
+_telemetry = {"stage": ""}
+_telemetry_lock = threading.Lock()
+
+
+def set_telemetry_stage(stage):
+    """Tag the following agent calls with a stage name, e.g. set_telemetry_stage("agent 2: analysis")."""
+    _telemetry["stage"] = stage or ""
+
+
+def record_telemetry(result, model, wall_seconds, stage=None):
+    """Append one call's Ollama timing fields to TELEMETRY_PATH (JSONL), if telemetry is on; never raises."""
+    if not TELEMETRY_PATH:
+        return
+    
+    def ms(key):
+        return round(result.get(key, 0) / 1e6, 2)
+    
+    eval_count = result.get("eval_count", 0)
+    row = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "interactive",
+        "stage": stage if stage is not None else _telemetry["stage"],
+        "model": model,
+        "wall_ms": round(wall_seconds * 1000, 2),
+        "total_ms": ms("total_duration"),
+        "load_ms": ms("load_duration"),
+        "prompt_tokens": result.get("prompt_eval_count", 0),
+        "prompt_ms": ms("prompt_eval_duration"),
+        "eval_tokens": eval_count,
+        "eval_ms": ms("eval_duration"),
+        "tokens_per_sec": round(eval_count / (result["eval_duration"] / 1e9), 2) if result.get("eval_duration") else None,
+    }
+    # Telemetry is best effort: a write failure must not turn a good model reply into an error
+    try:
+        with _telemetry_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(TELEMETRY_PATH)), exist_ok=True)
+            with open(TELEMETRY_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+    except OSError as exc:
+        print(f"telemetry: could not write {TELEMETRY_PATH}: {exc}", file=sys.stderr)
+
+
+def telemetry_summary(path=None):
+    """
+    Summarize a telemetry file: one row per script / stage / model.
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        calls, total seconds, the share of time spent loading the model, reading the prompt
+        and generating, and the average generation speed (tokens per second)
+    """
+    
+    df = pd.read_json(path or TELEMETRY_PATH, lines=True)
+    out = df.groupby(["script", "stage", "model"], as_index=False).agg(
+        calls=("model", "size"),
+        total_ms=("total_ms", "sum"),
+        load_ms=("load_ms", "sum"),
+        prompt_ms=("prompt_ms", "sum"),
+        eval_ms=("eval_ms", "sum"),
+        prompt_tokens=("prompt_tokens", "sum"),
+        eval_tokens=("eval_tokens", "sum"),
+    )
+    out["total_s"] = out["total_ms"] / 1000
+    out["load_share"] = out["load_ms"] / out["total_ms"]
+    out["prompt_share"] = out["prompt_ms"] / out["total_ms"]
+    out["eval_share"] = out["eval_ms"] / out["total_ms"]
+    out["tokens_per_sec"] = out["eval_tokens"] / (out["eval_ms"] / 1000)
+    cols = ["script", "stage", "model", "calls", "total_s", "load_share", "prompt_share", "eval_share",
+            "prompt_tokens", "eval_tokens", "tokens_per_sec"]
+    return out[cols].sort_values("total_s", ascending=False).round(3)
+
+
 # 2. DATA CONVERSION FUNCTION ###################################
 
 def df_as_text(df):
@@ -0,0 +1,72 @@
+# Offline checks for the cached Ollama health check + circuit breaker in 08_function_calling/functions.py,
+# against the mock Ollama server
+# Run: python 08_function_calling/tests/test_ollama_health.py
+
+from __future__ import annotations
+
+import socket
+import sys
+import time
+from pathlib import Path
+
+fc_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(fc_root))
+sys.path.insert(0, str(fc_root.parent / "mock_ollama"))
+
+import functions
+from functions import ensure_ollama_available, mark_ollama_unhealthy
+from mock_ollama import start_mock_server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def raises(fn) -> bool:
+    try:
+        fn()
+    except RuntimeError:
+        return True
+    return False
+
+
+def main() -> None:
+    server = start_mock_server()
+    functions.OLLAMA_TAGS_URL = f"http://127.0.0.1:{server.server_port}/api/tags"
+
+    print("test_ollama_health: a healthy check is cached for HEALTH_TTL_SECONDS ...")
+    for _ in range(5):
+        ensure_ollama_available()
+    assert server.stats["tags"] == 1
+    mark_ollama_unhealthy()  # e.g. after a connection error: probe again next time
+    ensure_ollama_available()
+    assert server.stats["tags"] == 2
+    print("   OK")
+
+    print("test_ollama_health: Ollama down opens the breaker; calls then fail fast ...")
+    functions.OLLAMA_TAGS_URL = f"http://127.0.0.1:{free_port()}/api/tags"  # nothing listening
+    mark_ollama_unhealthy()
+    functions.BREAKER_COOLDOWN_SECONDS = 0.5
+    start = time.perf_counter()
+    assert raises(lambda: ensure_ollama_available(max_wait_seconds=0.3, poll_interval_seconds=0.05))
+    assert time.perf_counter() - start >= 0.3
+    start = time.perf_counter()
+    assert raises(lambda: ensure_ollama_available(max_wait_seconds=0.3, poll_interval_seconds=0.05))
+    assert time.perf_counter() - start < 0.05  # breaker open: no waiting, no probing
+    print("   OK")
+
+    print("test_ollama_health: after the cooldown, a working server closes the breaker ...")
+    functions.OLLAMA_TAGS_URL = f"http://127.0.0.1:{server.server_port}/api/tags"
+    time.sleep(0.5)
+    ensure_ollama_available()
+    assert server.stats["tags"] == 3
+    print("   OK")
+
+    server.shutdown()
+    print("\nAll ollama health checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,9 @@ import json
 import logging
 import os
 import re
+import time
 import uuid
-from typing import Any
+from typing import Any, Callable
 
 import httpx
 
@@ -21,6 +22,7 @@ from .guardrails import (
     task_size_ok,
 )
 from .logging_setup import configure_agent_logging
+from .telemetry import record_ollama_call
 from .tools import (
     ollama_tool_definitions,
     parse_function_arguments,
@@ -189,30 +191,78 @@ def _chat_once(
     messages: list[dict[str, Any]],
     max_tokens: int | None,
     tools: list[dict[str, Any]],
+    on_token: Callable[[str], None] | None = None,
+    stage: str = "chat",
 ) -> dict[str, Any]:
-    """Single non-streaming /api/chat call (optionally with tools)."""
+    """
+    Single /api/chat call (optionally with tools).
+
+    Without `on_token` this is one non-streaming request. With `on_token`, the reply is streamed
+    as NDJSON and `on_token(piece)` is called for each content piece as it arrives; tool calls
+    and the final counts are collected from the chunks, so the return shape is the same.
+    `timing` holds ttft_s (streaming only), total_s, and tokens_per_sec (from Ollama's eval counts).
+    Ollama's duration/count fields are also appended to LLM_TELEMETRY_PATH under `stage` (see telemetry.py).
+    """
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
     body: dict[str, Any] = {
         "model": model,
         "messages": messages,
-        "stream": False,
+        "stream": on_token is not None,
         "tools": tools,
     }
     if max_tokens is not None:
         body["options"] = {"num_predict": max_tokens}
     url = base_url.rstrip("/") + "/api/chat"
-    resp = client.post(url, headers=headers, json=body, timeout=120.0)
-    resp.raise_for_status()
-    data = resp.json()
-    msg = data.get("message") or {}
+    start = time.perf_counter()
+    ttft: float | None = None
+    if on_token is None:
+        resp = client.post(url, headers=headers, json=body, timeout=120.0)
+        resp.raise_for_status()
+        data = resp.json()
+        msg = data.get("message") or {}
+    else:
+        pieces: list[str] = []
+        tool_calls: list[Any] = []
+        data = {}
+        with client.stream("POST", url, headers=headers, json=body, timeout=120.0) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+                part = chunk.get("message") or {}
+                piece = part.get("content") or ""
+                if piece:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    pieces.append(piece)
+                    on_token(piece)
+                tool_calls.extend(part.get("tool_calls") or [])
+                if chunk.get("done"):
+                    data = chunk
+                    break
+        msg = {"role": "assistant", "content": "".join(pieces)}
+        if tool_calls:
+            msg["tool_calls"] = tool_calls
+        data = {**data, "message": msg}
     content = (msg.get("content") or "")
     if isinstance(content, str):
         content = content.strip()
     else:
         content = str(content).strip()
-    return {"content": content, "message": msg, "raw": data}
+    eval_count = data.get("eval_count")
+    eval_ns = data.get("eval_duration")
+    timing = {
+        "ttft_s": ttft,
+        "total_s": time.perf_counter() - start,
+        "tokens_per_sec": (eval_count / (eval_ns / 1e9)) if eval_count and eval_ns else None,
+    }
+    record_ollama_call(data, model=model, stage=stage, wall_seconds=timing["total_s"], ttft_s=ttft)
+    return {"content": content, "message": msg, "raw": data, "timing": timing}
 
 
 def run_research_loop(
@@ -225,6 +275,7 @@ def run_research_loop(
     max_output_tokens: int | None = None,
     existing_messages: list[dict[str, Any]] | None = None,
     continue_thread: bool = False,
+    on_token: Callable[[str], None] | None = None,
 ) -> dict[str, Any]:
     """
     Run the disaster situational brief loop until END_BRIEF, turn budget exhausted, or error.
@@ -235,6 +286,8 @@ def run_research_loop(
     `min_completion_turns` (see guardrails) is the minimum LLM rounds before `END_BRIEF` is accepted; the loop
     may inject a verification user message if the model tries to finish early.
     Web search uses CrewAI SerperDevTool; Ollama handles function calling for read_skill and web_search.
+    If `on_token` is given, each model reply is streamed and `on_token(piece)` is called as text arrives
+    (e.g. to render progressively); time-to-first-token and tokens/sec are logged per turn either way.
     """
     configure_agent_logging()
     if not task_size_ok(task):
@@ -312,6 +365,8 @@ def run_research_loop(
                     messages,
                     max_output_tokens,
                     tools,
+                    on_token=on_token,
+                    stage=f"turn_{turns_used}",
                 )
             except Exception as exc:  # noqa: BLE001 — surface model/HTTP errors to API layer
                 log.warning("turn %s Ollama error: %s", turns_used, _redact_for_log(exc))
@@ -325,6 +380,15 @@ def run_research_loop(
                     "detail": str(exc),
                 }
 
+            timing = out.get("timing") or {}
+            log.info(
+                "turn %s timing ttft_s=%s total_s=%.2f tokens_per_sec=%s",
+                turns_used,
+                f"{timing['ttft_s']:.2f}" if timing.get("ttft_s") is not None else "n/a",
+                timing.get("total_s", 0.0),
+                f"{timing['tokens_per_sec']:.1f}" if timing.get("tokens_per_sec") else "n/a",
+            )
+
             msg = out.get("message") or {}
             # Shallow copy so later edits to messages do not mutate response object quirks
             assistant_msg = dict(msg)
@@ -0,0 +1,130 @@
+# telemetry.py
+# Optional per-call Ollama timing telemetry (LLM_TELEMETRY_PATH) + summary report
+# Tim Fraser
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .guardrails import agent_root
+
+# Ollama /api/chat replies report where the time went, in nanoseconds:
+# load_duration (model load), prompt_eval_duration (prompt_eval_count tokens),
+# eval_duration (eval_count generated tokens), total_duration (all of it).
+_DURATION_FIELDS = {
+    "total_ms": "total_duration",
+    "load_ms": "load_duration",
+    "prompt_ms": "prompt_eval_duration",
+    "eval_ms": "eval_duration",
+}
+_LOCK = threading.Lock()
+
+
+def telemetry_path() -> Path | None:
+    """
+    JSONL sink from **LLM_TELEMETRY_PATH**, or None when telemetry is off (unset / empty / 0 / off).
+    Relative paths are resolved under the activity root (like AGENT_LOG_FILE).
+    """
+    raw = (os.getenv("LLM_TELEMETRY_PATH") or "").strip()
+    if raw.lower() in ("", "0", "off", "false", "no"):
+        return None
+    path = Path(raw)
+    if not path.is_absolute():
+        path = agent_root() / path
+    return path
+
+
+def record_ollama_call(
+    raw: dict[str, Any],
+    *,
+    model: str,
+    stage: str,
+    wall_seconds: float,
+    **extra: Any,
+) -> None:
+    """Append one /api/chat call's timing fields as a JSON line; never raises (telemetry is best effort)."""
+    path = telemetry_path()
+    if path is None:
+        return
+    row: dict[str, Any] = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "script": "agentpy",
+        "stage": stage,
+        "model": model,
+        "wall_ms": round(wall_seconds * 1000, 2),
+    }
+    for key, field in _DURATION_FIELDS.items():
+        row[key] = round((raw.get(field) or 0) / 1e6, 2)
+    row["prompt_tokens"] = raw.get("prompt_eval_count") or 0
+    row["eval_tokens"] = raw.get("eval_count") or 0
+    row["tokens_per_sec"] = (
+        round(row["eval_tokens"] / (row["eval_ms"] / 1000), 2) if row["eval_ms"] else None
+    )
+    row.update(extra)
+    try:
+        with _LOCK:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+    except OSError as exc:
+        print(f"telemetry: could not write {path}: {exc}", file=sys.stderr)
+
+
+def summarize(path: Path | None = None) -> list[dict[str, Any]]:
+    """
+    One row per (script, stage, model): calls, total seconds, share of time in model load /
+    prompt processing / generation, and generation tokens/sec. Sorted by total time.
+    """
+    path = path or telemetry_path()
+    if path is None or not path.is_file():
+        return []
+    groups: dict[tuple[str, str, str], dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            key = (str(row.get("script", "")), str(row.get("stage", "")), str(row.get("model", "")))
+            g = groups.setdefault(
+                key,
+                {"calls": 0, "total_ms": 0.0, "load_ms": 0.0, "prompt_ms": 0.0, "eval_ms": 0.0, "eval_tokens": 0},
+            )
+            g["calls"] += 1
+            for k in ("total_ms", "load_ms", "prompt_ms", "eval_ms", "eval_tokens"):
+                g[k] += row.get(k) or 0
+    out = []
+    for (script, stage, model), g in groups.items():
+        total = g["total_ms"] or 1.0
+        out.append(
+            {
+                "script": script,
+                "stage": stage,
+                "model": model,
+                "calls": g["calls"],
+                "total_s": round(g["total_ms"] / 1000, 3),
+                "load_share": round(g["load_ms"] / total, 3),
+                "prompt_share": round(g["prompt_ms"] / total, 3),
+                "eval_share": round(g["eval_ms"] / total, 3),
+                "tokens_per_sec": round(g["eval_tokens"] / (g["eval_ms"] / 1000), 2) if g["eval_ms"] else None,
+            }
+        )
+    return sorted(out, key=lambda r: r["total_s"], reverse=True)
+
+
+if __name__ == "__main__":
+    # python -m app.telemetry   (from the agentpy folder)
+    rows = summarize()
+    if not rows:
+        print("No telemetry yet: set LLM_TELEMETRY_PATH (e.g. logs/telemetry.jsonl) and run the agent.")
+    for r in rows:
+        print(
+            f"{r['stage']:<16} {r['model']:<28} calls={r['calls']:<4} total={r['total_s']:>8.2f}s "
+            f"load={r['load_share']:.0%} prompt={r['prompt_share']:.0%} gen={r['eval_share']:.0%} "
+            f"tok/s={r['tokens_per_sec']}"
+        )
@@ -7,8 +7,6 @@ import os
 import re
 from typing import Any
 
-from crewai_tools import SerperDevTool
-
 from .guardrails import read_skill_file
 
 # Keep tool payloads small so the chat context stays bounded.
@@ -192,6 +190,10 @@ def run_web_search(query: str) -> str:
         return "web_search error: empty query."
 
     try:
+        # Imported here, not at module top: crewai_tools pulls in a large dependency tree,
+        # and the app should boot fast (and work) without it when search is disabled.
+        from crewai_tools import SerperDevTool
+
         tool = SerperDevTool(n_results=5)
         raw = tool.run(search_query=q)
     except Exception as exc:  # noqa: BLE001 — tool output is user-facing text
@@ -0,0 +1,62 @@
+# Offline startup-time check for the agent API (no Ollama / no network)
+# Imports app.api in a fresh interpreter with `python -X importtime`, prints the slowest imports,
+# and checks that heavy optional packages (crewai_tools) are NOT loaded at startup.
+# Run: python 10_data_management/agentpy/tests/test_import_time.py
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+agent_root = Path(__file__).resolve().parent.parent
+
+# Packages that must only load on first use (e.g. web_search with SERPER_API_KEY set)
+LAZY_PACKAGES = ["crewai", "crewai_tools"]
+TOP_N = 10
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every import made by `import <module>`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=agent_root,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        # Format: "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.rstrip()[1:], int(self_us), int(cum_us)))  # drop the separator space
+    return rows
+
+
+def main() -> None:
+    print("test_import_time: python -X importtime -c 'import app.api' ...")
+    rows = import_times("app.api")
+    # Nesting is shown by indentation: "app.api" itself is top level, its own imports are one level in
+    total_ms = next(c for n, _, c in rows if n == "app.api") / 1000
+    direct = [(n.strip(), s, c) for n, s, c in rows if n.startswith("  ") and not n.startswith("    ")]
+    print(f"   {len(rows)} modules imported, app.api took {total_ms:.0f} ms")
+    print("   slowest imports (cumulative, one level below the top):")
+    for name, _, cum in sorted(direct, key=lambda r: r[2], reverse=True)[:TOP_N]:
+        print(f"   {cum / 1000:9.1f} ms  {name}")
+
+    print("test_import_time: heavy packages stay lazy ...")
+    loaded = {n.strip() for n, _, _ in rows}
+    for pkg in LAZY_PACKAGES:
+        hits = sorted(m for m in loaded if m == pkg or m.startswith(pkg + "."))
+        assert not hits, f"{pkg} imported at startup: {hits[:5]}"
+    print("   OK")
+
+    print("\nAll import-time checks passed.")
+
+
+if __name__ == "__main__":
+    main()
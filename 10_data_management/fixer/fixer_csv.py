@@ -293,6 +293,7 @@ def call_chunk_ollama(
             tools=tools,
             format=None,
             max_output_tokens=max_output_tokens,
+            stage="csv_fix",
         )
     except Exception as e:
         return {
@@ -11,8 +11,6 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -23,7 +21,7 @@ print("=================================================================")
 print("🏘️  fixer_parcels.py — batched zoning tools + polygons (Ollama Cloud)")
 print("=================================================================\n")
 
-print("📦 Loading Python packages (pandas, geopandas, matplotlib, httpx, dotenv) ...")
+print("📦 Loading Python packages (pandas, httpx, dotenv; geopandas + matplotlib load at the map step) ...")
 print("   ✅ Packages ready.\n")
 
 FIXER_ROOT = Path(__file__).resolve().parent
@@ -64,7 +62,9 @@ def read_env_digits(name: str, default: int) -> int:
 ROWS_PER_BATCH = read_env_digits("ROWS_PER_BATCH", 10)
 FIXER_CHUNK_WORKERS = read_env_digits("FIXER_CHUNK_WORKERS", 1)
 print(f"📊 ROWS_PER_BATCH = {ROWS_PER_BATCH}")
-print(f"📊 FIXER_CHUNK_WORKERS = {FIXER_CHUNK_WORKERS}\n")
+print(f"📊 FIXER_CHUNK_WORKERS = {FIXER_CHUNK_WORKERS}")
+MAKE_MAPS = os.environ.get("FIXER_MAPS", "1").strip() != "0"
+print(f"📊 FIXER_MAPS = {int(MAKE_MAPS)}\n")
 
 et = os.environ.get("FIXER_MAX_OUTPUT_TOKENS", "").strip()
 MAX_OUT: int | None = int(et) if et.isdigit() else None
@@ -217,6 +217,7 @@ def call_parcel_chunk_ollama(
             tools=tools,
             format=None,
             max_output_tokens=max_output_tokens,
+            stage="parcel_zoning",
         )
     except Exception as e:
         return {"chunk_index": chunk_index, "tool_calls": [], "error": str(e), "content": ""}
@@ -340,33 +341,41 @@ print(f"\n   ✅ Wrote {OUT_CSV}\n")
 
 # 5. SF + MAPS ###################################
 
-print("\n-----------------------------------------------------------------")
-print("🎨 Step 4 — Maps (geopandas + matplotlib polygons)")
-print("-----------------------------------------------------------------\n")
+# Maps are optional (FIXER_MAPS=0 skips them), so the plotting libraries are imported here,
+# on first use, instead of at startup.
+if MAKE_MAPS:
+    import geopandas as gpd  # deferred: only needed for maps
+    import matplotlib.pyplot as plt
 
-parcels_sf = gpd.GeoDataFrame(
-    parcels_out,
-    geometry=gpd.GeoSeries.from_wkt(parcels_out["wkt"]),
-    crs=WGS84_CRS,
-)
+    print("\n-----------------------------------------------------------------")
+    print("🎨 Step 4 — Maps (geopandas + matplotlib polygons)")
+    print("-----------------------------------------------------------------\n")
+
+    parcels_sf = gpd.GeoDataFrame(
+        parcels_out,
+        geometry=gpd.GeoSeries.from_wkt(parcels_out["wkt"]),
+        crs=WGS84_CRS,
+    )
 
-fig, ax = plt.subplots(figsize=(7, 5))
-parcels_sf.plot(column="zone_code", ax=ax, edgecolor="gray", linewidth=0.3, legend=True)
-ax.set_title("Parcels by raw zone_code")
-ax.set_axis_off()
-path_pb = OUT_DIR / "map_parcels_before.png"
-fig.savefig(path_pb, dpi=120, bbox_inches="tight")
-plt.close(fig)
-print(f"   💾 {path_pb}")
-
-fig, ax = plt.subplots(figsize=(7, 5))
-parcels_sf.plot(column="primary_land_use", ax=ax, edgecolor="gray", linewidth=0.3, legend=True)
-ax.set_title("Parcels by LLM primary_land_use")
-ax.set_axis_off()
-path_pa = OUT_DIR / "map_parcels_after.png"
-fig.savefig(path_pa, dpi=120, bbox_inches="tight")
-plt.close(fig)
-print(f"   💾 {path_pa}")
+    fig, ax = plt.subplots(figsize=(7, 5))
+    parcels_sf.plot(column="zone_code", ax=ax, edgecolor="gray", linewidth=0.3, legend=True)
+    ax.set_title("Parcels by raw zone_code")
+    ax.set_axis_off()
+    path_pb = OUT_DIR / "map_parcels_before.png"
+    fig.savefig(path_pb, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+    print(f"   💾 {path_pb}")
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+    parcels_sf.plot(column="primary_land_use", ax=ax, edgecolor="gray", linewidth=0.3, legend=True)
+    ax.set_title("Parcels by LLM primary_land_use")
+    ax.set_axis_off()
+    path_pa = OUT_DIR / "map_parcels_after.png"
+    fig.savefig(path_pa, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+    print(f"   💾 {path_pa}")
+else:
+    print("\n   ⏭️  FIXER_MAPS=0 — skipping maps.\n")
 
 # 6. SUMMARY ###################################
 
@@ -11,8 +11,6 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -23,7 +21,7 @@ print("=================================================================")
 print("📍 fixer_pois.py — batched POI category tools + points (Ollama Cloud)")
 print("=================================================================\n")
 
-print("📦 Loading Python packages (pandas, geopandas, matplotlib, httpx, dotenv) ...")
+print("📦 Loading Python packages (pandas, httpx, dotenv; geopandas + matplotlib load at the map step) ...")
 print("   ✅ Packages ready.\n")
 
 FIXER_ROOT = Path(__file__).resolve().parent
@@ -64,7 +62,9 @@ def read_env_digits(name: str, default: int) -> int:
 ROWS_PER_BATCH = read_env_digits("ROWS_PER_BATCH", 10)
 FIXER_CHUNK_WORKERS = read_env_digits("FIXER_CHUNK_WORKERS", 1)
 print(f"📊 ROWS_PER_BATCH = {ROWS_PER_BATCH}")
-print(f"📊 FIXER_CHUNK_WORKERS = {FIXER_CHUNK_WORKERS}\n")
+print(f"📊 FIXER_CHUNK_WORKERS = {FIXER_CHUNK_WORKERS}")
+MAKE_MAPS = os.environ.get("FIXER_MAPS", "1").strip() != "0"
+print(f"📊 FIXER_MAPS = {int(MAKE_MAPS)}\n")
 
 et = os.environ.get("FIXER_MAX_OUTPUT_TOKENS", "").strip()
 MAX_OUT: int | None = int(et) if et.isdigit() else None
@@ -199,6 +199,7 @@ def call_poi_chunk_ollama(
             tools=tools,
             format=None,
             max_output_tokens=max_output_tokens,
+            stage="poi_category",
         )
     except Exception as e:
         return {"chunk_index": chunk_index, "tool_calls": [], "error": str(e), "content": ""}
@@ -321,41 +322,49 @@ print(f"\n   ✅ Wrote {OUT_CSV}\n")
 
 # 5. SF + MAPS ###################################
 
-print("\n-----------------------------------------------------------------")
-print("🎨 Step 4 — Maps (geopandas + matplotlib points)")
-print("-----------------------------------------------------------------\n")
-
-pois_for_map = df.copy()
-pois_sf = gpd.GeoDataFrame(
-    pois_for_map,
-    geometry=gpd.points_from_xy(pois_for_map["x"], pois_for_map["y"]),
-    crs=WGS84_CRS,
-)
+# Maps are optional (FIXER_MAPS=0 skips them), so the plotting libraries are imported here,
+# on first use, instead of at startup.
+if MAKE_MAPS:
+    import geopandas as gpd  # deferred: only needed for maps
+    import matplotlib.pyplot as plt
+
+    print("\n-----------------------------------------------------------------")
+    print("🎨 Step 4 — Maps (geopandas + matplotlib points)")
+    print("-----------------------------------------------------------------\n")
+
+    pois_for_map = df.copy()
+    pois_sf = gpd.GeoDataFrame(
+        pois_for_map,
+        geometry=gpd.points_from_xy(pois_for_map["x"], pois_for_map["y"]),
+        crs=WGS84_CRS,
+    )
 
-fig, ax = plt.subplots(figsize=(7, 5))
-pois_sf.plot(ax=ax, color="#3498db", edgecolor="#2c3e50", markersize=25, alpha=0.9)
-ax.set_title("POIs (uniform symbol before category)")
-ax.set_axis_off()
-path_ob = OUT_DIR / "map_pois_before.png"
-fig.savefig(path_ob, dpi=120, bbox_inches="tight")
-plt.close(fig)
-print(f"   💾 {path_ob}")
-
-fig, ax = plt.subplots(figsize=(7, 5))
-pois_sf.plot(
-    ax=ax,
-    column="plot_label",
-    categorical=True,
-    legend=True,
-    markersize=25,
-    alpha=0.85,
-)
-ax.set_title("POIs by normalized_category")
-ax.set_axis_off()
-path_oa = OUT_DIR / "map_pois_after.png"
-fig.savefig(path_oa, dpi=120, bbox_inches="tight")
-plt.close(fig)
-print(f"   💾 {path_oa}")
+    fig, ax = plt.subplots(figsize=(7, 5))
+    pois_sf.plot(ax=ax, color="#3498db", edgecolor="#2c3e50", markersize=25, alpha=0.9)
+    ax.set_title("POIs (uniform symbol before category)")
+    ax.set_axis_off()
+    path_ob = OUT_DIR / "map_pois_before.png"
+    fig.savefig(path_ob, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+    print(f"   💾 {path_ob}")
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+    pois_sf.plot(
+        ax=ax,
+        column="plot_label",
+        categorical=True,
+        legend=True,
+        markersize=25,
+        alpha=0.85,
+    )
+    ax.set_title("POIs by normalized_category")
+    ax.set_axis_off()
+    path_oa = OUT_DIR / "map_pois_after.png"
+    fig.savefig(path_oa, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+    print(f"   💾 {path_oa}")
+else:
+    print("\n   ⏭️  FIXER_MAPS=0 — skipping maps.\n")
 
 # 6. SUMMARY ###################################
 
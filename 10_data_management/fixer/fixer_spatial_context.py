@@ -12,7 +12,6 @@ from pathlib import Path
 from typing import Any
 
 import geopandas as gpd
-import matplotlib.pyplot as plt
 import pandas as pd
 from dotenv import load_dotenv
 
@@ -23,7 +22,7 @@ print("=================================================================")
 print("🧭 fixer_spatial_context.py — contextual tool routing + geopandas")
 print("=================================================================\n")
 
-print("📦 Loading Python packages (pandas, geopandas, matplotlib, httpx, dotenv) ...")
+print("📦 Loading Python packages (pandas, geopandas, httpx, dotenv; matplotlib loads at the map step) ...")
 print("   ✅ Packages ready.\n")
 
 FIXER_ROOT = Path(__file__).resolve().parent
@@ -68,7 +67,9 @@ def read_env_digits(name: str, default: int) -> int:
 ROWS_PER_BATCH = read_env_digits("ROWS_PER_BATCH", 10)
 FIXER_CHUNK_WORKERS = read_env_digits("FIXER_CHUNK_WORKERS", 1)
 print(f"📊 ROWS_PER_BATCH = {ROWS_PER_BATCH} (env ROWS_PER_BATCH)")
-print(f"📊 FIXER_CHUNK_WORKERS = {FIXER_CHUNK_WORKERS} (env FIXER_CHUNK_WORKERS)\n")
+print(f"📊 FIXER_CHUNK_WORKERS = {FIXER_CHUNK_WORKERS} (env FIXER_CHUNK_WORKERS)")
+MAKE_MAPS = os.environ.get("FIXER_MAPS", "1").strip() != "0"
+print(f"📊 FIXER_MAPS = {int(MAKE_MAPS)} (env FIXER_MAPS)\n")
 
 et = os.environ.get("FIXER_MAX_OUTPUT_TOKENS", "").strip()
 MAX_OUT: int | None = int(et) if et.isdigit() else None
@@ -503,6 +504,7 @@ def call_context_chunk_ollama(
             tools=tools,
             format=None,
             max_output_tokens=max_output_tokens,
+            stage="spatial_context",
         )
     except Exception as e:
         return {"chunk_index": chunk_index, "tool_calls": [], "error": str(e), "content": ""}
@@ -604,38 +606,45 @@ print(f"\n   ✅ Wrote {OUT_CSV}\n")
 
 # 6. WRITE CSV + MAP ###################################
 
-print("\n-----------------------------------------------------------------")
-print("🎨 Step 4 — Map (nearest transport, meters)")
-print("-----------------------------------------------------------------\n")
+# The map is optional (FIXER_MAPS=0 skips it), so matplotlib is imported here,
+# on first use, instead of at startup.
+if MAKE_MAPS:
+    import matplotlib.pyplot as plt  # deferred: only needed for the map
 
-parcels_map_sf = gpd.GeoDataFrame(
-    parcels_out,
-    geometry=gpd.GeoSeries.from_wkt(parcels_out["wkt"]),
-    crs=WGS84_CRS,
-)
-pois_plot = gpd.GeoDataFrame(
-    pois_tbl,
-    geometry=gpd.points_from_xy(pois_tbl["x"], pois_tbl["y"]),
-    crs=WGS84_CRS,
-)
+    print("\n-----------------------------------------------------------------")
+    print("🎨 Step 4 — Map (nearest transport, meters)")
+    print("-----------------------------------------------------------------\n")
 
-fig, ax = plt.subplots(figsize=(7, 5))
-parcels_map_sf.plot(
-    column="ctx_nearest_transport_m",
-    ax=ax,
-    edgecolor="gray",
-    linewidth=0.25,
-    legend=True,
-    cmap="viridis",
-    missing_kwds={"color": "lightgrey"},
-)
-pois_plot.plot(ax=ax, color="black", markersize=3, alpha=0.5)
-ax.set_title("Parcels: nearest transport distance (m) + POI points")
-ax.set_axis_off()
-path_ctx = OUT_DIR / "map_parcels_context_transport.png"
-fig.savefig(path_ctx, dpi=120, bbox_inches="tight")
-plt.close(fig)
-print(f"   💾 {path_ctx}\n")
+    parcels_map_sf = gpd.GeoDataFrame(
+        parcels_out,
+        geometry=gpd.GeoSeries.from_wkt(parcels_out["wkt"]),
+        crs=WGS84_CRS,
+    )
+    pois_plot = gpd.GeoDataFrame(
+        pois_tbl,
+        geometry=gpd.points_from_xy(pois_tbl["x"], pois_tbl["y"]),
+        crs=WGS84_CRS,
+    )
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+    parcels_map_sf.plot(
+        column="ctx_nearest_transport_m",
+        ax=ax,
+        edgecolor="gray",
+        linewidth=0.25,
+        legend=True,
+        cmap="viridis",
+        missing_kwds={"color": "lightgrey"},
+    )
+    pois_plot.plot(ax=ax, color="black", markersize=3, alpha=0.5)
+    ax.set_title("Parcels: nearest transport distance (m) + POI points")
+    ax.set_axis_off()
+    path_ctx = OUT_DIR / "map_parcels_context_transport.png"
+    fig.savefig(path_ctx, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+    print(f"   💾 {path_ctx}\n")
+else:
+    print("\n   ⏭️  FIXER_MAPS=0 — skipping map.\n")
 
 # 7. CONSOLE SUMMARY ###################################
 
@@ -7,6 +7,10 @@ from __future__ import annotations
 
 import json
 import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
@@ -56,8 +60,12 @@ def ollama_chat_once(
     tools: list[dict[str, Any]] | None = None,
     format: str | None = None,
     max_output_tokens: int | None = None,
+    stage: str = "chat",
 ) -> dict[str, Any]:
-    """Single chat completion. Pass tools for tool-calling; pass format='json' for JSON mode."""
+    """
+    Single chat completion. Pass tools for tool-calling; pass format='json' for JSON mode.
+    Ollama's timing fields are appended to LLM_TELEMETRY_PATH under `stage` (see record_ollama_telemetry).
+    """
     url = base_url.rstrip("/") + "/api/chat"
     body: dict[str, Any] = {
         "model": model,
@@ -76,10 +84,12 @@ def ollama_chat_once(
     if ak:
         headers["Authorization"] = f"Bearer {ak}"
 
+    start = time.perf_counter()
     with httpx.Client(timeout=120.0) as client:
         resp = client.post(url, json=body, headers=headers)
         resp.raise_for_status()
         data = resp.json()
+    record_ollama_telemetry(data, model, stage, time.perf_counter() - start)
 
     msg = data.get("message") or {}
     content = msg.get("content")
@@ -91,6 +101,67 @@ def ollama_chat_once(
     return {"content": content, "message": msg, "raw": data}
 
 
+# Ollama reports where each call's time went (nanoseconds): load_duration (model load),
+# prompt_eval_duration (prompt_eval_count tokens), eval_duration (eval_count generated tokens).
+# With LLM_TELEMETRY_PATH set, each call becomes one JSONL row; telemetry_summary() rolls them up.
+_TELEMETRY_LOCK = threading.Lock()
+
+
+def record_ollama_telemetry(data: dict[str, Any], model: str, stage: str, wall_seconds: float) -> None:
+    """Append one call's Ollama duration/count fields (as ms) to LLM_TELEMETRY_PATH, if set; never raises."""
+    path = os.environ.get("LLM_TELEMETRY_PATH", "").strip()
+    if not path:
+        return
+
+    def ms(key: str) -> float:
+        return round((data.get(key) or 0) / 1e6, 2)
+
+    eval_count = data.get("eval_count") or 0
+    eval_ms = ms("eval_duration")
+    row = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "script": Path(sys.argv[0]).name if sys.argv and sys.argv[0] else "interactive",
+        "stage": stage,
+        "model": model,
+        "wall_ms": round(wall_seconds * 1000, 2),
+        "total_ms": ms("total_duration"),
+        "load_ms": ms("load_duration"),
+        "prompt_tokens": data.get("prompt_eval_count") or 0,
+        "prompt_ms": ms("prompt_eval_duration"),
+        "eval_tokens": eval_count,
+        "eval_ms": eval_ms,
+        "tokens_per_sec": round(eval_count / (eval_ms / 1000), 2) if eval_ms else None,
+    }
+    # Telemetry is best effort: a write failure must not turn a good model reply into an error
+    try:
+        with _TELEMETRY_LOCK:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+    except OSError as exc:
+        print(f"telemetry: could not write {path}: {exc}", file=sys.stderr)
+
+
+def telemetry_summary(path: str | Path | None = None) -> pd.DataFrame:
+    """Per script / stage / model: calls, total seconds, load / prompt / generation share, tokens per second."""
+    df = pd.read_json(path or os.environ["LLM_TELEMETRY_PATH"], lines=True)
+    out = df.groupby(["script", "stage", "model"], as_index=False).agg(
+        calls=("model", "size"),
+        total_ms=("total_ms", "sum"),
+        load_ms=("load_ms", "sum"),
+        prompt_ms=("prompt_ms", "sum"),
+        eval_ms=("eval_ms", "sum"),
+        eval_tokens=("eval_tokens", "sum"),
+    )
+    out["total_s"] = out["total_ms"] / 1000
+    out["load_share"] = out["load_ms"] / out["total_ms"]
+    out["prompt_share"] = out["prompt_ms"] / out["total_ms"]
+    out["eval_share"] = out["eval_ms"] / out["total_ms"]
+    out["tokens_per_sec"] = out["eval_tokens"] / (out["eval_ms"] / 1000)
+    cols = ["script", "stage", "model", "calls", "total_s", "load_share", "prompt_share", "eval_share", "tokens_per_sec"]
+    return out[cols].sort_values("total_s", ascending=False).round(3)
+
+
 def parse_function_arguments(raw: Any) -> dict[str, Any]:
     """Parse tool function.arguments (string JSON or dict) into a dict."""
     if raw is None:
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 from pathlib import Path
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
 import requests
 
 DEFAULT_MODEL = "llama3.2:3b"
@@ -22,6 +24,16 @@ NEW_PRIORITIES = [
     "Outdoor is a nice-to-have but not required",
     "No catering constraint",
 ]
+SYSTEM_TEXT = (
+    "You are a structured data extractor and decision analyst. "
+    "Follow the user's output format exactly."
+)
+# host -> the endpoint that last worked there, so later calls skip endpoints that 404.
+ENDPOINT_CACHE: dict[str, str] = {}
+# Only one thread probes a host at a time; the others wait and then use what it found.
+ENDPOINT_LOCK = threading.Lock()
+
+
 def list_installed_models(host: str, timeout: int) -> list[str]:
     url = f"{host.rstrip('/')}/api/tags"
     response = requests.get(url, timeout=timeout)
@@ -114,12 +126,7 @@ def extract_content(response_json: dict, endpoint: str) -> str:
     raise ValueError(f"Unsupported endpoint parser: {endpoint}")
 
 
-def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[str, str]:
-    system_text = (
-        "You are a structured data extractor and decision analyst. "
-        "Follow the user's output format exactly."
-    )
-
+def build_payloads(model: str, prompt_text: str, max_tokens: int | None = None) -> list[tuple[str, dict]]:
     endpoint_payloads = [
         (
             "/api/chat",
@@ -127,7 +134,7 @@ def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[s
                 "model": model,
                 "stream": False,
                 "messages": [
-                    {"role": "system", "content": system_text},
+                    {"role": "system", "content": SYSTEM_TEXT},
                     {"role": "user", "content": prompt_text},
                 ],
             },
@@ -137,7 +144,7 @@ def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[s
             {
                 "model": model,
                 "messages": [
-                    {"role": "system", "content": system_text},
+                    {"role": "system", "content": SYSTEM_TEXT},
                     {"role": "user", "content": prompt_text},
                 ],
                 "stream": False,
@@ -148,14 +155,29 @@ def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[s
             {
                 "model": model,
                 "stream": False,
-                "prompt": f"{system_text}\n\n{prompt_text}",
+                "prompt": f"{SYSTEM_TEXT}\n\n{prompt_text}",
             },
         ),
     ]
+    if max_tokens is not None:
+        for endpoint, payload in endpoint_payloads:
+            if endpoint == "/v1/chat/completions":
+                payload["max_tokens"] = max_tokens
+            else:
+                payload["options"] = {"num_predict": max_tokens}
+    return endpoint_payloads
+
+
+def post_first_working(host: str, endpoint_payloads: list[tuple[str, dict]], timeout: int) -> tuple[str, str]:
+    # Try the endpoint that worked for this host before first; only rediscover if it stops working.
+    host_key = host.rstrip("/")
+    known = ENDPOINT_CACHE.get(host_key)
+    if known:
+        endpoint_payloads = sorted(endpoint_payloads, key=lambda pair: pair[0] != known)
 
     errors = []
     for endpoint, payload in endpoint_payloads:
-        url = f"{host.rstrip('/')}{endpoint}"
+        url = f"{host_key}{endpoint}"
         try:
             response = requests.post(url, json=payload, timeout=timeout)
         except requests.RequestException as exc:
@@ -170,7 +192,9 @@ def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[s
         try:
             response.raise_for_status()
             data = response.json()
-            return extract_content(data, endpoint), endpoint
+            content = extract_content(data, endpoint)
+            ENDPOINT_CACHE[host_key] = endpoint
+            return content, endpoint
         except Exception as exc:
             errors.append(f"{endpoint}: {exc}")
 
@@ -178,6 +202,21 @@ def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[s
     raise RuntimeError(f"All endpoint attempts failed:\n{error_text}")
 
 
+def discover_endpoint(host: str, model: str, timeout: int) -> str:
+    # A one-token request finds the working endpoint (and loads the model) before the real prompts,
+    # so prompts sent at the same time don't each pay for the failed endpoints.
+    with ENDPOINT_LOCK:
+        known = ENDPOINT_CACHE.get(host.rstrip("/"))
+        if known:
+            return known
+        _, endpoint = post_first_working(host, build_payloads(model, "Reply with OK.", max_tokens=1), timeout)
+        return endpoint
+
+
+def call_model(host: str, model: str, prompt_text: str, timeout: int) -> tuple[str, str]:
+    return post_first_working(host, build_payloads(model, prompt_text), timeout)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Run a prompt against local Ollama and write output to a file."
@@ -228,20 +267,30 @@ def main() -> None:
     print(f"Prompt file: {prompt_path}")
     print(f"Output file: {output_path}")
 
-    old_content, old_endpoint = call_model(
-        host=args.host,
-        model=model_to_use,
-        prompt_text=old_prompt_text,
-        timeout=args.timeout,
-    )
+    # Find the working endpoint once, so both shortlists go straight to it.
+    endpoint = discover_endpoint(host=args.host, model=model_to_use, timeout=args.timeout)
+    print(f"Endpoint: {endpoint}")
+
+    # The two shortlists don't depend on each other, so generate them at the same time;
+    # the comparison needs both, so it starts as soon as both are done.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        old_future = executor.submit(
+            call_model,
+            host=args.host,
+            model=model_to_use,
+            prompt_text=old_prompt_text,
+            timeout=args.timeout,
+        )
+        new_future = executor.submit(
+            call_model,
+            host=args.host,
+            model=model_to_use,
+            prompt_text=new_prompt_text,
+            timeout=args.timeout,
+        )
+        old_content, old_endpoint = old_future.result()
+        new_content, new_endpoint = new_future.result()
     print(f"Old-priority endpoint used: {old_endpoint}")
-
-    new_content, new_endpoint = call_model(
-        host=args.host,
-        model=model_to_use,
-        prompt_text=new_prompt_text,
-        timeout=args.timeout,
-    )
     print(f"New-priority endpoint used: {new_endpoint}")
 
     change_summary, summary_endpoint = generate_change_summary(
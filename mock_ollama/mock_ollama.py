@@ -0,0 +1,351 @@
+# mock_ollama.py
+# Local Stand-in for the Ollama API (synthetic, record and replay modes)
+# Used by: any script that talks to Ollama (06_agents, 07_rag, 08_function_calling, 10_data_management)
+# Tim Fraser
+
+# Most scripts in this course need a live Ollama (or Ollama Cloud) to run at all.
+# This script starts a small web server that answers the same requests Ollama does,
+# so you can test, time, and load-test those scripts on a laptop with no model and no network.
+#
+# It implements:
+# - GET  /api/tags -> the list of "installed" models
+# - POST /api/chat -> a chat reply, with tool calls and streaming (one JSON object per line)
+#
+# Three modes:
+# - synthetic (default): made-up but well-formed replies. If the request offers tools, the first reply
+#   calls the first tool (with placeholder arguments that fit its schema); after a tool result, it answers
+#   in text. Latency and token speed are configurable, and the usual timing fields are filled in.
+# - record: forward each request to a real Ollama (--upstream), return its reply, and save it
+#   to a "cassette" file (JSONL), keyed by a hash of model + messages + tools + options.
+# - replay: answer from the cassette only. The same request always gets the same recorded reply,
+#   and a request that was never recorded gets an error (so tests notice when prompts change).
+#
+# Run (from the repo root):
+#   python mock_ollama/mock_ollama.py --port 11434 --latency 0.2 --tokens-per-sec 40
+#   python mock_ollama/mock_ollama.py --mode record --upstream http://localhost:11435 --cassette mock_ollama/cassette.jsonl
+#   python mock_ollama/mock_ollama.py --mode replay --cassette mock_ollama/cassette.jsonl
+# then point scripts at it, e.g. OLLAMA_HOST=http://localhost:11434 (the default local address).
+#
+# Or start it inside a Python test / benchmark:
+#   server = start_mock_server(port=0, tokens_per_sec=100)
+#   url = f"http://127.0.0.1:{server.server_port}"
+#   ...
+#   server.shutdown()
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import argparse  # for command-line options
+import hashlib   # for hashing requests into cassette keys
+import json      # for reading and writing JSON
+import os        # for environment variables
+import sys       # for checking which error a request raised
+import threading # for running the server in the background + guarding the cassette
+import time      # for simulated latency
+import urllib.request  # for forwarding requests upstream (record mode)
+from datetime import datetime, timezone  # for Ollama-style timestamps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Only the Python standard library is needed.
+
+## 0.2 Configuration #################################
+
+DEFAULT_MODELS = ["smollm2:1.7b", "smollm2:135m", "nemotron-3-nano:30b-cloud"]
+
+DEFAULTS = {
+    "mode": "synthetic",       # synthetic | record | replay
+    "latency": 0.0,            # seconds before the first token (prompt processing)
+    "load_time": 0.0,          # extra seconds the first time each model is used (model load)
+    "tokens_per_sec": 0.0,     # generation speed; 0 = instant
+    "reply_tokens": 40,        # length of synthetic text replies, in words
+    "models": DEFAULT_MODELS,  # returned by /api/tags
+    "cassette": "",            # JSONL file for record / replay
+    "upstream": "",            # real Ollama for record mode, e.g. http://localhost:11435
+    "upstream_api_key": "",    # sent upstream as a Bearer token (Ollama Cloud)
+}
+
+FILLER = (
+    "this is a mock reply from the local test server standing in for the model so that "
+    "scripts can run end to end without a real language model or any network access"
+).split()
+
+
+# 1. REQUEST HELPERS ###################################
+
+# Hash everything that changes the answer (model, messages, tools, options, format) in a canonical order.
+# Same recipe as the agent() response cache, so a cassette lines up with cached requests.
+def request_key(body):
+    request = {key: body.get(key) for key in ["model", "messages", "tools", "options", "format"]}
+    text = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Placeholder value that fits a JSON-schema property (first enum value, 0, False, "mock", ...)
+def placeholder_value(schema):
+    schema = schema or {}
+    if schema.get("enum"):
+        return schema["enum"][0]
+    kind = schema.get("type", "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+    return {"integer": 0, "number": 0, "boolean": False, "array": [], "object": {}}.get(kind, "mock")
+
+# Tool call for the first tool offered, with placeholder values for its required arguments
+def synthetic_tool_call(tools):
+    fn = (tools[0] or {}).get("function") or {}
+    params = fn.get("parameters") or {}
+    props = params.get("properties") or {}
+    required = params.get("required") or list(props)
+    args = {name: placeholder_value(props.get(name)) for name in required}
+    return {"function": {"name": fn.get("name", "tool"), "arguments": args}}
+
+# Words of the reply: echo the start of the last user message, then filler up to reply_tokens
+def synthetic_words(messages, reply_tokens):
+    last_user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    words = ["Mock", "reply", "to:"] + str(last_user).split()[:8] + ["--"]
+    i = 0
+    while len(words) < reply_tokens:
+        words.append(FILLER[i % len(FILLER)])
+        i += 1
+    return words[:max(reply_tokens, 1)]
+
+# Rough prompt size in tokens (one per word), for prompt_eval_count
+def prompt_tokens(messages):
+    return sum(len(str(m.get("content") or "").split()) for m in messages)
+
+
+# 2. SERVER ###################################
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, MockOllamaHandler)
+        self.config = {**DEFAULTS, **config}
+        self.loaded_models = set()  # models that already paid load_time
+        self.cassette = {}          # request key -> recorded response
+        self.lock = threading.Lock()
+        self.stats = {"chat": 0, "tags": 0, "replay_misses": 0}
+        if self.config["cassette"] and os.path.isfile(self.config["cassette"]):
+            with open(self.config["cassette"], encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.cassette[entry["key"]] = entry["response"]
+
+    # Clients hanging up (e.g. closing a keep-alive connection) is normal, not an error
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    # Save one recorded exchange to the cassette file (and memory)
+    def record(self, key, body, response):
+        with self.lock:
+            self.cassette[key] = response
+            if self.config["cassette"]:
+                with open(self.config["cassette"], "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "request": body, "response": response}) + "\n")
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # keep the console quiet
+        pass
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ["/api/tags", ""]:
+            self.server.stats["tags"] += 1
+            now = datetime.now(timezone.utc).isoformat()
+            models = [{"name": m, "model": m, "modified_at": now, "size": 0} for m in self.server.config["models"]]
+            self.send_json(200, {"models": models})
+        else:
+            self.send_json(404, {"error": f"mock_ollama: unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/chat":
+            self.send_json(404, {"error": f"mock_ollama: unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": "mock_ollama: request body is not JSON"})
+            return
+        self.server.stats["chat"] += 1
+        config = self.server.config
+
+        if config["mode"] == "replay":
+            response = self.server.cassette.get(request_key(body))
+            if response is None:
+                self.server.stats["replay_misses"] += 1
+                self.send_json(404, {"error": f"mock_ollama: no recorded response for this request ({request_key(body)[:12]})"})
+                return
+            self.reply(body, dict(response["message"]), response)
+        elif config["mode"] == "record":
+            try:
+                response = self.forward(body)
+            except OSError as e:
+                self.send_json(502, {"error": f"mock_ollama: upstream request failed: {e}"})
+                return
+            self.server.record(request_key(body), body, response)
+            self.reply(body, dict(response["message"]), response)
+        else:
+            self.reply(body, self.synthetic_message(body), None)
+
+    # Ask the real Ollama (always non-streaming; we re-stream it ourselves if needed)
+    def forward(self, body):
+        config = self.server.config
+        headers = {"Content-Type": "application/json"}
+        key = config["upstream_api_key"]
+        if key:
+            headers["Authorization"] = f"Bearer {key}"
+        request = urllib.request.Request(
+            config["upstream"].rstrip("/") + "/api/chat",
+            data=json.dumps({**body, "stream": False}).encode("utf-8"),
+            headers=headers,
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return json.loads(response.read())
+
+    def synthetic_message(self, body):
+        messages = body.get("messages") or []
+        tools = body.get("tools") or []
+        last_role = messages[-1].get("role") if messages else "user"
+        if tools and last_role != "tool":
+            return {"role": "assistant", "content": "", "tool_calls": [synthetic_tool_call(tools)]}
+        if body.get("format") == "json" or isinstance(body.get("format"), dict):
+            return {"role": "assistant", "content": json.dumps({"mock": True})}
+        words = synthetic_words(messages, self.server.config["reply_tokens"])
+        return {"role": "assistant", "content": " ".join(words)}
+
+    # Send the message back, as one JSON object or as a stream, with Ollama-style timing fields
+    def reply(self, body, message, recorded):
+        config = self.server.config
+        model = body.get("model", "")
+        start = time.perf_counter()
+
+        # Simulated model load (first use of each model) + prompt processing
+        load = 0.0
+        with self.server.lock:
+            if model not in self.server.loaded_models:
+                self.server.loaded_models.add(model)
+                load = config["load_time"]
+        time.sleep(load + config["latency"])
+
+        # Split the text into "tokens" (words, keeping their spaces)
+        content = message.get("content") or ""
+        pieces = [w + " " for w in content.split(" ")] if content else []
+        if pieces:
+            pieces[-1] = pieces[-1][:-1]
+        delay = 1 / config["tokens_per_sec"] if config["tokens_per_sec"] else 0.0
+
+        def final_fields(eval_seconds):
+            if recorded is not None:
+                return {k: v for k, v in recorded.items() if k not in ["message", "model", "created_at"]}
+            return {
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "load_duration": int(load * 1e9),
+                "prompt_eval_count": prompt_tokens(body.get("messages") or []),
+                "prompt_eval_duration": int(config["latency"] * 1e9),
+                "eval_count": max(len(pieces), 1),
+                "eval_duration": int(eval_seconds * 1e9),
+            }
+
+        head = {"model": model, "created_at": datetime.now(timezone.utc).isoformat()}
+        if not body.get("stream", True):
+            time.sleep(delay * len(pieces))
+            self.send_json(200, {**head, "message": message, **final_fields(delay * len(pieces))})
+            return
+
+        # Streaming: one JSON object per line, like Ollama (chunked transfer encoding)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        gen_start = time.perf_counter()
+        try:
+            for piece in pieces:
+                self.send_chunk({**head, "message": {"role": "assistant", "content": piece}, "done": False})
+                time.sleep(delay)
+            last = {"role": "assistant", "content": ""}
+            if message.get("tool_calls"):
+                last["tool_calls"] = message["tool_calls"]
+            self.send_chunk({**head, "message": last, **final_fields(time.perf_counter() - gen_start)})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading early, just like hanging up on Ollama
+
+    def send_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+# 3. START / STOP ###################################
+
+# Start a mock server in a background thread and return it (port=0 picks a free port).
+# Stop it with server.shutdown(); server.stats counts the requests it answered.
+def start_mock_server(host="127.0.0.1", port=0, **config):
+    server = MockOllamaServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama API.")
+    parser.add_argument("--host", default=env("MOCK_OLLAMA_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env("MOCK_OLLAMA_PORT", "11434")))
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default=env("MOCK_OLLAMA_MODE", "synthetic"))
+    parser.add_argument("--latency", type=float, default=float(env("MOCK_OLLAMA_LATENCY", "0")),
+                        help="seconds before the first token")
+    parser.add_argument("--load-time", type=float, default=float(env("MOCK_OLLAMA_LOAD_TIME", "0")),
+                        help="extra seconds on the first request for each model")
+    parser.add_argument("--tokens-per-sec", type=float, default=float(env("MOCK_OLLAMA_TOKENS_PER_SEC", "0")),
+                        help="generation speed (0 = instant)")
+    parser.add_argument("--reply-tokens", type=int, default=int(env("MOCK_OLLAMA_REPLY_TOKENS", "40")))
+    parser.add_argument("--models", default=env("MOCK_OLLAMA_MODELS", ",".join(DEFAULT_MODELS)),
+                        help="comma-separated model names for /api/tags")
+    parser.add_argument("--cassette", default=env("MOCK_OLLAMA_CASSETTE", ""))
+    parser.add_argument("--upstream", default=env("MOCK_OLLAMA_UPSTREAM", ""))
+    args = parser.parse_args()
+
+    if args.mode in ["record", "replay"] and not args.cassette:
+        parser.error(f"--mode {args.mode} needs --cassette")
+    if args.mode == "record" and not args.upstream:
+        parser.error("--mode record needs --upstream (the real Ollama to record from)")
+
+    server = MockOllamaServer((args.host, args.port), {
+        "mode": args.mode,
+        "latency": args.latency,
+        "load_time": args.load_time,
+        "tokens_per_sec": args.tokens_per_sec,
+        "reply_tokens": args.reply_tokens,
+        "models": [m.strip() for m in args.models.split(",") if m.strip()],
+        "cassette": args.cassette,
+        "upstream": args.upstream,
+        "upstream_api_key": env("OLLAMA_API_KEY", ""),
+    })
+    print(f"mock_ollama ({args.mode}) listening on http://{args.host}:{server.server_port}")
+    if args.mode == "replay":
+        print(f"   {len(server.cassette)} recorded responses loaded from {args.cassette}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopped. Requests served: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
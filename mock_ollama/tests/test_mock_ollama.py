@@ -0,0 +1,109 @@
+# Offline tests for the mock Ollama server (no Ollama / no network)
+# Run: python mock_ollama/tests/test_mock_ollama.py
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+mock_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(mock_root))
+
+from mock_ollama import start_mock_server
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "record_poi_category",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "poi_id": {"type": "integer"},
+                    "category": {"type": "string", "enum": ["transport", "retail"]},
+                },
+                "required": ["poi_id", "category"],
+            },
+        },
+    }
+]
+
+
+def post(url: str, body: dict) -> tuple[int, list[dict]]:
+    """POST /api/chat; return status and the parsed JSON lines (one line unless streaming)."""
+    req = urllib.request.Request(
+        url + "/api/chat", data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, [json.loads(line) for line in resp.read().splitlines() if line.strip()]
+    except urllib.error.HTTPError as e:
+        return e.code, [json.loads(e.read())]
+
+
+def main() -> None:
+    server = start_mock_server(tokens_per_sec=200, latency=0.05, reply_tokens=12)
+    url = f"http://127.0.0.1:{server.server_port}"
+    messages = [{"role": "user", "content": "Which neighborhoods flooded?"}]
+
+    print("test_mock_ollama: /api/tags ...")
+    with urllib.request.urlopen(url + "/api/tags", timeout=10) as resp:
+        names = [m["name"] for m in json.loads(resp.read())["models"]]
+    assert "smollm2:1.7b" in names
+    print("   OK")
+
+    print("test_mock_ollama: non-streaming chat + timing fields + latency ...")
+    start = time.perf_counter()
+    status, (reply,) = post(url, {"model": "smollm2:1.7b", "messages": messages, "stream": False})
+    elapsed = time.perf_counter() - start
+    assert status == 200 and reply["done"] is True
+    assert reply["message"]["content"].startswith("Mock reply to: Which neighborhoods flooded?")
+    assert reply["eval_count"] == 12 and reply["prompt_eval_count"] == 3
+    assert elapsed >= 0.05 + 12 / 200 - 0.01, elapsed
+    print("   OK")
+
+    print("test_mock_ollama: streaming chat (NDJSON) ...")
+    status, chunks = post(url, {"model": "smollm2:1.7b", "messages": messages, "stream": True})
+    assert status == 200 and len(chunks) == 13 and chunks[-1]["done"] is True
+    assert "".join(c["message"]["content"] for c in chunks) == reply["message"]["content"]
+    print("   OK")
+
+    print("test_mock_ollama: tool call, then text after the tool result ...")
+    _, (first,) = post(url, {"model": "m", "messages": messages, "tools": TOOLS, "stream": False})
+    call = first["message"]["tool_calls"][0]["function"]
+    assert call == {"name": "record_poi_category", "arguments": {"poi_id": 0, "category": "transport"}}
+    follow = messages + [first["message"], {"role": "tool", "content": "ok"}]
+    _, (second,) = post(url, {"model": "m", "messages": follow, "tools": TOOLS, "stream": False})
+    assert "tool_calls" not in second["message"] and second["message"]["content"]
+    print("   OK")
+
+    print("test_mock_ollama: record then replay ...")
+    cassette = os.path.join(tempfile.mkdtemp(), "cassette.jsonl")
+    recorder = start_mock_server(mode="record", upstream=url, cassette=cassette)
+    rec_url = f"http://127.0.0.1:{recorder.server_port}"
+    body = {"model": "smollm2:1.7b", "messages": messages, "stream": False}
+    _, (recorded,) = post(rec_url, body)
+    recorder.shutdown()
+    server.shutdown()  # upstream is gone: replay must not need it
+
+    player = start_mock_server(mode="replay", cassette=cassette)
+    play_url = f"http://127.0.0.1:{player.server_port}"
+    for stream in [False, True]:
+        _, lines = post(play_url, {**body, "stream": stream})
+        assert "".join(c["message"]["content"] for c in lines) == recorded["message"]["content"]
+    status, (err,) = post(play_url, {**body, "messages": [{"role": "user", "content": "never recorded"}]})
+    assert status == 404 and "no recorded response" in err["error"]
+    player.shutdown()
+    print("   OK")
+
+    print("\nAll mock_ollama checks passed.")
+
+
+if __name__ == "__main__":
+    main()